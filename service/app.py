@@ -6,6 +6,7 @@ from aiohttp.web_runner import _raise_graceful_exit
 from service.lib.path import web_path
 from service.server.web import web_routes
 from service.server.resource import resource_routes
+from service.server.live import live_routes
 import base64
 from typing import Optional
 import socket
@@ -56,6 +57,21 @@ class App:
                 self.tracker.token_validate,
             )
         )
+        self.app.add_routes(
+            resource_routes(
+                "/cover",
+                self.config.data_dir + "/cover_cache",
+                self.tracker.token_validate,
+                immutable=True,
+            )
+        )
+        self.app.add_routes(
+            live_routes(
+                "/live",
+                self.tracker.get_live_source,
+                self.tracker.token_validate,
+            )
+        )
         if self.config.package_dir is not None:
             self.app.add_routes(
                 resource_routes(
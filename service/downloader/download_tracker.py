@@ -43,6 +43,9 @@ class SizeTracker:
     def add_fragment(self, size: float):
         self._records.append(size)
 
+    def remove_fragment(self, size: float):
+        self._records.remove(size)
+
     def get_total_size(self) -> float:
         if len(self._records) == 0:
             return 0
@@ -56,6 +59,10 @@ class DownloadTracker:
         self.size_tracker = SizeTracker()
         self.downloaded_size = 0
         self.downloading = False
+        # 已通过限速器、正在传输的请求数及其累计时间
+        self.transfers = 0
+        self.transfer_since = 0.0
+        self.transfer_time = 0.0
 
     def update(self, status: str, downloading: bool):
         self.status = status
@@ -67,10 +74,33 @@ class DownloadTracker:
     def add_fragment(self, size: float):
         self.size_tracker.add_fragment(size)
 
+    def remove_fragment(self, size: float):
+        self.size_tracker.remove_fragment(size)
+
     def add_bytes_downloaded(self, bytes: int):
         self.downloaded_size += bytes
         self.speed_tracker.add_bytes_downloaded(bytes)
 
+    def remove_bytes_downloaded(self, bytes: int):
+        # 失败的请求重试时会重新下载，不计入进度
+        self.downloaded_size -= bytes
+
+    def begin_transfer(self):
+        if self.transfers == 0:
+            self.transfer_since = time.monotonic()
+        self.transfers += 1
+
+    def end_transfer(self):
+        self.transfers -= 1
+        if self.transfers == 0:
+            self.transfer_time += time.monotonic() - self.transfer_since
+
+    def get_transfer_time(self) -> float:
+        """Seconds during which at least one request was transferring."""
+        if self.transfers == 0:
+            return self.transfer_time
+        return self.transfer_time + time.monotonic() - self.transfer_since
+
     def get_progress(self) -> DownloadProgress:
         return DownloadProgress(
             status=self.status,
@@ -0,0 +1,56 @@
+import av
+import math
+import shutil
+
+
+def is_clean_ts(file: str) -> bool:
+    """MPEG-TS with H.264 video and AAC audio only, playable without remux."""
+    try:
+        with av.open(file) as container:
+            if container.format.name != "mpegts":
+                return False
+            videos = container.streams.video
+            audios = container.streams.audio
+            return (
+                len(videos) > 0
+                and all(s.codec_context.name == "h264" for s in videos)
+                and all(s.codec_context.name == "aac" for s in audios)
+            )
+    except Exception:
+        return False
+
+
+def concat_files(files: list[str], dst: str) -> list[int]:
+    sizes = []
+    with open(dst, "wb") as out:
+        for file in files:
+            with open(file, "rb") as f:
+                start = out.tell()
+                shutil.copyfileobj(f, out)
+                sizes.append(out.tell() - start)
+    return sizes
+
+
+def hls_byterange_playlist(
+    uri: str,
+    durations: list[float],
+    sizes: list[int],
+    discontinuities: list[bool],
+) -> str:
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:4",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+        f"#EXT-X-TARGETDURATION:{math.ceil(max(durations, default=0))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+    ]
+    offset = 0
+    for duration, size, discontinuity in zip(durations, sizes, discontinuities):
+        if discontinuity:
+            lines.append("#EXT-X-DISCONTINUITY")
+        lines.append(f"#EXTINF:{duration:.3f},")
+        lines.append(f"#EXT-X-BYTERANGE:{size}@{offset}")
+        lines.append(uri)
+        offset += size
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
@@ -1,8 +1,9 @@
 from .download_tracker import DownloadTracker
-from .simple import SimpleDownloader
+from .simple import SimpleDownloader, UrlExpiredError, StallError
 from urllib.parse import urljoin
 from service.lib.context import Context
 import re
+import math
 import asyncio
 import aiofiles
 import aiofiles.os
@@ -11,7 +12,12 @@ from service.lib.run_cmd import run_cmd
 from service.lib.path import ffmpeg_path
 from service.schema.downloader import DownloadProgress
 from service.lib.parallel_holder import ParallelHolder
-from .m3u8_adblocker import M3U8AdBlocker
+from .m3u8_adblocker import M3U8AdBlocker, main_finger_print
+from .mp4 import movflags
+from .storage import content_hash
+from .hls import is_clean_ts, concat_files, hls_byterange_playlist
+from urllib.parse import quote
+from typing import Awaitable, Callable, Optional
 
 
 def m3u8_total_duration_sec_from_lines(lines: list[str]) -> float | None:
@@ -32,14 +38,53 @@ def m3u8_total_duration_sec_from_lines(lines: list[str]) -> float | None:
     return total if found else None
 
 
+def m3u8_fragment_durations(lines: list[str]) -> list[float]:
+    """#EXTINF duration of every fragment line, 0 when missing."""
+    durations = []
+    duration = 0.0
+    for raw in lines:
+        line = raw.strip()
+        if line.startswith("#EXTINF:"):
+            try:
+                duration = float(line[8:].split(",", 1)[0].strip())
+            except ValueError:
+                duration = 0.0
+        elif line != "" and not line.startswith("#"):
+            durations.append(duration)
+            duration = 0.0
+    return durations
+
+
+_LIVE_FRAGMENT_RE = re.compile(r"^fragment_(\d+)\.ts$")
+
+
 class M3U8Downloader:
-    def __init__(self, src, dst):
+    def __init__(
+        self,
+        src,
+        dst,
+        resolve_url: Optional[Callable[[Optional[Exception]], Awaitable[str]]] = None,
+    ):
         self.src = src
         self.dst = dst
+        self.resolve_url = resolve_url
         self.download_tracker = DownloadTracker()
         self.ad_block = M3U8AdBlocker()
         self.ad_detected = False
         self.content_duration_sec: float | None = None
+        self.urls: list[str] = []
+        self.url_generation = 0
+        self.url_refreshes = 0
+        self.refresh_lock = asyncio.Lock()
+        self.tmp: Optional[str] = None
+        self.fragments: list[str] = []
+        self.durations: list[float] = []
+        self.encrypted = False
+        self.finger_prints: list = []
+        # 已写入直播列表的分片是否为广告，写入后不再改变
+        self.live_ads: list[bool] = []
+        self.fragments_finished = False
+        self.content_hash = ""
 
     def select_sub_list(self, lines):
         r = re.compile(r"RESOLUTION=([0-9]+)x([0-9]+)")
@@ -79,7 +124,112 @@ class M3U8Downloader:
                 if (not line.startswith("#")) and line != ""
             ]
 
-    async def ffmpeg(self, src_m3u8, fragments, dst):
+    async def refresh_urls(self, tmp: str, generation: int, error: Exception) -> None:
+        async with self.refresh_lock:
+            if generation != self.url_generation:
+                # 其他分片已经刷新过地址
+                return
+            if (
+                self.resolve_url is None
+                or self.url_refreshes >= Context.config.download.max_url_refreshes
+            ):
+                raise error
+            self.url_refreshes += 1
+            Context.info(f"refresh url ({self.url_refreshes}) for {self.dst}: {error}")
+            self.download_tracker.update("刷新视频地址", True)
+            self.src = await self.resolve_url(error)
+            urls = await self.download_meta(os.path.join(tmp, "refresh.m3u8"))
+            if len(urls) != len(self.urls):
+                raise ValueError(
+                    f"fragment count changed after refresh: {len(self.urls)} -> {len(urls)}"
+                ) from error
+            self.urls = urls
+            self.url_generation += 1
+            self.download_tracker.update("下载中", True)
+
+    async def watch_throughput(self, tmp: str) -> None:
+        """Refresh urls when the episode as a whole falls below stall_speed.
+
+        Each fragment has its own stall window, this catches concurrent
+        fragments that all trickle along just above it.
+        """
+        stall_timeout = Context.config.download.stall_timeout.total_seconds()
+        with Context.handle_error(f"监控 {self.dst} 下载速度错误"):
+            while self.url_refreshes < Context.config.download.max_url_refreshes:
+                generation = self.url_generation
+                downloaded = self.download_tracker.downloaded_size
+                start = self.download_tracker.get_transfer_time()
+                # 窗口只计算有请求通过限速器在传输的时间，排队等待不算停滞
+                while True:
+                    elapsed = self.download_tracker.get_transfer_time() - start
+                    if elapsed >= stall_timeout:
+                        break
+                    await asyncio.sleep(stall_timeout - elapsed)
+                speed = (self.download_tracker.downloaded_size - downloaded) / elapsed
+                if speed < Context.config.download.stall_speed:
+                    await self.refresh_urls(
+                        tmp,
+                        generation,
+                        StallError(f"episode throughput {speed:.0f}B/s: {self.dst}"),
+                    )
+
+    async def download_fragment(self, tmp: str, i: int, fn: str) -> None:
+        while True:
+            generation = self.url_generation
+            try:
+                await SimpleDownloader(
+                    self.urls[i], fn, self.download_tracker, self.src
+                ).run()
+                break
+            except (UrlExpiredError, StallError) as e:
+                await self.refresh_urls(tmp, generation, e)
+        self.finger_prints[i] = await asyncio.to_thread(
+            self.ad_block.get_finger_print, fn
+        )
+
+    def live_playlist(self) -> Optional[str]:
+        """Growing HLS playlist of the fragments downloaded so far."""
+        if self.tmp is None or self.encrypted or not self.fragments:
+            return None
+        if self.fragments_finished:
+            main = main_finger_print(self.finger_prints)
+        else:
+            main = self.ad_block.stable_main_finger_print(self.finger_prints)
+        if main is not None or self.fragments_finished:
+            for fp in self.finger_prints[len(self.live_ads) :]:
+                if fp is None:
+                    break
+                self.live_ads.append(self.ad_block.is_ad(fp, main))
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{math.ceil(max(self.durations, default=0))}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        previous = None
+        for i, ad in enumerate(self.live_ads):
+            if ad:
+                continue
+            if previous is not None and previous != i - 1:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.append(f"#EXTINF:{self.durations[i]:.3f},")
+            lines.append(f"fragment_{i}.ts")
+            previous = i
+        if self.fragments_finished:
+            lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def live_fragment_path(self, name: str) -> Optional[str]:
+        m = _LIVE_FRAGMENT_RE.match(name)
+        if self.tmp is None or m is None:
+            return None
+        i = int(m.group(1))
+        if i >= len(self.finger_prints) or self.finger_prints[i] is None:
+            return None
+        return self.fragments[i]
+
+    async def ad_block_lines(self, src_m3u8, fragments):
         with open(src_m3u8, "r") as f:
             lines = f.readlines()
             lines = [line.strip() for line in lines]
@@ -93,14 +243,16 @@ class M3U8Downloader:
                     newlines.append(fragments[current_fragment] + "\n")
                     current_fragment += 1
 
-        newlines = await self.ad_block.process_lines(newlines)
+        newlines = await self.ad_block.process_lines(newlines, self.finger_prints)
         self.ad_detected = len(
             [line for line in newlines if not line.startswith("#")]
         ) != len([line for line in lines if not line.startswith("#")])
 
         with open(src_m3u8, "w") as f:
             f.writelines(newlines)
+        return newlines
 
+    async def ffmpeg(self, src_m3u8, dst, *output_args):
         # 针对分段 TS 的必要修正：genpts + make_zero + 音频 async 对齐；视频保持 copy 以控制耗时。
         await run_cmd(
             ffmpeg_path(),
@@ -121,34 +273,111 @@ class M3U8Downloader:
             "aac",
             "-b:a",
             "128k",
+            *output_args,
             dst,
         )
 
+    async def store_mp4(self, src_m3u8):
+        splitext = os.path.splitext(self.dst)
+        tmpname = splitext[0] + ".tmp" + splitext[1]
+        await self.ffmpeg(
+            src_m3u8, tmpname, *movflags(Context.config.download.mp4_layout)
+        )
+        await aiofiles.os.replace(tmpname, self.dst)
+
+    async def store_hls(self, src_m3u8, newlines):
+        """Keep the TS segments: one concatenated .ts next to a byte-range playlist."""
+        stem = os.path.splitext(self.dst)[0]
+        ts_name = os.path.basename(stem) + ".ts"
+        tmp_ts = stem + ".tmp.ts"
+        fragment_index = {fn: i for i, fn in enumerate(self.fragments)}
+        kept = [
+            fragment_index[line.strip()]
+            for line in newlines
+            if not line.startswith("#") and line.strip() != ""
+        ]
+        if (
+            not self.encrypted
+            and kept
+            and await asyncio.to_thread(is_clean_ts, self.fragments[kept[0]])
+        ):
+            sizes = await asyncio.to_thread(
+                concat_files, [self.fragments[i] for i in kept], tmp_ts
+            )
+            playlist = hls_byterange_playlist(
+                quote(ts_name),
+                [self.durations[i] for i in kept],
+                sizes,
+                [j > 0 and kept[j - 1] != i - 1 for j, i in enumerate(kept)],
+            )
+        else:
+            tmp_m3u8 = stem + ".tmp.m3u8"
+            await self.ffmpeg(
+                src_m3u8,
+                tmp_m3u8,
+                "-f",
+                "hls",
+                "-hls_playlist_type",
+                "vod",
+                "-hls_segment_type",
+                "mpegts",
+                "-hls_flags",
+                "single_file",
+                "-hls_time",
+                "6",
+            )
+            async with aiofiles.open(tmp_m3u8, "r", encoding="utf-8") as f:
+                playlist = (await f.read()).replace(
+                    os.path.basename(tmp_ts), quote(ts_name)
+                )
+            await aiofiles.os.remove(tmp_m3u8)
+        await aiofiles.os.replace(tmp_ts, stem + ".ts")
+        tmp_playlist = stem + ".tmp.m3u8"
+        async with aiofiles.open(tmp_playlist, "w", encoding="utf-8") as f:
+            await f.write(playlist)
+        await aiofiles.os.replace(tmp_playlist, self.dst)
+
     async def run(self):
         async with aiofiles.tempfile.TemporaryDirectory(prefix="tvsurf-") as tmp:
             self.download_tracker.update("下载元信息", False)
             src_m3u8_file = os.path.join(tmp, "src.m3u8")
-            urls = await self.download_meta(src_m3u8_file)
+            self.urls = await self.download_meta(src_m3u8_file)
+            with open(src_m3u8_file, "r") as f:
+                lines = f.readlines()
+            self.durations = m3u8_fragment_durations(lines)
+            self.encrypted = any(line.startswith("#EXT-X-KEY") for line in lines)
             self.download_tracker.update("下载中", True)
-            self.download_tracker.set_fragment_count(len(urls))
-            fragments = []
-            runner = ParallelHolder(
-                max_concurrent=Context.config.download.max_concurrent_fragments
-            )
-            async with runner:
-                for i, url in enumerate(urls):
-                    fn = os.path.join(tmp, f"fragment_{i}.ts")
-                    fragments.append(fn)
-                    runner.schedule(
-                        SimpleDownloader(url, fn, self.download_tracker, self.src).run
-                    )
-                await runner.wait_all()
-            self.download_tracker.update("转码中", False)
-            splitext = os.path.splitext(self.dst)
-            tmpname = splitext[0] + ".tmp" + splitext[1]
-            await self.ffmpeg(src_m3u8_file, fragments, tmpname)
-            await aiofiles.os.replace(tmpname, self.dst)
-            self.download_tracker.update("完成", False)
+            self.download_tracker.set_fragment_count(len(self.urls))
+            self.fragments = [
+                os.path.join(tmp, f"fragment_{i}.ts") for i in range(len(self.urls))
+            ]
+            self.finger_prints = [None] * len(self.urls)
+            self.tmp = tmp
+            try:
+                runner = ParallelHolder(
+                    max_concurrent=Context.config.download.max_concurrent_fragments
+                )
+                watcher = asyncio.create_task(self.watch_throughput(tmp))
+                try:
+                    async with runner:
+                        for i, fn in enumerate(self.fragments):
+                            runner.schedule(
+                                lambda i=i, fn=fn: self.download_fragment(tmp, i, fn)
+                            )
+                        await runner.wait_all()
+                finally:
+                    watcher.cancel()
+                self.fragments_finished = True
+                self.download_tracker.update("转码中", False)
+                newlines = await self.ad_block_lines(src_m3u8_file, self.fragments)
+                if self.dst.endswith(".m3u8"):
+                    await self.store_hls(src_m3u8_file, newlines)
+                else:
+                    await self.store_mp4(src_m3u8_file)
+                self.content_hash = await asyncio.to_thread(content_hash, self.dst)
+                self.download_tracker.update("完成", False)
+            finally:
+                self.tmp = None
 
     def get_progress(self) -> DownloadProgress:
         return self.download_tracker.get_progress()
@@ -20,23 +20,75 @@ class TSFingerPrint:
         return self.time_base, self.duration, self.width, self.height
 
 
+# 直播列表在主指纹至少出现这么多次且过半后才开始判定广告
+_LIVE_STABLE_COUNT = 5
+
+
+def main_finger_print(finger_prints):
+    finger_print_count = {}
+    for fp in finger_prints:
+        if fp is None or fp.parse_error:
+            continue
+        if fp.finger_print_tuple() not in finger_print_count:
+            finger_print_count[fp.finger_print_tuple()] = 0
+        finger_print_count[fp.finger_print_tuple()] += 1
+    if not finger_print_count:
+        return None
+    return max(finger_print_count, key=lambda k: finger_print_count[k])
+
+
 class M3U8AdBlocker:
-    async def process_lines(self, lines):
-        if Context.has_data("db"):
-            adblock_db = Context.data("db").manage("adblock_db", AdBlockDB)
-        else:
-            adblock_db = None
-            Context.set_data("adblock_db", adblock_db)
+    def __init__(self):
+        self.adblock_db = None
+
+    def get_adblock_db(self):
+        if self.adblock_db is None and Context.has_data("db"):
+            self.adblock_db = Context.data("db").manage("adblock_db", AdBlockDB)
+        return self.adblock_db
+
+    def stable_main_finger_print(self, finger_prints):
+        """Main fingerprint of the fragments so far, None while it may still flip.
+
+        A pre-roll ad can be the most common fingerprint early on, so the
+        main one must be seen _LIVE_STABLE_COUNT times and in over half of
+        the fragments.
+        """
+        prefix = []
+        for fp in finger_prints:
+            if fp is None:
+                break
+            prefix.append(fp)
+        main = main_finger_print(prefix)
+        valid = [fp.finger_print_tuple() for fp in prefix if not fp.parse_error]
+        count = valid.count(main)
+        if count < _LIVE_STABLE_COUNT or count * 2 <= len(valid):
+            return None
+        return main
+
+    def is_ad(self, fp, main):
+        if fp.parse_error:
+            return True
+        adblock_db = self.get_adblock_db()
+        if adblock_db is not None and fp.md5 in adblock_db.ts_black_list:
+            return True
+        return fp.finger_print_tuple() != main
+
+    async def process_lines(self, lines, finger_prints=None):
+        adblock_db = self.get_adblock_db()
         lines = list(lines)
         ts = []
         for i, line in enumerate(lines):
-            if line.startswith("#"):
+            if line.startswith("#") or line.strip() == "":
                 continue
             ts.append(i)
 
-        finger_prints = await asyncio.gather(
-            *[asyncio.to_thread(self.get_finger_print, lines[t].strip()) for t in ts]
-        )
+        if finger_prints is None:
+            finger_prints = await asyncio.gather(
+                *[
+                    asyncio.to_thread(self.get_finger_print, lines[t].strip())
+                    for t in ts
+                ]
+            )
 
         parse_error_count = sum([1 if fp.parse_error else 0 for fp in finger_prints])
         if parse_error_count >= 3:
@@ -44,15 +96,9 @@ class M3U8AdBlocker:
                 f"too many parse error in ad block.(parse_error_count={parse_error_count})"
             )
 
-        finger_print_count = {}
-        for fp in finger_prints:
-            if fp.parse_error:
-                continue
-            if fp.finger_print_tuple() not in finger_print_count:
-                finger_print_count[fp.finger_print_tuple()] = 0
-            finger_print_count[fp.finger_print_tuple()] += 1
-
-        main_finger_print = max(finger_print_count, key=lambda k: finger_print_count[k])
+        main = main_finger_print(finger_prints)
+        if main is None:
+            raise ValueError("no valid fragment in ad block")
 
         if adblock_db is not None:
             ts_black_list = adblock_db.ts_black_list
@@ -62,10 +108,7 @@ class M3U8AdBlocker:
                 if fp.md5 in ts_black_list:
                     lines[t] = "#" + lines[t]
                     fp.filtered = True
-                if (
-                    fp.finger_print_tuple() != main_finger_print
-                    and str(t) not in ts_black_list
-                ):
+                if fp.finger_print_tuple() != main and str(t) not in ts_black_list:
                     lines[t] = "#" + lines[t]
                     fp.filtered = True
                     ts_black_list.add(fp.md5)
@@ -74,7 +117,7 @@ class M3U8AdBlocker:
             for t, fp in zip(ts, finger_prints):
                 if fp.parse_error:
                     continue
-                if fp.finger_print_tuple() != main_finger_print:
+                if fp.finger_print_tuple() != main:
                     lines[t] = "#" + lines[t]
                     fp.filtered = True
 
@@ -0,0 +1,53 @@
+import os
+import struct
+from service.lib.path import ffmpeg_path
+from service.lib.run_cmd import run_cmd
+from service.schema.config import Mp4Layout
+
+
+def movflags(layout: Mp4Layout) -> list[str]:
+    if layout == Mp4Layout.FASTSTART:
+        return ["-movflags", "+faststart"]
+    if layout == Mp4Layout.FRAGMENTED:
+        return ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
+    return []
+
+
+def read_mp4_layout(path: str) -> Mp4Layout:
+    """Detect layout from the order of top-level boxes (moov/mdat/moof)."""
+    file_size = os.path.getsize(path)
+    moov_found = False
+    with open(path, "rb") as f:
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            size, box_type = struct.unpack(">I4s", f.read(8))
+            if size == 1:
+                (size,) = struct.unpack(">Q", f.read(8))
+            elif size == 0:
+                size = file_size - offset
+            if box_type == b"moof":
+                return Mp4Layout.FRAGMENTED
+            if box_type == b"moov":
+                moov_found = True
+            if box_type == b"mdat":
+                return Mp4Layout.FASTSTART if moov_found else Mp4Layout.DEFAULT
+            if size < 8:
+                break
+            offset += size
+    return Mp4Layout.DEFAULT
+
+
+async def remux_mp4(src: str, dst: str, layout: Mp4Layout) -> None:
+    await run_cmd(
+        ffmpeg_path(),
+        "-y",
+        "-i",
+        src,
+        "-map",
+        "0",
+        "-c",
+        "copy",
+        *movflags(layout),
+        dst,
+    )
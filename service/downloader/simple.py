@@ -1,9 +1,19 @@
 from service.lib.context import Context
 from service.lib.header import HEADERS
 import aiohttp
+import asyncio
+import time
 from service.schema.downloader import DownloadProgress
 
 
+class UrlExpiredError(RuntimeError):
+    pass
+
+
+class StallError(RuntimeError):
+    pass
+
+
 class SimpleDownloader:
     def __init__(self, src, dst, download_tracker=None, referer=None):
         self.src = src
@@ -11,7 +21,40 @@ class SimpleDownloader:
         self.download_tracker = download_tracker
         self.referer = referer
 
-    async def run(self):
+    async def read_chunk(self, resp: aiohttp.ClientResponse) -> bytes:
+        stall_timeout = Context.config.download.stall_timeout.total_seconds()
+        try:
+            return await asyncio.wait_for(
+                resp.content.read(Context.config.download.chunk_size),
+                timeout=stall_timeout,
+            )
+        except asyncio.TimeoutError:
+            raise StallError(f"no data received in {stall_timeout}s: {self.src}")
+
+    async def run(self, retry=3):
+        await Context.rate_limiter.acquire(self.src, download=True)
+        self.fragment_size = None
+        self.downloaded_size = 0
+        if self.download_tracker is not None:
+            # 在限速器放行后才计入传输时间，排队不算作停滞
+            self.download_tracker.begin_transfer()
+        try:
+            rate_limited = await self.fetch(retry > 0)
+        except BaseException:
+            # 失败的尝试不计入总大小和进度，重试时重新登记
+            if self.download_tracker is not None:
+                if self.fragment_size is not None:
+                    self.download_tracker.remove_fragment(self.fragment_size)
+                self.download_tracker.remove_bytes_downloaded(self.downloaded_size)
+            raise
+        finally:
+            if self.download_tracker is not None:
+                self.download_tracker.end_transfer()
+        if rate_limited:
+            await self.run(retry - 1)
+
+    async def fetch(self, retry: bool) -> bool:
+        """Download to dst, True if rate limited and the caller should retry."""
         async with Context.client.get(
             self.src,
             headers=(
@@ -23,20 +66,42 @@ class SimpleDownloader:
                 connect=Context.config.download.connect_timeout.total_seconds(),
             ),
         ) as resp:
+            if Context.rate_limiter.feedback(self.src, resp, download=True) and retry:
+                resp.release()
+                return True
+            if resp.status in (403, 410):
+                raise UrlExpiredError(
+                    f"url expired status_code={resp.status}: {self.src}"
+                )
             content_length = resp.content_length
             downloaded_size = 0
             resp.raise_for_status()
             if self.download_tracker is not None:
                 if content_length is not None:
                     self.download_tracker.add_fragment(content_length)
+                    self.fragment_size = content_length
+            stall_timeout = Context.config.download.stall_timeout.total_seconds()
+            min_window_bytes = Context.config.download.stall_speed * stall_timeout
+            window_start = time.monotonic()
+            window_bytes = 0
             with open(self.dst, "wb") as f:
                 while True:
-                    chunk = await resp.content.read(Context.config.download.chunk_size)
+                    chunk = await self.read_chunk(resp)
                     if not chunk:
                         break
                     f.write(chunk)
                     if self.download_tracker is not None:
                         self.download_tracker.add_bytes_downloaded(len(chunk))
+                        self.downloaded_size += len(chunk)
                     downloaded_size += len(chunk)
+                    window_bytes += len(chunk)
+                    if time.monotonic() - window_start >= stall_timeout:
+                        if window_bytes < min_window_bytes:
+                            raise StallError(
+                                f"download stalled ({window_bytes} bytes in {stall_timeout}s): {self.src}"
+                            )
+                        window_start = time.monotonic()
+                        window_bytes = 0
             if self.download_tracker is not None and content_length is None:
                 self.download_tracker.add_fragment(downloaded_size)
+        return False
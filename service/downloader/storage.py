@@ -0,0 +1,49 @@
+import hashlib
+import os
+import shutil
+from urllib.parse import quote
+
+
+def episode_files(path: str) -> list[str]:
+    """All files of a stored episode: the .m3u8 playlist also owns its .ts."""
+    if path.endswith(".m3u8"):
+        return [path, os.path.splitext(path)[0] + ".ts"]
+    return [path]
+
+
+def content_hash(path: str) -> str:
+    """sha256 of the media data, the playlist of an HLS episode is not included."""
+    h = hashlib.sha256()
+    with open(episode_files(path)[-1], "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def link_file(src: str, dst: str) -> None:
+    """Hardlink src to dst, copy when the filesystem does not support it."""
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def link_episode_files(src: str, dst: str) -> None:
+    if src.endswith(".m3u8"):
+        # 播放列表通过文件名引用 .ts，需要改写后单独保存
+        src_ts = os.path.splitext(src)[0] + ".ts"
+        dst_ts = os.path.splitext(dst)[0] + ".ts"
+        link_file(src_ts, dst_ts)
+        with open(src, "r", encoding="utf-8") as f:
+            playlist = f.read()
+        src_uri = quote(os.path.basename(src_ts))
+        dst_uri = quote(os.path.basename(dst_ts))
+        playlist = "\n".join(
+            dst_uri if line == src_uri else line for line in playlist.split("\n")
+        )
+        with open(dst, "w", encoding="utf-8") as f:
+            f.write(playlist)
+    else:
+        link_file(src, dst)
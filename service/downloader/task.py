@@ -6,16 +6,20 @@ import asyncio
 from .m3u8 import M3U8Downloader
 from service.schema.downloader import DownloadProgress, DownloadProgressWithName
 
+# 解析视频地址，参数为上次下载失败的原因
+UrlResolver = Callable[[Optional[Exception]], Awaitable[str]]
+
 
 @dataclass
 class DownloadTask:
-    url: Union[Callable[[], Awaitable[str]], str]
+    url: Union[UrlResolver, str]
     dst: str
     name: str
     metadata: Any
-    on_finished: Optional[Callable[[], None]]
+    on_finished: Optional[Callable[[str], None]]
     on_error: Optional[Callable[[Exception], None]]
     on_ad_detected: Optional[Callable[[bool, Optional[float]], None]]
+    reuse: Optional[Callable[[], Awaitable[Optional[str]]]] = None
     task: Optional[asyncio.Task] = None
     downloader: Optional["TaskDownloader"] = None
 
@@ -25,6 +29,7 @@ class TaskDownloader:
         self.task = task
         self.status = "排队中"
         self.downloader: Optional[M3U8Downloader] = None
+        self.content_hash = ""
 
     def get_progress(self) -> DownloadProgress:
         if self.downloader is None:
@@ -42,24 +47,39 @@ class TaskDownloader:
             with Context.handle_error(
                 f"下载任务 {self.task.name} 错误", type="critical", rethrow=True
             ):
-                await self.run_internal()
+                if not await self.run_reuse():
+                    await self.run_internal()
                 if self.task.on_finished:
                     with Context.handle_error(f"on_finished {self.task.name} 错误"):
-                        self.task.on_finished()
+                        self.task.on_finished(self.content_hash)
         except Exception as e:
             if self.task.on_error:
                 with Context.handle_error(f"on_error {self.task.name} 错误"):
                     self.task.on_error(e)
 
+    async def run_reuse(self) -> bool:
+        if self.task.reuse is None:
+            return False
+        self.status = "复用已有文件"
+        with Context.handle_error(f"复用 {self.task.name} 错误"):
+            reused = await self.task.reuse()
+            if reused is not None:
+                self.content_hash = reused
+                self.status = "下载完成"
+                return True
+        return False
+
     async def run_internal(self) -> None:
+        error: Optional[Exception] = None
         for i in range(Context.config.download.max_retries, 0, -1):
             try:
                 await asyncio.wait_for(
-                    self.run_once(),
+                    self.run_once(error),
                     timeout=Context.config.download.download_timeout.total_seconds(),
                 )
                 break
             except Exception as e:
+                error = e
                 if i == 1:
                     raise
                 else:
@@ -68,12 +88,20 @@ class TaskDownloader:
                         Context.config.download.retry_interval.total_seconds()
                     )
 
-    async def run_once(self) -> None:
+    async def run_once(self, error: Optional[Exception] = None) -> None:
         try:
             self.status = "获取视频地址"
-            url = await self.task.url() if callable(self.task.url) else self.task.url
-            self.downloader = M3U8Downloader(url, self.task.dst)
+            if callable(self.task.url):
+                url = await self.task.url(error)
+            else:
+                url = self.task.url
+            self.downloader = M3U8Downloader(
+                url,
+                self.task.dst,
+                self.task.url if callable(self.task.url) else None,
+            )
             await self.downloader.run()
+            self.content_hash = self.downloader.content_hash
             self.status = "下载完成"
             if self.task.on_ad_detected:
                 with Context.handle_error(f"on_ad_detected {self.task.name} 错误"):
@@ -88,6 +116,7 @@ class TaskDownloader:
 class TaskDownloadManager:
     async def start(self) -> None:
         self.tasks: list[DownloadTask] = []
+        self.active_tasks: list[DownloadTask] = []
         self.runner = ParallelHolder(
             max_concurrent=Context.config.download.max_concurrent_downloads
         )
@@ -98,13 +127,14 @@ class TaskDownloadManager:
 
     def add_task(
         self,
-        url: Union[Callable[[], Awaitable[str]], str],
+        url: Union[UrlResolver, str],
         dst: str,
         name: str,
         metadata: Any,
-        on_finished: Optional[Callable[[], None]],
+        on_finished: Optional[Callable[[str], None]],
         on_error: Optional[Callable[[Exception], None]],
-        on_ad_detected: Optional[Callable[[bool, Optional[float]], None]],
+        on_ad_detected: Optional[Callable[[bool, Optional[float]], None]] = None,
+        reuse: Optional[Callable[[], Awaitable[Optional[str]]]] = None,
     ) -> None:
         task = DownloadTask(
             url=url,
@@ -114,13 +144,21 @@ class TaskDownloadManager:
             on_finished=on_finished,
             on_error=on_error,
             on_ad_detected=on_ad_detected,
+            reuse=reuse,
         )
         self.tasks.append(task)
         downloader = TaskDownloader(task)
         task.downloader = downloader
-        task.task = self.runner.schedule(downloader.run)
+        task.task = self.runner.schedule(lambda: self.run_task(task))
         task.task.add_done_callback(lambda _: self.tasks.remove(task))
 
+    async def run_task(self, task: DownloadTask) -> None:
+        self.active_tasks.append(task)
+        try:
+            await task.downloader.run()  # type: ignore
+        finally:
+            self.active_tasks.remove(task)
+
     async def remove_filtered_task(self, filter: Callable[[Any], bool]) -> None:
         remove_tasks = [task for task in self.tasks if filter(task.metadata)]
         for task in remove_tasks:
@@ -140,3 +178,14 @@ class TaskDownloadManager:
 
     def get_download_count(self) -> int:
         return len(self.tasks)
+
+    def get_downloaders(
+        self, filter: Callable[[Any], bool]
+    ) -> list[tuple[Any, M3U8Downloader]]:
+        return [
+            (task.metadata, task.downloader.downloader)
+            for task in self.active_tasks
+            if task.downloader is not None
+            and task.downloader.downloader is not None
+            and filter(task.metadata)
+        ]
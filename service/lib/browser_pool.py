@@ -0,0 +1,190 @@
+from playwright.async_api import async_playwright, Playwright, Browser
+from playwright.async_api import BrowserContext, Page
+from service.schema.config import Config
+from service.schema.monitor import BrowserPoolState
+from .path import chromium_path
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+import asyncio
+import time
+
+
+class BrowserPool:
+    """Bounded pool of warm browser pages, each in its own browser context.
+
+    Chromium is launched on first use and shut down after browser.idle_timeout
+    without any page in use. At most browser.pool_size pages are handed out,
+    a page that crashed is dropped and replaced on the next request.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.playwright: Optional[Any] = None
+        self.playwright_ctx: Optional[Playwright] = None
+        self.browser: Optional[Browser] = None
+        self.launch_lock = asyncio.Lock()
+        self.idle_task: Optional[asyncio.Task] = None
+        self.in_use = 0
+        self.last_used = time.monotonic()
+        self.launches = 0
+        self.idle: list[tuple[BrowserContext, Page]] = []
+        # in_use 变化时通知等待页面的请求
+        self.slots = asyncio.Condition()
+        self.created = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.resolved = 0
+        self.failed = 0
+        self.total_resolve = 0.0
+
+    async def get_browser(self) -> Browser:
+        self.last_used = time.monotonic()
+        async with self.launch_lock:
+            if self.browser is None:
+                await self.launch()
+            return self.browser  # type: ignore
+
+    async def launch(self) -> None:
+        try:
+            self.playwright = async_playwright()
+            self.playwright_ctx = await self.playwright.__aenter__()
+            self.browser = await self.playwright_ctx.chromium.launch(
+                executable_path=chromium_path(),
+                chromium_sandbox=False,
+            )
+            for _ in range(self.config.browser.pool_size):
+                self.idle.append(await self.create_slot())
+        except Exception:
+            await self.shutdown()
+            raise
+        self.launches += 1
+        self.idle_task = asyncio.create_task(self.idle_loop())
+
+    async def shutdown(self) -> None:
+        while self.idle:
+            context, _ = self.idle.pop()
+            await self.close_slot(context)
+        try:
+            if self.browser is not None:
+                await self.browser.close()
+        except Exception:
+            pass
+        try:
+            if self.playwright is not None:
+                await self.playwright.__aexit__(None, None, None)
+        except Exception:
+            pass
+        self.browser = None
+        self.playwright = None
+        self.playwright_ctx = None
+        self.created = 0
+
+    async def idle_loop(self) -> None:
+        while True:
+            idle_timeout = self.config.browser.idle_timeout.total_seconds()
+            await asyncio.sleep(max(min(idle_timeout, 60), 1))
+            if (
+                self.in_use == 0
+                and self.waiting == 0
+                and time.monotonic() - self.last_used > idle_timeout
+            ):
+                async with self.launch_lock:
+                    self.idle_task = None
+                    await self.shutdown()
+                return
+
+    async def stop(self) -> None:
+        if self.idle_task is not None:
+            self.idle_task.cancel()
+            await asyncio.gather(self.idle_task, return_exceptions=True)
+            self.idle_task = None
+        await self.shutdown()
+
+    async def create_slot(self) -> tuple[BrowserContext, Page]:
+        self.created += 1
+        try:
+            context = await self.browser.new_context()  # type: ignore
+            return context, await context.new_page()
+        except Exception:
+            self.created -= 1
+            raise
+
+    async def close_slot(self, context: BrowserContext) -> None:
+        self.created -= 1
+        try:
+            await context.close()
+        except Exception:
+            pass
+
+    async def release(self, slot: tuple[BrowserContext, Page]) -> None:
+        context, page = slot
+        if self.created > self.config.browser.pool_size:
+            await self.close_slot(context)
+            return
+        try:
+            await page.unroute("**/*")
+            await page.goto("about:blank")
+        except Exception:
+            # 页面已崩溃或关闭，丢弃后由下次请求重新创建
+            await self.close_slot(context)
+            return
+        self.idle.append(slot)
+
+    async def free(self) -> None:
+        async with self.slots:
+            self.in_use -= 1
+            self.slots.notify()
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        start = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self.slots:
+                await self.slots.wait_for(
+                    lambda: self.in_use < self.config.browser.pool_size
+                )
+                self.in_use += 1
+        finally:
+            self.waiting -= 1
+        try:
+            await self.get_browser()
+            slot = self.idle.pop() if self.idle else await self.create_slot()
+        except BaseException:
+            await self.free()
+            raise
+        self.acquired += 1
+        self.total_wait += time.monotonic() - start
+        try:
+            yield slot[1]
+        finally:
+            self.last_used = time.monotonic()
+            try:
+                await self.release(slot)
+            finally:
+                await self.free()
+
+    def record_resolution(self, seconds: float, ok: bool) -> None:
+        if ok:
+            self.resolved += 1
+            self.total_resolve += seconds
+        else:
+            self.failed += 1
+
+    def get_state(self) -> BrowserPoolState:
+        return BrowserPoolState(
+            running=self.browser is not None,
+            launches=self.launches,
+            size=self.config.browser.pool_size,
+            created=self.created,
+            idle=len(self.idle),
+            waiting=self.waiting,
+            acquired=self.acquired,
+            avg_wait_sec=self.total_wait / self.acquired if self.acquired else 0.0,
+            resolved=self.resolved,
+            failed=self.failed,
+            avg_resolve_sec=(
+                self.total_resolve / self.resolved if self.resolved else 0.0
+            ),
+        )
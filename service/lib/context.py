@@ -1,10 +1,13 @@
-from playwright.async_api import async_playwright, Playwright, Browser
-from typing import AsyncContextManager, Any, Optional
+from playwright.async_api import Browser
+from typing import Any, Optional
+import asyncio
 import threading
 import aiohttp
-from .path import chromium_path
 from .error_handler import ErrorHandler
 from .logger import get_logger
+from .rate_limiter import RateLimiter
+from .http_cache import HttpCache
+from .browser_pool import BrowserPool
 from service.schema.config import Config, NetworkConfig
 from service.schema.app_config import AppConfig
 import os
@@ -21,14 +24,25 @@ class ContextMeta(type):
     def current(cls) -> "Context":
         return cls._current_holder.context
 
+    async def get_browser(cls) -> Browser:
+        return await cls.current.get_browser()
+
     @property
-    def browser(cls) -> Browser:
-        return cls.current.browser
+    def browser_pool(cls) -> BrowserPool:
+        return cls.current.browser_pool
 
     @property
     def client(cls) -> aiohttp.ClientSession:
         return cls.current.client
 
+    @property
+    def rate_limiter(cls) -> RateLimiter:
+        return cls.current.rate_limiter
+
+    @property
+    def http_cache(cls) -> HttpCache:
+        return cls.current.http_cache
+
     @property
     def error_handler(cls) -> "ErrorHandler":
         return cls.current.error_handler
@@ -102,17 +116,18 @@ class Context(metaclass=ContextMeta):
             "critical", lambda title, error: self.logger.critical(f"{title}: {error}")
         )
         self.data = {}
+        self.rate_limiter = RateLimiter(self.config)
+        self.http_cache = HttpCache(
+            os.path.join(self.app_config.data_dir, "http_cache"), self.config
+        )
 
     async def __aenter__(self) -> "Context":
         self._current_holder.context = self
 
-        # playwright
-        self.playwright: AsyncContextManager[Playwright] = async_playwright()
-        self.playwright_ctx: Playwright = await self.playwright.__aenter__()
-        self.browser: Browser = await self.playwright_ctx.chromium.launch(
-            executable_path=chromium_path(),
-            chromium_sandbox=False,
-        )
+        await asyncio.to_thread(self.http_cache.start)
+
+        # 浏览器在第一次使用时才启动
+        self.browser_pool = BrowserPool(self.config)
 
         self.client = self.create_client(self.config.network)
         await self.client.__aenter__()
@@ -126,12 +141,7 @@ class Context(metaclass=ContextMeta):
         tb: Any,
     ) -> None:
         try:
-            await self.browser.close()
-        except Exception:
-            pass
-
-        try:
-            await self.playwright.__aexit__(exc_type, exc, tb)
+            await self.browser_pool.stop()
         except Exception:
             pass
 
@@ -141,6 +151,9 @@ class Context(metaclass=ContextMeta):
             pass
         del self._current_holder.context
 
+    async def get_browser(self) -> Browser:
+        return await self.browser_pool.get_browser()
+
     def create_client(self, config: NetworkConfig) -> aiohttp.ClientSession:
         ssl_context = ssl.create_default_context(cafile=certifi.where())
         resolver = aiohttp.AsyncResolver(nameservers=config.nameservers)
@@ -0,0 +1,87 @@
+from bs4 import BeautifulSoup
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Optional
+import lxml.html
+from lxml import etree
+
+from cssselect import HTMLTranslator, SelectorError
+
+
+@lru_cache(maxsize=None)
+def compile_selector(css: str) -> Optional[etree.XPath]:
+    """Precompiled XPath of a css selector, None if cssselect cannot handle it."""
+    try:
+        return etree.XPath(HTMLTranslator().css_to_xpath(css, prefix="descendant::"))
+    except (SelectorError, etree.XPathSyntaxError):
+        return None
+
+
+class LxmlText(str):
+    """Direct text node, plays the role of bs4 NavigableString in to_text."""
+
+    @property
+    def text(self) -> str:
+        return str(self)
+
+
+class LxmlNode:
+    """Subset of the bs4 Tag api used by the searchers, backed by lxml."""
+
+    def __init__(self, element: Any) -> None:
+        self.element = element
+
+    @property
+    def attrs(self) -> dict[str, str]:
+        return dict(self.element.attrib)
+
+    def has_attr(self, name: str) -> bool:
+        return name in self.element.attrib
+
+    def __getitem__(self, name: str) -> str:
+        return self.element.attrib[name]
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self.element.attrib.get(name, default)
+
+    @property
+    def text(self) -> str:
+        return self.element.text_content()
+
+    @property
+    def children(self) -> Iterator[Any]:
+        if self.element.text is not None:
+            yield LxmlText(self.element.text)
+        for child in self.element:
+            if isinstance(child.tag, str):
+                yield LxmlNode(child)
+            if child.tail is not None:
+                yield LxmlText(child.tail)
+
+    def select(self, css: str) -> list["LxmlNode"]:
+        xpath = compile_selector(css)
+        assert xpath is not None, f"unsupported selector: {css}"
+        return [LxmlNode(e) for e in xpath(self.element)]
+
+    def select_one(self, css: str) -> Optional["LxmlNode"]:
+        result = self.select(css)
+        return result[0] if result else None
+
+
+def node_html(node: Any) -> str:
+    """Markup of a node from either parser backend."""
+    if isinstance(node, LxmlNode):
+        return lxml.html.tostring(node.element, encoding="unicode")
+    return str(node)
+
+
+def parse_html(text: str, selectors: Iterable[str] = ()) -> Any:
+    """Parse with lxml when every selector compiles, otherwise BeautifulSoup.
+
+    Both results support select/select_one/[]/has_attr and to_text.
+    """
+    if all(compile_selector(css) is not None for css in selectors if css):
+        try:
+            return LxmlNode(lxml.html.document_fromstring(text))
+        except (etree.ParserError, ValueError):
+            pass
+    return BeautifulSoup(text, features="lxml")
@@ -0,0 +1,126 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+from service.schema.config import Config
+from typing import Optional
+import hashlib
+import json
+import os
+import threading
+import time
+
+# 超过该时间未刷新的页面在启动时清理
+_PRUNE_AGE = timedelta(days=7)
+
+
+@dataclass
+class CacheEntry:
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def fresh(self, max_age: timedelta) -> bool:
+        return time.time() - self.fetched_at < max_age.total_seconds()
+
+    def validators(self) -> dict[str, str]:
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HttpCache:
+    """On-disk cache of scraped pages, one json file per url.
+
+    Files are evicted least recently used first once their total size
+    exceeds search.http_cache_size. load and store run in worker threads.
+    """
+
+    def __init__(self, dir: str, config: Config) -> None:
+        self.dir = dir
+        self.config = config
+        self.lock = threading.Lock()
+        # 文件名 -> 大小，按最近使用排序
+        self.sizes: OrderedDict[str, int] = OrderedDict()
+        self.total_size = 0
+
+    def start(self) -> None:
+        """Prune stale pages and index the rest, blocking."""
+        os.makedirs(self.dir, exist_ok=True)
+        deadline = time.time() - _PRUNE_AGE.total_seconds()
+        files = []
+        for entry in os.scandir(self.dir):
+            try:
+                stat = entry.stat()
+                if stat.st_mtime < deadline or entry.name.endswith(".tmp"):
+                    os.remove(entry.path)
+                else:
+                    files.append((stat.st_mtime, entry.name, stat.st_size))
+            except OSError:
+                pass
+        with self.lock:
+            for _, name, size in sorted(files):
+                if name not in self.sizes:
+                    self.sizes[name] = size
+                    self.total_size += size
+            self.evict()
+
+    def touch(self, name: str, size: Optional[int]) -> None:
+        with self.lock:
+            self.total_size -= self.sizes.pop(name, 0)
+            if size is not None:
+                self.sizes[name] = size
+                self.total_size += size
+            self.evict()
+
+    def evict(self) -> None:
+        while self.total_size > self.config.search.http_cache_size and self.sizes:
+            name, size = self.sizes.popitem(last=False)
+            self.total_size -= size
+            try:
+                os.remove(os.path.join(self.dir, name))
+            except OSError:
+                pass
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.dir, hashlib.sha256(url.encode()).hexdigest())
+
+    def load(self, url: str) -> Optional[CacheEntry]:
+        path = self.path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("url") != url:
+            return None
+        with self.lock:
+            if os.path.basename(path) in self.sizes:
+                self.sizes.move_to_end(os.path.basename(path))
+        return CacheEntry(
+            body=data["body"],
+            etag=data.get("etag"),
+            last_modified=data.get("last_modified"),
+            fetched_at=data["fetched_at"],
+        )
+
+    def store(self, url: str, entry: CacheEntry) -> None:
+        path = self.path(url)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "url": url,
+                    "body": entry.body,
+                    "etag": entry.etag,
+                    "last_modified": entry.last_modified,
+                    "fetched_at": entry.fetched_at,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp, path)
+        self.touch(os.path.basename(path), os.path.getsize(path))
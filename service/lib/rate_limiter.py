@@ -0,0 +1,137 @@
+from service.schema.monitor import DomainRateState
+from service.schema.config import Config
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from typing import Optional
+import aiohttp
+import asyncio
+import time
+
+# 每次 429 降低速率的倍数，以及恢复速率时每次请求增加的比例
+_DECREASE_FACTOR = 0.5
+_INCREASE_RATIO = 0.05
+_MIN_RATE = 0.2
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    value = value.strip()
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class DomainLimiter:
+    """Token bucket of one domain, the rate backs off on 429 and slowly recovers."""
+
+    def __init__(
+        self, domain: str, rate: float, burst: int, download: bool = False
+    ) -> None:
+        self.domain = domain
+        self.download = download
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.requests = 0
+        self.rate_limited = 0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(
+            float(self.burst), self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.refill(now)
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.requests += 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * _INCREASE_RATIO)
+
+    def on_rate_limited(self, retry_after: Optional[float], backoff: float) -> None:
+        now = time.monotonic()
+        self.rate_limited += 1
+        self.rate = max(_MIN_RATE, self.rate * _DECREASE_FACTOR)
+        self.tokens = 0.0
+        self.updated = now
+        wait = retry_after if retry_after is not None else backoff
+        self.blocked_until = max(self.blocked_until, now + wait)
+
+    def get_state(self) -> DomainRateState:
+        return DomainRateState(
+            domain=self.domain,
+            rate=self.rate,
+            tokens=self.tokens,
+            blocked_sec=max(self.blocked_until - time.monotonic(), 0.0),
+            requests=self.requests,
+            rate_limited=self.rate_limited,
+            download=self.download,
+        )
+
+
+class RateLimiter:
+    """Per-domain limiter shared by every request made through Context.
+
+    Video downloads use their own buckets so that fragment fetches neither
+    starve page requests nor get throttled to the page rate.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.config = config
+        self.domains: dict[tuple[str, bool], DomainLimiter] = {}
+
+    def get(self, url: str, download: bool = False) -> DomainLimiter:
+        domain = urlsplit(url).hostname or ""
+        limiter = self.domains.get((domain, download))
+        if limiter is None:
+            config = self.config.rate_limit
+            if download:
+                limiter = DomainLimiter(
+                    domain, config.download_rate, config.download_burst, True
+                )
+            else:
+                limiter = DomainLimiter(domain, config.rate, config.burst)
+            self.domains[(domain, download)] = limiter
+        return limiter
+
+    async def acquire(self, url: str, download: bool = False) -> None:
+        await self.get(url, download).acquire()
+
+    def feedback(
+        self, url: str, response: aiohttp.ClientResponse, download: bool = False
+    ) -> bool:
+        """Record the response, True if the request was rate limited."""
+        limiter = self.get(url, download)
+        if response.status == 429:
+            limiter.on_rate_limited(
+                parse_retry_after(response.headers.get("Retry-After")),
+                self.config.rate_limit.backoff.total_seconds(),
+            )
+            return True
+        limiter.on_success()
+        return False
+
+    def get_state(self) -> list[DomainRateState]:
+        return [limiter.get_state() for limiter in self.domains.values()]
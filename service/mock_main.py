@@ -5,7 +5,7 @@ from aiohttp import web
 
 async def test():
     async with Context() as ctx:
-        page = await ctx.browser.new_page()
+        page = await (await ctx.get_browser()).new_page()
         await page.goto("https://baidu.com", timeout=60000)
         rst = await page.title()
         await page.close()
@@ -1,12 +1,19 @@
 from .dtype import BaseModel
-from .tvdb import Source, Series, TV, SourceUrl
+from .tvdb import Source, Series, TV, SourceUrl, StorageMode, SetupStatus
 from .downloader import DownloadProgressWithName
 from .error import Error
-from .searcher import SearchError
+from .searcher import SearchError, SubjectResult
 from typing import Optional
 from .user_data import UserTVData, Tag
 from datetime import datetime
 from .config import Config
+from .monitor import (
+    RemuxProgress,
+    DomainRateState,
+    BrowserPoolState,
+    UpdateRunStats,
+    DBSaveStats,
+)
 
 __all__ = [
     "UserInfo",
@@ -14,6 +21,9 @@ __all__ = [
     "TVDetails",
     "Echo",
     "SearchTV",
+    "SearchTVStream",
+    "SearchSubjects",
+    "GetSubjectChannels",
     "AddTV",
     "RemoveTV",
     "UpdateTVSource",
@@ -34,8 +44,10 @@ __all__ = [
     "SetWatchProgress",
     "SetTVTag",
     "SetTVTracking",
+    "SetTVStorageMode",
     "ScheduleEpisodeDownload",
     "GetMonitor",
+    "RemuxLibrary",
     "GetConfig",
     "SetConfig",
     "SetMyPassword",
@@ -56,6 +68,11 @@ class TVInfo(BaseModel):
     id: int
     name: str
     cover_url: str
+    # 缩略图的 srcset，尚未生成时为空，使用 cover_url
+    cover_srcset: str = ""
+    cover_srcset_jpeg: str = ""
+    # 后台初始化未完成时界面显示占位封面
+    setup: SetupStatus = SetupStatus.DONE
     series: list[int]
     last_update: datetime
     total_episodes: int
@@ -67,6 +84,11 @@ class TVDetails(BaseModel):
     tv: TV
     info: TVInfo
     episodes: list[Optional[str]]
+    # 下载中的剧集边下边播的 HLS 地址 (/live/{tv}/{episode}/index.m3u8)。
+    # 下载完成后该列表只会结束、不再增加分片，分片返回 404；客户端应在列表
+    # 结束时重新获取详情改用 episodes 中的地址，或访问 /live/{tv}/{episode}/
+    # 跳转到最终文件
+    live_episodes: list[Optional[str]]
 
 
 class Echo:
@@ -86,12 +108,42 @@ class SearchTV(BaseModel):
         search_error: list[SearchError]
 
 
+class SearchTVStream(BaseModel):
+    class Request(BaseModel):
+        keyword: str
+
+    class Event(BaseModel):
+        source_key: str
+        source: list[Source]
+        search_error: list[SearchError]
+        # 该站点的搜索已经结束
+        finished: bool
+
+
+class SearchSubjects(BaseModel):
+    class Request(BaseModel):
+        keyword: str
+
+    class Response(BaseModel):
+        subjects: list[SubjectResult]
+        search_error: list[SearchError]
+
+
+class GetSubjectChannels(BaseModel):
+    class Request(BaseModel):
+        subject: SubjectResult
+
+    class Response(BaseModel):
+        source: list[Source]
+
+
 class AddTV(BaseModel):
     class Request(BaseModel):
         name: str
         source: Source
         tracking: bool
         series: list[int]
+        storage_mode: StorageMode = StorageMode.MP4
 
     class Response(BaseModel):
         id: int
@@ -140,6 +192,7 @@ class GetTVDetails(BaseModel):
         tv: TV
         info: TVInfo
         episodes: list[Optional[str]]
+        live_episodes: list[Optional[str]]
 
 
 class GetMultipleTVDetails(BaseModel):
@@ -263,6 +316,15 @@ class SetTVTracking(BaseModel):
         pass
 
 
+class SetTVStorageMode(BaseModel):
+    class Request(BaseModel):
+        tv_id: int
+        mode: StorageMode
+
+    class Response(BaseModel):
+        pass
+
+
 class ScheduleEpisodeDownload(BaseModel):
     class Request(BaseModel):
         tv_id: int
@@ -279,6 +341,19 @@ class GetMonitor(BaseModel):
     class Response(BaseModel):
         download_count: int
         error_count: int
+        remux: RemuxProgress
+        rate_limit: list[DomainRateState]
+        browser_pool: BrowserPoolState
+        updater: UpdateRunStats
+        db: list[DBSaveStats]
+
+
+class RemuxLibrary(BaseModel):
+    class Request(BaseModel):
+        pass
+
+    class Response(BaseModel):
+        pass
 
 
 class GetConfig(BaseModel):
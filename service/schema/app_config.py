@@ -8,8 +8,14 @@ class ServerType(str, Enum):
     ONLINE = "online"
 
 
+class DBBackend(str, Enum):
+    JSON = "json"
+    SQLITE = "sqlite"
+
+
 class AppConfig(BaseModel):
     data_dir: str = "data"
     port: int = 9399
     server_type: ServerType = ServerType.LOCAL
     package_dir: Optional[str] = None
+    db_backend: DBBackend = DBBackend.JSON
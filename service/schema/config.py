@@ -2,6 +2,12 @@ from .dtype import BaseModel, TimeDelta, ByteSize
 from enum import Enum
 
 
+class Mp4Layout(str, Enum):
+    DEFAULT = "default"
+    FASTSTART = "faststart"
+    FRAGMENTED = "fragmented"
+
+
 class DownloadConfig(BaseModel):
     connect_timeout: TimeDelta = "1m"  # type: ignore
     chunk_size: ByteSize = "64KB"  # type: ignore
@@ -10,18 +16,60 @@ class DownloadConfig(BaseModel):
     max_retries: int = 3
     download_timeout: TimeDelta = "1h"  # type: ignore
     retry_interval: TimeDelta = "1m"  # type: ignore
+    stall_timeout: TimeDelta = "30s"  # type: ignore
+    stall_speed: ByteSize = "4KB"  # type: ignore
+    max_url_refreshes: int = 3
+    mp4_layout: Mp4Layout = Mp4Layout.FASTSTART
+    remux_interval: TimeDelta = "5s"  # type: ignore
+    remux_hls: bool = False
 
 
 class DBConfig(BaseModel):
     save_interval: TimeDelta = "10s"  # type: ignore
+    journal_compact_size: ByteSize = "1MB"  # type: ignore
 
 
 class UpdaterConfig(BaseModel):
     update_interval: TimeDelta = "1d"  # type: ignore
+    min_update_interval: TimeDelta = "1h"  # type: ignore
+    max_update_interval: TimeDelta = "7d"  # type: ignore
     tracking_timeout: TimeDelta = "14d"  # type: ignore
     update_parallel: int = 10
 
 
+class SearchConfig(BaseModel):
+    cache_ttl: TimeDelta = "10m"  # type: ignore
+    cache_size: int = 256
+    # 超过该时间仍未完成的站点先返回超时，结果在后台完成后写入缓存
+    deadline: TimeDelta = "20s"  # type: ignore
+    # 连续失败该次数后暂停搜索该站点 breaker_cooldown
+    breaker_threshold: int = 3
+    breaker_cooldown: TimeDelta = "5m"  # type: ignore
+    # 解析出的视频地址没有签名过期时间时的缓存时间
+    resource_ttl: TimeDelta = "30m"  # type: ignore
+    resource_cache_size: int = 512
+    # 网页缓存占用的磁盘空间上限，超过后删除最久未使用的页面
+    http_cache_size: ByteSize = "64MB"  # type: ignore
+
+
+class BrowserConfig(BaseModel):
+    # 预先创建的浏览器页面数，同时也是解析视频地址的最大并发数
+    pool_size: int = 2
+    # 浏览器空闲超过该时间后关闭，下次使用时重新启动
+    idle_timeout: TimeDelta = "10m"  # type: ignore
+
+
+class RateLimitConfig(BaseModel):
+    # 每个域名每秒请求数及突发上限
+    rate: float = 10
+    burst: int = 20
+    # 429 没有 Retry-After 时的等待时间
+    backoff: TimeDelta = "5s"  # type: ignore
+    # 视频分片下载单独限速，不与页面请求共用令牌
+    download_rate: float = 50
+    download_burst: int = 100
+
+
 class NetworkConfig(BaseModel):
     nameservers: list[str] = ["8.8.8.8", "8.8.4.4"]
 
@@ -31,3 +79,6 @@ class Config(BaseModel):
     download: DownloadConfig = DownloadConfig()
     db: DBConfig = DBConfig()
     network: NetworkConfig = NetworkConfig()
+    search: SearchConfig = SearchConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    browser: BrowserConfig = BrowserConfig()
@@ -1,5 +1,5 @@
 import pydantic
-from typing import Callable, Optional
+from typing import Any, Callable, Optional
 from datetime import timedelta
 from pandas import Timedelta
 from pydantic.functional_validators import AfterValidator, BeforeValidator
@@ -44,11 +44,12 @@ class BaseModel(pydantic.BaseModel):
     model_config = pydantic.ConfigDict(validate_default=True)
 
     # _commit 方法会在运行时由 DBUnit 动态添加
-    _commit: Optional[Callable[[], None]] = None
+    _commit: Optional[Callable[..., None]] = None
 
-    def commit(self):
+    def commit(self, *path: Any):
+        # path 为修改所在的字段路径，如 ("tvs", tv_id)，省略表示可能修改了任意字段
         if self._commit:
-            self._commit()
+            self._commit(*path)
 
     def merge_from(self, other: "BaseModel"):
         for field in type(self).model_fields:
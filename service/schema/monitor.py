@@ -0,0 +1,64 @@
+from .dtype import BaseModel
+from datetime import datetime
+from typing import Optional
+
+
+class RemuxProgress(BaseModel):
+    running: bool = False
+    total: int = 0
+    finished: int = 0
+    remuxed: int = 0
+    failed: int = 0
+    current: str = ""
+
+
+class DomainRateState(BaseModel):
+    domain: str
+    rate: float
+    tokens: float
+    blocked_sec: float
+    requests: int
+    rate_limited: int
+    # 视频下载的令牌桶
+    download: bool = False
+
+
+class BrowserPoolState(BaseModel):
+    running: bool
+    launches: int
+    size: int
+    created: int
+    idle: int
+    waiting: int
+    acquired: int
+    avg_wait_sec: float
+    resolved: int
+    failed: int
+    avg_resolve_sec: float
+
+
+class UpdateRunStats(BaseModel):
+    running: bool = False
+    start_time: Optional[datetime] = None
+    duration_sec: float = 0
+    checked: int = 0
+    # 频道页指纹相同，没有解析
+    unchanged: int = 0
+    no_update: int = 0
+    updated: int = 0
+    failed: int = 0
+
+
+class DBSaveStats(BaseModel):
+    name: str
+    last_save_time: Optional[datetime] = None
+    save_duration_sec: float = 0
+    # 最近一次保存写入的字节数
+    save_bytes: int = 0
+    journal_size: int = 0
+    snapshot_running: bool = False
+    snapshot_time: Optional[datetime] = None
+    snapshot_duration_sec: float = 0
+    snapshot_size: int = 0
+    # 上一次快照仍在写入而跳过的次数
+    skipped_snapshots: int = 0
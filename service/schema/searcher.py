@@ -7,6 +7,14 @@ class Subject(BaseModel):
     cover_url: str = ""
 
 
+class SubjectResult(BaseModel):
+    source_key: str
+    source_name: str
+    name: str
+    url: str
+    cover_url: str = ""
+
+
 class Channel(BaseModel):
     class Episode(BaseModel):
         name: str
@@ -21,3 +29,5 @@ class SearchError(BaseModel):
     source_name: str
     source_key: str
     error: str
+    # 站点连续失败被暂时跳过，没有实际搜索
+    degraded: bool = False
@@ -16,6 +16,21 @@ class DownloadStatus(str, Enum):
     FAILED = "failed"
 
 
+class SetupStatus(str, Enum):
+    # 添加后在后台分配剧集并获取封面
+    PENDING = "pending"
+    DONE = "done"
+    # 封面获取失败，剧集已经分配
+    COVER_FAILED = "cover_failed"
+    # 分配剧集失败，更换来源后重新分配
+    FAILED = "failed"
+
+
+class StorageMode(str, Enum):
+    MP4 = "mp4"
+    HLS = "hls"
+
+
 class Source(BaseModel):
     class Episode(BaseModel):
         source: SourceUrl
@@ -33,15 +48,27 @@ class Storage(BaseModel):
         filename: str
         status: DownloadStatus
         content_uuid: str = ""
+        content_hash: str = ""
 
     directory: str
     episodes: list["Storage.Episode"]
     cover: str
+    mode: StorageMode = StorageMode.MP4
+    # 缩略图按封面内容哈希存放在 cover_cache 中，为空表示尚未生成
+    cover_hash: str = ""
+    cover_widths: list[int] = []
+    setup: SetupStatus = SetupStatus.DONE
 
 
 class TrackStatus(BaseModel):
     tracking: bool
     last_update: datetime
+    next_update: datetime = datetime.min
+    # 连续检查没有更新的次数
+    backoff: int = 0
+    release_history: list[datetime] = []
+    # 上次检查时频道页的指纹，相同时跳过解析
+    source_fingerprint: str = ""
 
 
 class TV(BaseModel):
@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+from datetime import datetime
+from service.lib.context import Context
+from typing import Iterator, Optional
+
+
+class CircuitBreaker:
+    """Skip a searcher for a while after repeated failures.
+
+    After breaker_threshold consecutive failures the breaker opens for
+    breaker_cooldown, then a single trial request is let through, which
+    closes it again on success or reopens it on failure.
+    """
+
+    def __init__(self) -> None:
+        self.failures = 0
+        self.open_until: Optional[datetime] = None
+        self.trial = False
+
+    def allow(self) -> bool:
+        if self.open_until is None:
+            return True
+        if self.trial or datetime.now() < self.open_until:
+            return False
+        self.trial = True
+        return True
+
+    def record_failure(self) -> None:
+        self.trial = False
+        self.failures += 1
+        if self.failures >= Context.config.search.breaker_threshold:
+            self.open_until = datetime.now() + Context.config.search.breaker_cooldown
+
+    def record_success(self) -> None:
+        self.trial = False
+        self.failures = 0
+        self.open_until = None
+
+    @contextmanager
+    def attempt(self) -> Iterator[None]:
+        try:
+            yield
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # 被取消的请求不计入结果
+            self.trial = False
+            raise
+        else:
+            self.record_success()
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from datetime import datetime
+from service.lib.context import Context
+from typing import Awaitable, Callable, Generic, Hashable, Optional, TypeVar
+import asyncio
+
+V = TypeVar("V")
+
+
+class SearchCache(Generic[V]):
+    """Searcher results, LRU bounded with a TTL.
+
+    Identical concurrent requests share one upstream request, either a task
+    started by get or a future registered by begin and resolved by its caller.
+    A request cancelled before it finished is started again by the next get.
+    """
+
+    def __init__(self, cacheable: Callable[[V], bool] = lambda _: True) -> None:
+        self.cacheable = cacheable
+        self.entries: OrderedDict[Hashable, tuple[datetime, V]] = OrderedDict()
+        self.inflight: dict[Hashable, asyncio.Future[V]] = {}
+
+    def lookup(self, key: Hashable) -> Optional[V]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if datetime.now() - entry[0] > Context.config.search.cache_ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def store(self, key: Hashable, task: asyncio.Future[V]) -> None:
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.put(key, task.result())
+
+    def put(self, key: Hashable, value: V) -> None:
+        if not self.cacheable(value):
+            return
+        self.entries[key] = (datetime.now(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > Context.config.search.cache_size:
+            self.entries.popitem(last=False)
+
+    async def pending(self, key: Hashable) -> Optional[V]:
+        """Cached or in-flight value, without starting a new request."""
+        value = self.lookup(key)
+        task = self.inflight.get(key)
+        if value is None and task is not None:
+            try:
+                value = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+        return value
+
+    def begin(self, key: Hashable) -> Optional[asyncio.Future[V]]:
+        """Register a request resolved by the caller, None if one is in flight.
+
+        The caller sets the result, or cancels the future if it gives up.
+        """
+        if key in self.inflight:
+            return None
+        future: asyncio.Future[V] = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        future.add_done_callback(lambda f: self.store(key, f))
+        return future
+
+    async def get(self, key: Hashable, factory: Callable[[], Awaitable[V]]) -> V:
+        value = self.lookup(key)
+        if value is not None:
+            return value
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())  # type: ignore
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self.store(key, t))
+        try:
+            # 单个请求被取消时不影响其他等待同一结果的请求
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+        # 共享的请求被发起方取消，重新发起
+        return await self.get(key, factory)
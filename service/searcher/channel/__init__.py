@@ -1,8 +1,10 @@
 from .web_a import WebAChannelSearcher
+from .maccms_api import MaccmsApiChannelSearcher
 from .base import BaseChannelSearcher
 
 types = {
     "web_a": WebAChannelSearcher,
+    "maccms_api": MaccmsApiChannelSearcher,
 }
 
 
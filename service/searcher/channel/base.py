@@ -1,17 +1,43 @@
 from abc import abstractmethod
 from service.schema.searcher import Channel
 from service.lib.url import change_url_domain
+from service.schema.dtype import to_timedelta
+from typing import Optional
 
 
 class BaseChannelSearcher:
-    def __init__(self, domain: str = "", **kwargs):
+    def __init__(
+        self, domain: str = "", cache_max_age: Optional[str] = "10m", **kwargs
+    ):
         self.domain = domain
+        # 频道页很少变化，搜索后添加剧集时直接复用
+        self.cache_max_age = (
+            to_timedelta(cache_max_age) if cache_max_age is not None else None
+        )
 
     async def search(self, url: str) -> list[Channel]:
         if self.domain:
             url = change_url_domain(url, self.domain)
         return await self.search_impl(url)
 
+    async def prefetch(self, urls: list[str]) -> None:
+        """Hint that all urls are about to be searched, for batching apis."""
+        pass
+
+    async def search_if_changed(
+        self, url: str, fingerprint: str
+    ) -> tuple[str, Optional[list[Channel]]]:
+        """New fingerprint of the page, channels are None if it is unchanged."""
+        if self.domain:
+            url = change_url_domain(url, self.domain)
+        return await self.search_if_changed_impl(url, fingerprint)
+
+    async def search_if_changed_impl(
+        self, url: str, fingerprint: str
+    ) -> tuple[str, Optional[list[Channel]]]:
+        # 无法计算指纹时总是视为有变化
+        return "", await self.search_impl(url)
+
     @abstractmethod
     async def search_impl(self, url: str) -> list[Channel]:
         pass
@@ -0,0 +1,60 @@
+from .base import BaseChannelSearcher
+from service.lib.request import request_json
+from service.lib.url import change_url_domain
+from service.schema.searcher import Channel
+from service.searcher.maccms import (
+    check_response,
+    detail_url,
+    split_detail_url,
+    vod_channels,
+    vod_fingerprint,
+)
+from typing import Optional
+
+
+class MaccmsApiChannelSearcher(BaseChannelSearcher):
+    """Channels from the MacCMS `api.php/provide/vod?ac=detail&ids=` json."""
+
+    def __init__(self, play_from: list[str] = [], batch_size: int = 20, **kwargs):
+        super().__init__(**kwargs)
+        self.play_from = play_from
+        self.batch_size = batch_size
+        # prefetch 批量获取的结果，按详情地址索引，使用一次后丢弃
+        self.prefetched: dict[str, dict] = {}
+
+    async def prefetch(self, urls: list[str]) -> None:
+        self.prefetched = {}
+        by_endpoint: dict[str, list[str]] = {}
+        for url in urls:
+            if self.domain:
+                url = change_url_domain(url, self.domain)
+            endpoint, vod_id = split_detail_url(url)
+            if vod_id:
+                by_endpoint.setdefault(endpoint, []).append(vod_id)
+        for endpoint, ids in by_endpoint.items():
+            for i in range(0, len(ids), self.batch_size):
+                batch = ids[i : i + self.batch_size]
+                url = detail_url(endpoint, ",".join(batch))
+                for vod in check_response(await request_json(url), url):
+                    self.prefetched[detail_url(endpoint, vod.get("vod_id"))] = vod
+
+    async def get_vod(self, url: str) -> dict:
+        vod = self.prefetched.pop(url, None)
+        if vod is not None:
+            return vod
+        vods = check_response(await request_json(url, max_age=self.cache_max_age), url)
+        if len(vods) == 0:
+            raise FileNotFoundError(f"vod not found: {url}")
+        return vods[0]
+
+    async def search_impl(self, url: str) -> list[Channel]:
+        return vod_channels(await self.get_vod(url), self.play_from)
+
+    async def search_if_changed_impl(
+        self, url: str, fingerprint: str
+    ) -> tuple[str, Optional[list[Channel]]]:
+        vod = await self.get_vod(url)
+        new_fingerprint = vod_fingerprint(vod)
+        if fingerprint and new_fingerprint == fingerprint:
+            return new_fingerprint, None
+        return new_fingerprint, vod_channels(vod, self.play_from)
@@ -1,15 +1,45 @@
-from service.lib.request import request
+from service.lib.request import request_html
+from service.lib.html import node_html
 from .base import BaseChannelSearcher
 from abc import abstractmethod
+from typing import Any, Optional
+import asyncio
+import hashlib
 from bs4 import BeautifulSoup
 from service.schema.searcher import Channel
 
 
 class WebChannelSearcher(BaseChannelSearcher):
+    def selectors(self) -> list[str]:
+        return []
+
+    def fingerprint_selectors(self) -> list[str]:
+        """Sections of the page that decide the parse result."""
+        return self.selectors()
+
+    def fingerprint(self, doc: Any) -> str:
+        h = hashlib.sha256()
+        for css in self.fingerprint_selectors():
+            if not css:
+                continue
+            for node in doc.select(css):
+                h.update(node_html(node).encode("utf-8"))
+        return h.hexdigest()
+
     @abstractmethod
     def parse(self, url: str, soup: BeautifulSoup) -> list[Channel]:
         pass
 
     async def search_impl(self, url: str) -> list[Channel]:
-        soup = await request(url)
-        return self.parse(url, soup)
+        soup = await request_html(url, self.selectors(), max_age=self.cache_max_age)
+        # 长剧集的频道页解析较慢，放到线程池中执行
+        return await asyncio.to_thread(self.parse, url, soup)
+
+    async def search_if_changed_impl(
+        self, url: str, fingerprint: str
+    ) -> tuple[str, Optional[list[Channel]]]:
+        doc = await request_html(url, self.selectors(), max_age=self.cache_max_age)
+        new_fingerprint = await asyncio.to_thread(self.fingerprint, doc)
+        if fingerprint and new_fingerprint == fingerprint:
+            return new_fingerprint, None
+        return new_fingerprint, await asyncio.to_thread(self.parse, url, doc)
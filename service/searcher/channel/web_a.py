@@ -23,6 +23,19 @@ class WebAChannelSearcher(WebChannelSearcher):
         self.cover = cover
         self.cover_attr = cover_attr
 
+    def selectors(self):
+        return [
+            self.channel_names,
+            self.episode_lists,
+            self.episodes_from_list,
+            self.episode_links_from_list,
+            self.cover,
+        ]
+
+    def fingerprint_selectors(self):
+        # 剧集选择器作用于列表内部，列表本身已经包含
+        return [self.channel_names, self.episode_lists, self.cover]
+
     def parse_episode_list(self, src, list):
         episodes_tag = [i for i in list.select(self.episodes_from_list)]
         if self.episode_links_from_list:
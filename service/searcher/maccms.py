@@ -0,0 +1,72 @@
+from service.schema.searcher import Channel
+from urllib.parse import parse_qs, urlencode, urlparse, urlunparse
+from typing import Any
+import hashlib
+import json
+
+# MacCMS 播放地址中多个播放器、多个剧集、剧集名与地址之间的分隔符
+_PLAYER_SEP = "$$$"
+_EPISODE_SEP = "#"
+_NAME_SEP = "$"
+
+
+def api_url(api: str, **params: Any) -> str:
+    """`api.php/provide/vod` endpoint with extra query params."""
+    return f"{api}{'&' if '?' in api else '?'}{urlencode(params)}"
+
+
+def detail_url(api: str, vod_id: Any) -> str:
+    return api_url(api, ac="detail", ids=vod_id)
+
+
+def split_detail_url(url: str) -> tuple[str, str]:
+    """Inverse of detail_url, returns the endpoint and the vod id."""
+    parsed = urlparse(url)
+    query = parse_qs(parsed.query)
+    ids = query.pop("ids", [""])[0]
+    query.pop("ac", None)
+    endpoint = urlunparse(parsed._replace(query=urlencode(query, doseq=True)))
+    return endpoint.rstrip("?"), ids
+
+
+def check_response(data: Any, url: str) -> list[dict]:
+    if not isinstance(data, dict) or not isinstance(data.get("list"), list):
+        raise ValueError(f"unexpected maccms api response: {url}")
+    return data["list"]
+
+
+def vod_fingerprint(vod: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(
+            [vod.get("vod_pic"), vod.get("vod_play_from"), vod.get("vod_play_url")],
+            ensure_ascii=False,
+        ).encode("utf-8")
+    ).hexdigest()
+
+
+def vod_channels(vod: dict, play_from: list[str]) -> list[Channel]:
+    """Channels of a vod, only the players listed in play_from if not empty."""
+    players = (vod.get("vod_play_from") or "").split(_PLAYER_SEP)
+    urls = (vod.get("vod_play_url") or "").split(_PLAYER_SEP)
+    result = []
+    for player, episodes_str in zip(players, urls):
+        if play_from and player not in play_from:
+            continue
+        episodes = []
+        for i, item in enumerate(episodes_str.split(_EPISODE_SEP)):
+            if not item:
+                continue
+            name, sep, url = item.rpartition(_NAME_SEP)
+            if not sep:
+                name = f"第{i + 1}集"
+            if url:
+                episodes.append(Channel.Episode(name=name or f"第{i + 1}集", url=url))
+        if episodes:
+            result.append(
+                Channel(
+                    name=player, episodes=episodes, cover_url=vod.get("vod_pic") or ""
+                )
+            )
+    if len(result) == 0:
+        raise FileNotFoundError(f"No Episode Result")
+    return result
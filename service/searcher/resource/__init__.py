@@ -3,6 +3,7 @@ from .browser import BrowserResourceSearcher
 from .maccms_player import MaccmsPlayerResourceSearcher
 from .artplayer import ArtplayerResourceSearcher
 from .iyplayer_temline import IyplayerTemlineResourceSearcher
+from .maccms_api import MaccmsApiResourceSearcher
 from .base import BaseResourceSearcher
 
 types = {
@@ -11,6 +12,7 @@ types = {
     "maccms_player": MaccmsPlayerResourceSearcher,
     "artplayer": ArtplayerResourceSearcher,
     "iyplayer_temline": IyplayerTemlineResourceSearcher,
+    "maccms_api": MaccmsApiResourceSearcher,
 }
 
 
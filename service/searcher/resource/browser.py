@@ -2,8 +2,16 @@ from service.lib.context import Context
 from urllib.parse import urlparse, parse_qs
 import asyncio
 import re
+import time
 from .base import BaseResourceSearcher
 
+# 解析视频地址不需要的资源，直接中断请求
+_BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
+_BLOCKED_URL = re.compile(
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|"
+    r"googlesyndication\.com|hm\.baidu\.com|cnzz\.com|umeng\.com|51\.la"
+)
+
 
 class RequestResourceHandler:
     def __init__(self, pattern):
@@ -12,23 +20,54 @@ class RequestResourceHandler:
         self.event = asyncio.Event()
 
     async def handle_request(self, route):
-        if self.pattern.search(route.request.url):
-            self.result = route.request.url
-            self.event.set()
-        await route.continue_()
+        request = route.request
+        if self.pattern.search(request.url):
+            if self.result is None:
+                self.result = request.url
+                self.event.set()
+            # 只需要地址，不需要下载视频内容
+            await route.abort()
+        elif (
+            request.resource_type in _BLOCKED_RESOURCE_TYPES
+            or _BLOCKED_URL.search(request.url)
+            or self.event.is_set()
+        ):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def resolve(self, page, url):
+        await page.route("**/*", self.handle_request)
+        goto = asyncio.create_task(page.goto(url, timeout=60000))
+        matched = asyncio.create_task(self.event.wait())
+        try:
+            # 匹配到地址后立即返回，不等待页面加载完成
+            async with asyncio.timeout(60):
+                done, _ = await asyncio.wait(
+                    {goto, matched}, return_when=asyncio.FIRST_COMPLETED
+                )
+                if matched not in done:
+                    # 导航失败时直接报错，否则继续等待页面脚本发出请求
+                    goto.result()
+                    await matched
+            return self.result
+        finally:
+            for task in (goto, matched):
+                task.cancel()
+            await asyncio.gather(goto, matched, return_exceptions=True)
 
     @staticmethod
     async def get(url, pattern):
         result = RequestResourceHandler(pattern)
-        page = await Context.browser.new_page()
-        await page.route("**/*", result.handle_request)
-        await page.goto(url, timeout=60000)
-        await page.title()
-        try:
-            await asyncio.wait_for(result.event.wait(), timeout=60)
-            return result.result
-        finally:
-            await page.close()
+        async with Context.browser_pool.page() as page:
+            start = time.monotonic()
+            try:
+                video_url = await result.resolve(page, url)
+            except Exception:
+                Context.browser_pool.record_resolution(time.monotonic() - start, False)
+                raise
+            Context.browser_pool.record_resolution(time.monotonic() - start, True)
+            return video_url
 
 
 class BrowserResourceSearcher(BaseResourceSearcher):
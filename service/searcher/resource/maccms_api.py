@@ -0,0 +1,25 @@
+from .base import BaseResourceSearcher
+from service.lib.request import request_json
+from urllib.parse import quote
+
+
+class MaccmsApiResourceSearcher(BaseResourceSearcher):
+    """Play url from the MacCMS api episode list.
+
+    Direct links are returned as is, other players need the site's parse
+    interface, e.g. `https://jx.example.com/?url={url}`, which answers
+    json with a `url` field.
+    """
+
+    def __init__(self, parse: str = "", **kwargs):
+        super().__init__(**kwargs)
+        self.parse = parse
+
+    async def search_impl(self, url: str) -> str:
+        if not self.parse or ".m3u8" in url or ".mp4" in url:
+            return url
+        data = await request_json(self.parse.format(url=quote(url, safe="")))
+        video_url = data.get("url") if isinstance(data, dict) else None
+        if not video_url:
+            raise ValueError(f"cannot get resource: {url}")
+        return video_url
@@ -1,6 +1,7 @@
-import asyncio
 import base64
 import json
+import re
+from functools import lru_cache
 from urllib.parse import parse_qs, unquote, urlparse
 
 from service.lib.context import Context
@@ -14,7 +15,29 @@ def _b64decode(s: str) -> bytes:
     return base64.b64decode(s + "=" * pad)
 
 
+@lru_cache(maxsize=None)
+def _player_re(var_name: str) -> re.Pattern:
+    # 以变量名开头，正则引擎可以按字面量快速定位
+    return re.compile(re.escape(var_name) + r"\s*=\s*\{")
+
+
+_json_decoder = json.JSONDecoder()
+
+
 def _parse_player_object(html: str, var_name: str) -> dict:
+    # 快速路径: 正则定位对象起点，由 json 解码器确定对象结尾
+    m = _player_re(var_name).search(html)
+    if m:
+        try:
+            data, _ = _json_decoder.raw_decode(html, m.end() - 1)
+            if isinstance(data, dict):
+                return data
+        except ValueError:
+            pass
+    return _scan_player_object(html, var_name)
+
+
+def _scan_player_object(html: str, var_name: str) -> dict:
     prefix = f"var {var_name}="
     i = html.find(prefix)
     if i < 0:
@@ -84,17 +107,20 @@ class MaccmsPlayerResourceSearcher(BaseResourceSearcher):
         self.var_name = var_name
 
     async def search_impl(self, url: str, _retry: int = 3) -> str:
+        await Context.rate_limiter.acquire(url)
         async with Context.client.get(url, headers=HEADERS) as response:
-            if response.status == 429:
-                if _retry > 0:
-                    await asyncio.sleep(5)
-                    return await self.search(url, _retry - 1)
-                raise RuntimeError(f"rate limited: {url}")
-            if response.status != 200:
-                raise RuntimeError(
-                    f"cannot get play page status_code={response.status} url={url}"
-                )
-            html = await response.text()
+            rate_limited = Context.rate_limiter.feedback(url, response)
+            if not rate_limited:
+                if response.status != 200:
+                    raise RuntimeError(
+                        f"cannot get play page status_code={response.status} url={url}"
+                    )
+                html = await response.text()
+        if rate_limited:
+            # 先释放连接再等待重试
+            if _retry > 0:
+                return await self.search(url, _retry - 1)
+            raise RuntimeError(f"rate limited: {url}")
         data = _parse_player_object(html, self.var_name)
         encrypt = int(data.get("encrypt", 0))
         enc_url = data.get("url")
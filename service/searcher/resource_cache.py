@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from service.lib.context import Context
+from service.schema.tvdb import SourceUrl
+from typing import Awaitable, Callable, Optional
+from urllib.parse import parse_qsl, urlsplit
+import asyncio
+
+# 签名地址中表示过期时间 (unix 时间戳) 的参数
+_EXPIRES_PARAMS = {
+    "expires",
+    "expire",
+    "expiry",
+    "exp",
+    "e",
+    "deadline",
+    "x-expires",
+    "x-oss-expires",
+    "validto",
+}
+# 在签名过期前提前丢弃缓存，留出下载开始的时间
+_EXPIRY_MARGIN = timedelta(minutes=1)
+# 学到的有效期每经过一个 resource_ttl 翻倍，直到恢复为 resource_ttl
+_RECOVERY_CAP = 32
+
+
+def _timestamp(value: str) -> Optional[datetime]:
+    try:
+        ts = float(value)
+    except ValueError:
+        return None
+    if ts > 1e12:
+        ts /= 1000
+    if ts < 1e9:
+        return None
+    try:
+        return datetime.fromtimestamp(ts)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def signed_url_expiry(url: str) -> Optional[datetime]:
+    """Expiry carried in the query of a signed url, None if there is none."""
+    params = {k.lower(): v for k, v in parse_qsl(urlsplit(url).query)}
+    for name in _EXPIRES_PARAMS:
+        if name in params:
+            expires = _timestamp(params[name])
+            if expires is not None:
+                return expires
+    if "x-amz-date" in params and "x-amz-expires" in params:
+        try:
+            signed = datetime.strptime(params["x-amz-date"], "%Y%m%dT%H%M%SZ")
+            return signed.replace(tzinfo=timezone.utc).astimezone().replace(
+                tzinfo=None
+            ) + timedelta(seconds=int(params["x-amz-expires"]))
+        except ValueError:
+            return None
+    if "auth_key" in params:
+        # 阿里云 CDN 鉴权: timestamp-rand-uid-md5hash
+        return _timestamp(params["auth_key"].split("-", 1)[0])
+    return None
+
+
+class ResourceCache:
+    """Resolved stream urls per SourceUrl.
+
+    An entry lives until the expiry in its signed url, otherwise for
+    resource_ttl, shortened per searcher to the age at which urls of that
+    searcher were last reported as expired. The shortened ttl doubles every
+    resource_ttl until it is back to resource_ttl.
+    """
+
+    def __init__(self) -> None:
+        self.entries: OrderedDict[tuple[str, str], tuple[datetime, datetime, str]] = (
+            OrderedDict()
+        )
+        self.inflight: dict[tuple[str, str], asyncio.Task[str]] = {}
+        # source_key -> (学到的有效期, 学到的时间)
+        self.learned_ttl: dict[str, tuple[timedelta, datetime]] = {}
+
+    def ttl(self, source_key: str) -> timedelta:
+        ttl = Context.config.search.resource_ttl
+        learned = self.learned_ttl.get(source_key)
+        if learned is None:
+            return ttl
+        value, since = learned
+        growth = (datetime.now() - since) / ttl
+        recovered = value.total_seconds() * 2 ** min(growth, _RECOVERY_CAP)
+        if recovered >= ttl.total_seconds():
+            del self.learned_ttl[source_key]
+            return ttl
+        return timedelta(seconds=recovered)
+
+    def lookup(self, source: SourceUrl) -> Optional[str]:
+        key = (source.source_key, source.url)
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if datetime.now() >= entry[1]:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[2]
+
+    def put(self, source: SourceUrl, url: str) -> None:
+        now = datetime.now()
+        expires = now + self.ttl(source.source_key)
+        signed = signed_url_expiry(url)
+        if signed is not None:
+            expires = min(expires, signed - _EXPIRY_MARGIN)
+        if expires <= now:
+            return
+        key = (source.source_key, source.url)
+        self.entries[key] = (now, expires, url)
+        self.entries.move_to_end(key)
+        while len(self.entries) > Context.config.search.resource_cache_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, source: SourceUrl, expired: bool) -> None:
+        """The cached url failed, if it expired also learn how long urls live.
+
+        Other failures such as a stalled download say nothing about the url
+        lifetime, the entry is only dropped.
+        """
+        entry = self.entries.pop((source.source_key, source.url), None)
+        if not expired or entry is None or signed_url_expiry(entry[2]) is not None:
+            return
+        now = datetime.now()
+        age = now - entry[0]
+        if age < self.ttl(source.source_key):
+            self.learned_ttl[source.source_key] = (max(age, _EXPIRY_MARGIN), now)
+
+    async def get(
+        self, source: SourceUrl, resolve: Callable[[], Awaitable[str]]
+    ) -> str:
+        url = self.lookup(source)
+        if url is not None:
+            return url
+        key = (source.source_key, source.url)
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(resolve())  # type: ignore
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self.store(source, t))
+        return await asyncio.shield(task)
+
+    def store(self, source: SourceUrl, task: asyncio.Task[str]) -> None:
+        self.inflight.pop((source.source_key, source.url), None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.put(source, task.result())
@@ -3,10 +3,21 @@ from .channel import create_channel_searcher
 from .resource import create_resource_searcher
 from service.schema.tvdb import Source, SourceUrl
 import asyncio
+from dataclasses import dataclass
+from .breaker import CircuitBreaker
 from service.lib.context import Context
-from typing import Optional
+from typing import AsyncIterator, Optional
 from service.schema.searcher import SearchError
-from service.schema.searcher import Channel
+from service.schema.searcher import Channel, Subject, SubjectResult
+
+
+@dataclass
+class SourceUpdate:
+    # 没有新剧集时为 None
+    source: Optional[Source]
+    fingerprint: str
+    # 频道页与上次检查相同，跳过了解析
+    unchanged: bool = False
 
 
 class Searcher:
@@ -17,12 +28,53 @@ class Searcher:
         self.channel_searcher = create_channel_searcher(config["channel_searcher"])
         self.resource_searcher = create_resource_searcher(config["resource_searcher"])
         self.semaphore = asyncio.Semaphore(config.get("max_concurrent_requests", 3))
+        self.subject_searcher.semaphore = self.semaphore
         self.has_ad = config["has_ad"]
+        self.breaker = CircuitBreaker()
+
+    def degraded_error(self) -> Optional[SearchError]:
+        """Error to report instead of searching while the breaker is open."""
+        if self.breaker.allow():
+            return None
+        return SearchError(
+            source_key=self.key,
+            source_name=self.name,
+            error=f"连续 {self.breaker.failures} 次搜索失败，"
+            f"暂停搜索至 {self.breaker.open_until:%H:%M:%S}",
+            degraded=True,
+        )
 
     async def search_channels(self, url: str) -> list[Channel]:
         async with self.semaphore:
             return await self.channel_searcher.search(url)
 
+    def build_sources(self, subject: Subject, channels: list[Channel]) -> list[Source]:
+        return [
+            Source(
+                source=SourceUrl(
+                    source_key=self.key,
+                    source_name=self.name,
+                    channel_name=channel.name,
+                    url=subject.url,
+                ),
+                name=subject.name,
+                cover_url=subject.cover_url or channel.cover_url,
+                episodes=[
+                    Source.Episode(
+                        source=SourceUrl(
+                            source_key=self.key,
+                            source_name=self.name,
+                            channel_name=channel.name,
+                            url=e.url,
+                        ),
+                        name=e.name,
+                    )
+                    for e in channel.episodes
+                ],
+            )
+            for channel in channels
+        ]
+
     async def search_impl(self, keyword: str) -> list[Source]:
         results: list[Source] = []
         subjects = await self.subject_searcher.search(keyword)
@@ -30,36 +82,32 @@ class Searcher:
             *[self.search_channels(subject.url) for subject in subjects]
         )
         for subject, channels in zip(subjects, all_channels):
-            for channel in channels:
-                results.append(
-                    Source(
-                        source=SourceUrl(
-                            source_key=self.key,
-                            source_name=self.name,
-                            channel_name=channel.name,
-                            url=subject.url,
-                        ),
-                        name=subject.name,
-                        cover_url=subject.cover_url or channel.cover_url,
-                        episodes=[
-                            Source.Episode(
-                                source=SourceUrl(
-                                    source_key=self.key,
-                                    source_name=self.name,
-                                    channel_name=channel.name,
-                                    url=e.url,
-                                ),
-                                name=e.name,
-                            )
-                            for e in channel.episodes
-                        ],
-                    )
-                )
+            results.extend(self.build_sources(subject, channels))
         return results
 
+    async def search_stream_impl(self, keyword: str) -> AsyncIterator[list[Source]]:
+        subjects = await self.subject_searcher.search(keyword)
+
+        async def search_subject(subject: Subject) -> list[Source]:
+            return self.build_sources(subject, await self.search_channels(subject.url))
+
+        tasks = [asyncio.create_task(search_subject(subject)) for subject in subjects]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
     async def search(self, keyword: str) -> tuple[list[Source], list[SearchError]]:
+        degraded = self.degraded_error()
+        if degraded is not None:
+            return [], [degraded]
         try:
-            with Context.handle_error(f"search {self.name} {keyword}", rethrow=True):
+            with self.breaker.attempt(), Context.handle_error(
+                f"search {self.name} {keyword}", rethrow=True
+            ):
                 results = await asyncio.wait_for(self.search_impl(keyword), timeout=60)
                 return results, []
         except Exception as e:
@@ -67,16 +115,81 @@ class Searcher:
                 SearchError(source_key=self.key, source_name=self.name, error=repr(e))
             ]
 
-    async def update_source(self, source: Source) -> Optional[Source]:
-        channels = await self.channel_searcher.search(source.source.url)
+    async def search_stream(
+        self, keyword: str
+    ) -> AsyncIterator[tuple[list[Source], list[SearchError]]]:
+        """Same as search, but yields the sources of each subject once parsed."""
+        degraded = self.degraded_error()
+        if degraded is not None:
+            yield [], [degraded]
+            return
+        try:
+            with self.breaker.attempt(), Context.handle_error(
+                f"search {self.name} {keyword}", rethrow=True
+            ):
+                async with asyncio.timeout(60):
+                    async for sources in self.search_stream_impl(keyword):
+                        yield sources, []
+        except Exception as e:
+            yield [], [
+                SearchError(source_key=self.key, source_name=self.name, error=repr(e))
+            ]
+
+    async def search_subjects(
+        self, keyword: str
+    ) -> tuple[list[SubjectResult], list[SearchError]]:
+        """Only the subject listing, channels are fetched by get_subject_channels."""
+        degraded = self.degraded_error()
+        if degraded is not None:
+            return [], [degraded]
+        try:
+            with self.breaker.attempt(), Context.handle_error(
+                f"search {self.name} {keyword}", rethrow=True
+            ):
+                subjects = await asyncio.wait_for(
+                    self.subject_searcher.search(keyword), timeout=60
+                )
+                return [
+                    SubjectResult(
+                        source_key=self.key,
+                        source_name=self.name,
+                        name=subject.name,
+                        url=subject.url,
+                        cover_url=subject.cover_url,
+                    )
+                    for subject in subjects
+                ], []
+        except Exception as e:
+            return [], [
+                SearchError(source_key=self.key, source_name=self.name, error=repr(e))
+            ]
+
+    async def get_subject_channels(self, subject: SubjectResult) -> list[Source]:
+        channels = await self.search_channels(subject.url)
+        return self.build_sources(
+            Subject(name=subject.name, url=subject.url, cover_url=subject.cover_url),
+            channels,
+        )
+
+    async def prefetch_sources(self, sources: list[Source]) -> None:
+        async with self.semaphore:
+            await self.channel_searcher.prefetch([s.source.url for s in sources])
+
+    async def update_source(self, source: Source, fingerprint: str) -> SourceUpdate:
+        async with self.semaphore:
+            fingerprint, channels = await self.channel_searcher.search_if_changed(
+                source.source.url, fingerprint
+            )
+        if channels is None:
+            return SourceUpdate(source=None, fingerprint=fingerprint, unchanged=True)
         channel = next(
             (c for c in channels if c.name == source.source.channel_name), None
         )
         if channel is None:
             raise KeyError(f"channel {source.source.channel_name} not found")
         if len(source.episodes) == len(channel.episodes):
-            return None
-        return Source(
+            return SourceUpdate(source=None, fingerprint=fingerprint)
+        new_source = Source(
             source=source.source,
             name=source.name,
             cover_url=source.cover_url,
@@ -94,6 +207,7 @@ class Searcher:
                 for e in channel.episodes[len(source.episodes) :]
             ],
         )
+        return SourceUpdate(source=new_source, fingerprint=fingerprint)
 
     async def get_resource(self, url: str) -> str:
         return await self.resource_searcher.search(url)
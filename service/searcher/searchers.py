@@ -2,13 +2,25 @@ from functools import cache
 import asyncio
 from service.lib.context import Context
 from service.lib.path import searcher_config_path
-from .searcher import Searcher
+from .searcher import Searcher, SourceUpdate
+from .cache import SearchCache
+from .resource_cache import ResourceCache
 from pathlib import Path
 import json
 from service.schema.tvdb import Source
 from service.schema.tvdb import SourceUrl
-from typing import Optional
-from service.schema.searcher import SearchError
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+from service.schema.searcher import SearchError, SubjectResult
+
+T = TypeVar("T")
+
+
+def deadline_error(searcher: Searcher) -> SearchError:
+    return SearchError(
+        source_key=searcher.key,
+        source_name=searcher.name,
+        error=f"超过 {Context.config.search.deadline.total_seconds():g} 秒未完成",
+    )
 
 
 @cache
@@ -26,25 +38,209 @@ class Searchers:
         self.searcher_dict: dict[str, Searcher] = {
             searcher.key: searcher for searcher in self.searchers
         }
+        # 失败的结果不缓存，下次搜索时重试该站点
+        self.cache: SearchCache[tuple[list[Source], list[SearchError]]] = SearchCache(
+            lambda result: not result[1]
+        )
+        self.subject_cache: SearchCache[
+            tuple[list[SubjectResult], list[SearchError]]
+        ] = SearchCache(lambda result: not result[1])
+        self.channel_cache: SearchCache[list[Source]] = SearchCache()
+        self.resource_cache = ResourceCache()
+
+    async def gather_until_deadline(
+        self,
+        cache: SearchCache[tuple[list[T], list[SearchError]]],
+        keyword: str,
+        search: Callable[[Searcher], Awaitable[tuple[list[T], list[SearchError]]]],
+    ) -> tuple[list[T], list[SearchError]]:
+        """Results of every searcher that finishes before the search deadline.
+
+        Searchers still running are reported as errors, they keep running in
+        the background and their results land in the cache for the next search.
+        """
+        tasks = [
+            asyncio.ensure_future(
+                cache.get(
+                    (searcher.key, keyword), lambda searcher=searcher: search(searcher)
+                )
+            )
+            for searcher in self.searchers
+        ]
+        if tasks:
+            await asyncio.wait(
+                tasks, timeout=Context.config.search.deadline.total_seconds()
+            )
+        results: list[T] = []
+        errors: list[SearchError] = []
+        for searcher, task in zip(self.searchers, tasks):
+            if task.done():
+                results.extend(task.result()[0])
+                errors.extend(task.result()[1])
+            else:
+                # 只取消等待，缓存中的请求不受影响；超时按失败计入熔断
+                task.cancel()
+                searcher.breaker.record_failure()
+                errors.append(deadline_error(searcher))
+        return results, errors
 
     async def search(self, keyword: str) -> tuple[list[Source], list[SearchError]]:
-        results: list[tuple[list[Source], list[SearchError]]] = await asyncio.gather(
-            *[searcher.search(keyword) for searcher in self.searchers]
+        return await self.gather_until_deadline(
+            self.cache,
+            keyword.strip(),
+            lambda searcher: searcher.search(keyword.strip()),
+        )
+
+    async def search_subjects(
+        self, keyword: str
+    ) -> tuple[list[SubjectResult], list[SearchError]]:
+        return await self.gather_until_deadline(
+            self.subject_cache,
+            keyword.strip(),
+            lambda searcher: searcher.search_subjects(keyword.strip()),
         )
-        return sum([r[0] for r in results], []), sum([r[1] for r in results], [])
 
-    async def update_source(self, source: Source) -> Optional[Source]:
+    async def get_subject_channels(self, subject: SubjectResult) -> list[Source]:
+        """Channels of a subject, bounded by the search deadline.
+
+        On timeout the request keeps running and its result is cached.
+        """
+        searcher = self.searcher_dict[subject.source_key]
+        # 结果由这些字段决定，source_name 只用于展示
+        key = (subject.source_key, subject.url, subject.name, subject.cover_url)
+        deadline = Context.config.search.deadline.total_seconds()
+        try:
+            return await asyncio.wait_for(
+                self.channel_cache.get(
+                    key, lambda: searcher.get_subject_channels(subject)
+                ),
+                timeout=deadline,
+            )
+        except TimeoutError:
+            raise TimeoutError(
+                f"{searcher.name} 超过 {deadline:g} 秒未返回频道列表"
+            ) from None
+
+    async def search_stream_one(
+        self, searcher: Searcher, keyword: str
+    ) -> AsyncIterator[tuple[list[Source], list[SearchError]]]:
+        key = (searcher.key, keyword)
+        while True:
+            result = await self.cache.pending(key)
+            if result is not None:
+                yield result
+                return
+            # 登记为进行中的请求，同时发起的普通搜索等待这次结果
+            future = self.cache.begin(key)
+            if future is not None:
+                break
+        sources: list[Source] = []
+        errors: list[SearchError] = []
+        try:
+            async for partial in searcher.search_stream(keyword):
+                sources.extend(partial[0])
+                errors.extend(partial[1])
+                yield partial
+        except BaseException:
+            future.cancel()
+            raise
+        future.set_result((sources, errors))
+
+    async def search_stream(
+        self, keyword: str
+    ) -> AsyncIterator[tuple[str, list[Source], list[SearchError], bool]]:
+        """Yield (source_key, sources, errors, finished) as each searcher progresses."""
+        keyword = keyword.strip()
+        queue: asyncio.Queue[tuple[str, list[Source], list[SearchError], bool]] = (
+            asyncio.Queue()
+        )
+
+        async def run(searcher: Searcher) -> None:
+            try:
+                async for sources, errors in self.search_stream_one(searcher, keyword):
+                    queue.put_nowait((searcher.key, sources, errors, False))
+            finally:
+                queue.put_nowait((searcher.key, [], [], True))
+
+        tasks = [asyncio.create_task(run(searcher)) for searcher in self.searchers]
+        unfinished = {searcher.key: searcher for searcher in self.searchers}
+        # 不在 yield 外层使用 asyncio.timeout，超时取消会落到调用方的代码上
+        deadline = (
+            asyncio.get_running_loop().time()
+            + Context.config.search.deadline.total_seconds()
+        )
+        try:
+            while unfinished:
+                timeout = deadline - asyncio.get_running_loop().time()
+                try:
+                    event = await asyncio.wait_for(queue.get(), max(timeout, 0))
+                except TimeoutError:
+                    # 超时的站点随后被取消，按失败计入熔断
+                    for searcher in unfinished.values():
+                        searcher.breaker.record_failure()
+                    for key, searcher in unfinished.items():
+                        yield key, [], [deadline_error(searcher)], True
+                    break
+                if event[3]:
+                    unfinished.pop(event[0], None)
+                yield event
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def prefetch_sources(self, sources: list[Source]) -> None:
+        """Let searchers with a batch api fetch all sources in a few requests."""
+        by_key: dict[str, list[Source]] = {}
+        for source in sources:
+            if source.source.source_key in self.searcher_dict:
+                by_key.setdefault(source.source.source_key, []).append(source)
+
+        async def prefetch(key: str, sources: list[Source]) -> None:
+            with Context.handle_error(
+                title=f"prefetch_sources {key}",
+                key=f"prefetch_sources {key}",
+                max_ignore_count=3,
+            ):
+                await self.searcher_dict[key].prefetch_sources(sources)
+
+        await asyncio.gather(*[prefetch(k, v) for k, v in by_key.items()])
+
+    async def update_source(
+        self, source: Source, fingerprint: str = ""
+    ) -> Optional[SourceUpdate]:
+        """None if the check failed, the error is already reported."""
         with Context.handle_error(
             title=f"update_source {source.name} - {source.source.source_key}",
             key=f"update_source {source.name} - {source.source.source_key}",
             max_ignore_count=3,
         ):
             return await self.searcher_dict[source.source.source_key].update_source(
-                source
+                source, fingerprint
             )
+        return None
+
+    async def get_resource(
+        self, source: SourceUrl, refresh: bool = False, expired: bool = False
+    ) -> str:
+        """Stream url of an episode, refresh drops a cached url that failed.
+
+        expired tells that it failed because the url expired (403/410).
+        """
+        if refresh:
+            self.resource_cache.invalidate(source, expired)
+        return await self.resource_cache.get(
+            source,
+            lambda: self.searcher_dict[source.source_key].get_resource(source.url),
+        )
 
-    async def get_resource(self, source: SourceUrl) -> str:
-        return await self.searcher_dict[source.source_key].get_resource(source.url)
+    async def prefetch_resource(self, source: SourceUrl) -> None:
+        with Context.handle_error(
+            title=f"prefetch_resource {source.source_name} {source.url}",
+            key=f"prefetch_resource {source.source_key}",
+            max_ignore_count=3,
+        ):
+            await self.get_resource(source)
 
     def has_ad(self, source_key: str) -> bool:
         return self.searcher_dict[source_key].has_ad
@@ -0,0 +1,61 @@
+"""Record or replay searcher fixtures.
+
+python -m service.searcher.selftest record [key ...]
+python -m service.searcher.selftest replay [key ...]
+"""
+
+from .runner import fixture_root, record, replay, OpResult
+from service.lib.path import searcher_config_path
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+
+def print_results(key: str, results: dict[str, OpResult]) -> None:
+    for op, result in results.items():
+        size = len(result.shape) if isinstance(result.shape, list) else result.shape
+        print(
+            f"{key:<16} {op:<14} {result.elapsed_sec * 1000:>9.1f}ms "
+            f"{result.peak_memory_kib:>10.1f}KiB {result.allocated_blocks:>8} blocks  "
+            f"{size}"
+        )
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m service.searcher.selftest")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("keys", nargs="*", help="searcher keys, default all")
+    parser.add_argument("--fixtures", default=fixture_root())
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=2.0)
+    args = parser.parse_args()
+
+    with open(searcher_config_path(), "r", encoding="utf-8") as f:
+        configs = json.load(f)["searchers"]
+    configs = [c for c in configs if not args.keys or c["key"] in args.keys]
+
+    failed = False
+    for config in configs:
+        dir = os.path.join(args.fixtures, config["key"])
+        try:
+            if args.mode == "record":
+                results = await record(config, dir, args.repeat)
+                problems = []
+            else:
+                results, problems = await replay(
+                    config, dir, args.repeat, args.tolerance
+                )
+        except Exception as e:
+            print(f"{config['key']:<16} {e!r}")
+            failed = True
+            continue
+        print_results(config["key"], results)
+        for problem in problems:
+            print(f"{config['key']:<16} {problem}")
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+sys.exit(asyncio.run(main()))
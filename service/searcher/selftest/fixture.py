@@ -0,0 +1,186 @@
+from aiohttp import web
+from service.lib.context import Context
+from service.lib.http_cache import CacheEntry, HttpCache
+from service.schema.app_config import AppConfig
+from service.schema.config import NetworkConfig
+from typing import Any, Optional
+from urllib.parse import quote
+import aiohttp
+import hashlib
+import json
+import logging
+import os
+
+# 转发给上游时不需要的请求头
+_HOP_HEADERS = {"host", "connection", "accept-encoding", "content-length"}
+
+
+class FixtureStore:
+    """Recorded responses of one searcher, an index file plus one file per body."""
+
+    def __init__(self, dir: str) -> None:
+        self.dir = dir
+        self.index_path = os.path.join(dir, "pages.json")
+        self.pages: dict[str, dict] = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.pages = json.load(f)
+        # 回放时请求了但没有录制的地址
+        self.missing: list[str] = []
+
+    def body_path(self, page: dict) -> str:
+        return os.path.join(self.dir, page["file"])
+
+    def load(self, url: str) -> Optional[tuple[dict, bytes]]:
+        page = self.pages.get(url)
+        if page is None:
+            return None
+        with open(self.body_path(page), "rb") as f:
+            return page, f.read()
+
+    def store(self, url: str, status: int, content_type: str, body: bytes) -> None:
+        os.makedirs(self.dir, exist_ok=True)
+        file = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16] + ".body"
+        page = {"status": status, "content_type": content_type, "file": file}
+        with open(self.body_path(page), "wb") as f:
+            f.write(body)
+        self.pages[url] = page
+
+    def save(self) -> None:
+        os.makedirs(self.dir, exist_ok=True)
+        with open(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(self.pages, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+class StandIn:
+    """Local server answering every searcher request from a FixtureStore.
+
+    When recording, misses are fetched from the real site and stored.
+    """
+
+    def __init__(self, store: FixtureStore, upstream: Optional[Any] = None) -> None:
+        self.store = store
+        self.upstream = upstream
+        self.runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/fetch", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def url_for(self, url: str) -> str:
+        return f"{self.base_url}/fetch?url={quote(url, safe='')}"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        url = request.query["url"]
+        loaded = self.store.load(url)
+        if loaded is None and self.upstream is not None:
+            headers = {
+                k: v
+                for k, v in request.headers.items()
+                if k.lower() not in _HOP_HEADERS
+            }
+            async with self.upstream.get(url, headers=headers) as response:
+                body = await response.read()
+                self.store.store(
+                    url, response.status, response.headers.get("Content-Type", ""), body
+                )
+            loaded = self.store.load(url)
+        if loaded is None:
+            self.store.missing.append(url)
+            return web.Response(status=404, text=f"not recorded: {url}")
+        page, body = loaded
+        return web.Response(
+            status=page["status"],
+            body=body,
+            headers=(
+                {"Content-Type": page["content_type"]} if page["content_type"] else {}
+            ),
+        )
+
+
+class StandInClient:
+    """The parts of aiohttp.ClientSession used by the searchers, sent to a StandIn."""
+
+    def __init__(self, session: aiohttp.ClientSession, stand_in: StandIn) -> None:
+        self.session = session
+        self.stand_in = stand_in
+
+    async def __aenter__(self) -> "StandInClient":
+        await self.session.__aenter__()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await self.session.__aexit__(*args)
+
+    def get(self, url: str, **kwargs: Any) -> Any:
+        return self.session.get(self.stand_in.url_for(str(url)), **kwargs)
+
+
+class NoHttpCache(HttpCache):
+    """Page cache that never hits, so every run fetches from the StandIn."""
+
+    def load(self, url: str) -> Optional[CacheEntry]:
+        return None
+
+    def store(self, url: str, entry: CacheEntry) -> None:
+        pass
+
+
+class FixtureContext(Context):
+    """Context whose network goes through a StandIn, with throwaway data_dir.
+
+    Replay disables rate limiting and the page cache so timings only
+    measure the searcher.
+    """
+
+    def __init__(self, data_dir: str, store: FixtureStore, record: bool) -> None:
+        handlers = list(logging.getLogger("tv-track").handlers)
+        super().__init__(AppConfig(data_dir=data_dir))
+        self.log_handlers = [h for h in self.logger.handlers if h not in handlers]
+        if not record:
+            self.config.rate_limit.rate = 1000
+            self.config.rate_limit.burst = 1000
+        # 录制时也不使用缓存，保证每个页面都经过 StandIn 被保存
+        self.http_cache = NoHttpCache(self.http_cache.dir, self.config)
+        self.store = store
+        self.record = record
+
+    async def __aenter__(self) -> "FixtureContext":
+        self.upstream = None
+        if self.record:
+            self.upstream = super().create_client(self.config.network)
+            await self.upstream.__aenter__()
+        self.stand_in = StandIn(self.store, self.upstream)
+        await self.stand_in.start()
+        await super().__aenter__()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        await super().__aexit__(*args)
+        await self.stand_in.stop()
+        if self.upstream is not None:
+            await self.upstream.__aexit__(None, None, None)
+        for handler in self.log_handlers:
+            self.logger.removeHandler(handler)
+            handler.close()
+
+    def create_client(self, config: NetworkConfig) -> Any:
+        return StandInClient(
+            aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)),
+            self.stand_in,
+        )
+
+
+# ContextMeta 为每个类创建各自的 holder，子类需要与 Context 共用同一个
+FixtureContext._current_holder = Context._current_holder
@@ -0,0 +1,176 @@
+from .fixture import FixtureContext, FixtureStore
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from service.schema.tvdb import Source
+from service.searcher.searcher import Searcher
+from typing import Any, Awaitable, Callable, Optional
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# 回放耗时超过基准 tolerance 倍再加上该值时视为性能退化
+_TIME_SLACK_SEC = 0.05
+
+
+def fixture_root() -> str:
+    return str(Path(__file__).parent.parent.parent / "test" / "fixtures" / "searcher")
+
+
+@dataclass
+class OpResult:
+    shape: Any
+    elapsed_sec: float
+    peak_memory_kib: float
+    allocated_blocks: int
+
+
+async def measure(
+    op: Callable[[], Awaitable[Any]], shape: Callable[[Any], Any], repeat: int
+) -> tuple[Any, OpResult]:
+    """Best of repeat runs, then one more run under tracemalloc for memory."""
+    elapsed = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = await op()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        await op()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return value, OpResult(
+        shape=shape(value),
+        elapsed_sec=elapsed,
+        peak_memory_kib=peak / 1024,
+        allocated_blocks=sys.getallocatedblocks() - blocks,
+    )
+
+
+def sources_shape(sources: list[Source]) -> list[dict]:
+    return [
+        {
+            "name": s.name,
+            "channel": s.source.channel_name,
+            "url": s.source.url,
+            "episodes": len(s.episodes),
+        }
+        for s in sources
+    ]
+
+
+async def run_searcher(config: dict, repeat: int) -> dict[str, OpResult]:
+    """search, update_source and get_resource with the self_test keyword.
+
+    Every call gets a fresh Searcher so that circuit breakers do not carry
+    over between runs.
+    """
+    results: dict[str, OpResult] = {}
+
+    async def search() -> list[Source]:
+        sources, errors = await Searcher(config).search(config["self_test"]["keyword"])
+        if errors:
+            raise RuntimeError(errors[0].error)
+        return sources
+
+    sources, results["search"] = await measure(search, sources_shape, repeat)
+    source = next((s for s in sources if len(s.episodes) >= 2), None)
+    if source is None:
+        return results
+
+    # 去掉最后一集，更新时应当重新发现它
+    trimmed = source.model_copy(update={"episodes": source.episodes[:-1]})
+    _, results["update_source"] = await measure(
+        lambda: Searcher(config).update_source(trimmed, ""),
+        lambda update: len(update.source.episodes) if update.source else 0,
+        repeat,
+    )
+
+    # 浏览器解析的请求不经过 aiohttp，无法录制
+    if config["resource_searcher"]["type"] != "browser":
+        _, results["get_resource"] = await measure(
+            lambda: Searcher(config).get_resource(source.episodes[0].source.url),
+            lambda url: url,
+            repeat,
+        )
+    return results
+
+
+async def run_fixture(
+    config: dict, dir: str, record: bool, repeat: int
+) -> tuple[dict[str, OpResult], list[str]]:
+    """Results of one searcher against its fixtures and the unrecorded urls."""
+    store = FixtureStore(dir)
+    with tempfile.TemporaryDirectory() as data_dir:
+        async with FixtureContext(data_dir, store, record):
+            results = await run_searcher(config, repeat)
+    if record:
+        store.save()
+    return results, store.missing
+
+
+def expected_path(dir: str) -> str:
+    return os.path.join(dir, "expected.json")
+
+
+def load_expected(dir: str) -> Optional[dict[str, OpResult]]:
+    if not os.path.exists(expected_path(dir)):
+        return None
+    with open(expected_path(dir), "r", encoding="utf-8") as f:
+        return {k: OpResult(**v) for k, v in json.load(f).items()}
+
+
+def save_expected(dir: str, results: dict[str, OpResult]) -> None:
+    with open(expected_path(dir), "w", encoding="utf-8") as f:
+        json.dump(
+            {k: asdict(v) for k, v in results.items()},
+            f,
+            ensure_ascii=False,
+            indent=2,
+        )
+
+
+def compare(
+    expected: dict[str, OpResult], actual: dict[str, OpResult], tolerance: float
+) -> list[str]:
+    problems = []
+    for op, want in expected.items():
+        got = actual.get(op)
+        if got is None:
+            problems.append(f"{op}: not run")
+            continue
+        if got.shape != want.shape:
+            problems.append(f"{op}: result changed, {want.shape!r} -> {got.shape!r}")
+        if got.elapsed_sec > want.elapsed_sec * tolerance + _TIME_SLACK_SEC:
+            problems.append(
+                f"{op}: {got.elapsed_sec * 1000:.1f}ms, "
+                f"baseline {want.elapsed_sec * 1000:.1f}ms"
+            )
+    return problems
+
+
+async def record(config: dict, dir: str, repeat: int) -> dict[str, OpResult]:
+    """Record live pages, then replay them once to take the baseline."""
+    await run_fixture(config, dir, True, 1)
+    results, missing = await run_fixture(config, dir, False, repeat)
+    if missing:
+        raise RuntimeError(f"replay requested unrecorded urls: {missing}")
+    save_expected(dir, results)
+    return results
+
+
+async def replay(
+    config: dict, dir: str, repeat: int, tolerance: float
+) -> tuple[dict[str, OpResult], list[str]]:
+    """Results and regressions of one searcher against its recorded fixtures."""
+    expected = load_expected(dir)
+    if expected is None:
+        raise FileNotFoundError(f"no fixtures recorded in {dir}")
+    results, missing = await run_fixture(config, dir, False, repeat)
+    problems = compare(expected, results, tolerance)
+    problems.extend(f"not recorded: {url}" for url in missing)
+    return results, problems
@@ -1,8 +1,10 @@
 from .web_a import WebASubjectSearcher
+from .maccms_api import MaccmsApiSubjectSearcher
 from .base import BaseSubjectSearcher
 
 types = {
     "web_a": WebASubjectSearcher,
+    "maccms_api": MaccmsApiSubjectSearcher,
 }
 
 
@@ -1,7 +1,12 @@
 from abc import abstractmethod
 from service.schema.searcher import Subject
+from typing import Optional
+import asyncio
 
 class BaseSubjectSearcher:
+    # 由 Searcher 注入，与频道搜索共享同一个并发限制
+    semaphore: Optional[asyncio.Semaphore] = None
+
     @abstractmethod
     async def search(self, query: str) -> list[Subject]:
         pass
\ No newline at end of file
@@ -0,0 +1,58 @@
+from .base import BaseSubjectSearcher
+from service.lib.request import request_json
+from service.schema.dtype import to_timedelta
+from service.schema.searcher import Subject
+from service.searcher.maccms import api_url, check_response, detail_url
+from typing import Optional
+import asyncio
+
+
+class MaccmsApiSubjectSearcher(BaseSubjectSearcher):
+    """Search through the MacCMS `api.php/provide/vod?ac=detail&wd=` json."""
+
+    def __init__(
+        self,
+        api: str,
+        max_pages: int = 3,
+        cache_max_age: Optional[str] = None,
+    ):
+        self.api = api
+        self.max_pages = max_pages
+        self.cache_max_age = (
+            to_timedelta(cache_max_age) if cache_max_age is not None else None
+        )
+
+    async def fetch(self, query: str, page: int) -> dict:
+        url = api_url(self.api, ac="detail", wd=query, pg=page)
+        if self.semaphore is None:
+            return await request_json(url, max_age=self.cache_max_age)
+        async with self.semaphore:
+            return await request_json(url, max_age=self.cache_max_age)
+
+    async def search(self, query):
+        first = await self.fetch(query, 1)
+        try:
+            page_count = int(first.get("pagecount", 1))
+        except (TypeError, ValueError):
+            page_count = 1
+        others = await asyncio.gather(
+            *[
+                self.fetch(query, page)
+                for page in range(2, min(page_count, self.max_pages) + 1)
+            ]
+        )
+        seen: set[str] = set()
+        result: list[Subject] = []
+        for data in [first, *others]:
+            for vod in check_response(data, self.api):
+                url = detail_url(self.api, vod.get("vod_id"))
+                if url not in seen:
+                    seen.add(url)
+                    result.append(
+                        Subject(
+                            name=vod.get("vod_name") or "",
+                            url=url,
+                            cover_url=vod.get("vod_pic") or "",
+                        )
+                    )
+        return result
@@ -1,11 +1,14 @@
 from service.schema.searcher import Subject
 from urllib.parse import quote
-from service.lib.request import request
+from service.lib.request import request_html
 from abc import abstractmethod
 from bs4 import BeautifulSoup
 from .base import BaseSubjectSearcher
 from urllib.parse import urljoin
 from service.lib.request import to_text
+from service.schema.dtype import to_timedelta
+from typing import Optional
+import asyncio
 import re
 
 
@@ -16,6 +19,7 @@ class WebSubjectSearcher(BaseSubjectSearcher):
         other_page: str = "",
         other_page_filter: str = "",
         max_pages: int = 3,
+        cache_max_age: Optional[str] = None,
     ):
         self.search_url = search_url if isinstance(search_url, list) else [search_url]
         self.other_page = other_page
@@ -24,11 +28,17 @@ class WebSubjectSearcher(BaseSubjectSearcher):
         else:
             self.other_page_filter = None
         self.max_pages = max_pages
+        self.cache_max_age = (
+            to_timedelta(cache_max_age) if cache_max_age is not None else None
+        )
 
     def request_urls(self, query: str) -> list[str]:
         q = quote(query)
         return [u.format(keyword=q) for u in self.search_url]
 
+    def selectors(self) -> list[str]:
+        return [self.other_page]
+
     @abstractmethod
     def parse(self, request_url: str, soup: BeautifulSoup) -> list[Subject]:
         pass
@@ -51,14 +61,37 @@ class WebSubjectSearcher(BaseSubjectSearcher):
         result = result[: self.max_pages - 1]
         return result
 
+    async def fetch(self, url: str) -> BeautifulSoup:
+        if self.semaphore is None:
+            return await request_html(url, self.selectors(), max_age=self.cache_max_age)
+        async with self.semaphore:
+            return await request_html(url, self.selectors(), max_age=self.cache_max_age)
+
     async def search(self, query):
+        request_urls = self.request_urls(query)
+        first_soups = await asyncio.gather(*[self.fetch(u) for u in request_urls])
+        other_pages = [
+            self.get_other_pages(request_url, soup)
+            for request_url, soup in zip(request_urls, first_soups)
+        ]
+        other_soups = await asyncio.gather(
+            *[self.fetch(page) for pages in other_pages for page in pages]
+        )
+        # 解析放到线程池中，避免阻塞事件循环
+        return await asyncio.to_thread(
+            self.merge, request_urls, first_soups, other_pages, other_soups
+        )
+
+    def merge(self, request_urls, first_soups, other_pages, other_soups):
+        # 按 search_url 和页码的顺序合并，保证去重结果稳定
         seen: set[str] = set()
         merged: list[Subject] = []
-        for request_url in self.request_urls(query):
-            soups = [await request(request_url)]
-            other_pages = self.get_other_pages(request_url, soups[0])
-            for other_page in other_pages:
-                soups.append(await request(other_page))
+        offset = 0
+        for request_url, first_soup, pages in zip(
+            request_urls, first_soups, other_pages
+        ):
+            soups = [first_soup, *other_soups[offset : offset + len(pages)]]
+            offset += len(pages)
             for soup in soups:
                 for subj in self.parse(request_url, soup):
                     if subj.url not in seen:
@@ -13,6 +13,9 @@ class WebASubjectSearcher(WebSubjectSearcher):
         self.cover = cover
         self.cover_attr = cover_attr
 
+    def selectors(self):
+        return [*super().selectors(), self.token, self.a, self.cover]
+
     def parse(self, src, soup):
         tokens = soup.select(self.token)
         a_s = soup.select(self.a)
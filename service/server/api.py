@@ -25,6 +25,16 @@ def api(group: str) -> Callable[[Callable], Callable]:
     return wrapper
 
 
+def stream_api(group: str) -> Callable[[Callable], Callable]:
+    """Like api, but the handler is an async generator streamed as SSE events."""
+
+    def wrapper(func: Callable) -> Callable:
+        func.__api__ = lambda *args: _wrap_stream_api(group, *args)
+        return func
+
+    return wrapper
+
+
 def login(func: Callable) -> Callable:
     func.__api__ = _wrap_login
     return func
@@ -61,6 +71,55 @@ def _wrap_api(
     return wrapper
 
 
+def _wrap_stream_api(
+    group: str, name: str, func: Callable, context: ApiContext
+) -> Callable[[web.Request], Awaitable[web.StreamResponse]]:
+    request_type = func.__annotations__.get("request")
+    if request_type is None:
+        raise ValueError(f"Function {name} must have 'request' annotation")
+
+    async def wrapper(request: web.Request) -> web.StreamResponse:
+        try:
+            with Context.handle_error(f"API {name} 处理失败", rethrow=True):
+                token = request.cookies.get(TOKEN, None)
+                user = context.get_user(token)
+                if user is None:
+                    return web.Response(
+                        text="Unauthorized: cannot find user", status=401
+                    )
+                if group not in user.group:
+                    return web.Response(
+                        text=f"Unauthorized: user not in group {group}", status=401
+                    )
+                text = await request.text()
+                request_obj = request_type.model_validate_json(text)
+        except Exception as e:
+            return web.Response(text=repr(e), status=500)
+
+        response = web.StreamResponse(
+            headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        )
+        await response.prepare(request)
+        try:
+            with Context.handle_error(f"API {name} 处理失败", rethrow=True):
+                try:
+                    async for event in func(user, request_obj):
+                        await response.write(
+                            f"data: {event.model_dump_json()}\n\n".encode()
+                        )
+                except ConnectionResetError:
+                    # 客户端已断开，不是接口错误
+                    return response
+        except Exception as e:
+            await response.write(
+                f"event: error\ndata: {json.dumps(repr(e))}\n\n".encode()
+            )
+        await response.write_eof()
+        return response
+
+    return wrapper
+
+
 def _wrap_login(
     name: str, func: Callable, context: ApiContext
 ) -> Callable[[web.Request], Awaitable[web.Response]]:
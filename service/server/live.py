@@ -0,0 +1,82 @@
+from aiohttp import web
+from typing import Any, Callable, Optional
+from aiohttp.web import RouteDef
+from .constant import TOKEN
+
+# 下载完成后轮询列表的播放器收到的列表，没有新分片并结束
+_ENDED_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-PLAYLIST-TYPE:EVENT
+#EXT-X-TARGETDURATION:1
+#EXT-X-ENDLIST
+"""
+
+
+class LiveHandler:
+    """Serves an episode while it downloads.
+
+    {name} is index.m3u8 or one of its fragments. Once the episode has
+    finished, the top-level url without a name redirects to the final file,
+    index.m3u8 ends without further fragments and fragments are 404, so a
+    player never receives the mp4 where it expects a playlist or segment.
+    """
+
+    def __init__(
+        self,
+        get_live_source: Callable[[int, int], Any],
+        valid_token: Callable[[Optional[str]], bool],
+    ) -> None:
+        self.get_live_source = get_live_source
+        self.valid_token = valid_token
+
+    async def __call__(self, request: web.Request) -> web.StreamResponse:
+        if not self.valid_token(request.cookies.get(TOKEN, None)):
+            return web.Response(text="Unauthorized", status=401)
+        try:
+            tv_id = int(request.match_info["tv_id"])
+            episode_id = int(request.match_info["episode_id"])
+            source = self.get_live_source(tv_id, episode_id)
+        except (KeyError, IndexError, ValueError):
+            return web.Response(text="Not Found", status=404)
+        if source is None:
+            return web.Response(text="Not Found", status=404)
+        name = request.match_info.get("name", "")
+        if not name:
+            # 下载完成后切换到最终文件
+            location = source if isinstance(source, str) else "index.m3u8"
+            return web.Response(status=302, headers={"Location": location})
+        if isinstance(source, str):
+            if name == "index.m3u8":
+                return web.Response(
+                    text=_ENDED_PLAYLIST,
+                    content_type="application/vnd.apple.mpegurl",
+                    headers={"Cache-Control": "no-cache"},
+                )
+            return web.Response(text="Not Found", status=404)
+        if name == "index.m3u8":
+            playlist = source.live_playlist()
+            if playlist is None:
+                return web.Response(text="Not Found", status=404)
+            return web.Response(
+                text=playlist,
+                content_type="application/vnd.apple.mpegurl",
+                headers={"Cache-Control": "no-cache"},
+            )
+        path = source.live_fragment_path(name)
+        if path is None:
+            return web.Response(text="Not Found", status=404)
+        return web.FileResponse(path)
+
+
+def live_routes(
+    web_path: str,
+    get_live_source: Callable[[int, int], Any],
+    valid_token: Callable[[Optional[str]], bool],
+) -> list[RouteDef]:
+    if not web_path.endswith("/"):
+        web_path += "/"
+    handler = LiveHandler(get_live_source, valid_token)
+    return [
+        web.get(web_path + "{tv_id}/{episode_id}/", handler),
+        web.get(web_path + "{tv_id}/{episode_id}/{name}", handler),
+    ]
@@ -1,31 +1,47 @@
 import os
+import mimetypes
 from aiohttp import web
 from typing import Callable, Optional
 from aiohttp.web import RouteDef
 from .constant import TOKEN
 
+mimetypes.add_type("video/mp2t", ".ts")
+mimetypes.add_type("image/webp", ".webp")
+
 
 class ResourceHandler:
     def __init__(
         self,
         path: str,
         valid_token: Callable[[Optional[str]], bool],
+        immutable: bool = False,
     ) -> None:
         self.path = path
         self.valid_token = valid_token
+        self.immutable = immutable
 
     async def __call__(self, request: web.Request) -> web.StreamResponse:
         if not self.valid_token(request.cookies.get(TOKEN, None)):
             return web.Response(text="Unauthorized", status=401)
-        return web.FileResponse(os.path.join(self.path, request.match_info["path"]))
+        path = os.path.join(self.path, request.match_info["path"])
+        response = web.FileResponse(path)
+        # aiohttp 使用自己的 MimeTypes 实例，上面注册的类型需要手动设置
+        content_type = mimetypes.guess_type(path)[0]
+        if content_type is not None:
+            response.content_type = content_type
+        if self.immutable:
+            # 文件名包含内容哈希，内容不会变化
+            response.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+        return response
 
 
 def resource_routes(
     web_path: str,
     path: str,
     valid_token: Callable[[Optional[str]], bool],
+    immutable: bool = False,
 ) -> list[RouteDef]:
     if not web_path.endswith("/"):
         web_path += "/"
-    handler = ResourceHandler(path, valid_token)
+    handler = ResourceHandler(path, valid_token, immutable)
     return [web.get(web_path + "{path:.*}", handler)]
@@ -0,0 +1,158 @@
+import asyncio
+import tempfile
+import unittest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.lib.context import Context
+from service.schema.app_config import AppConfig
+from service.searcher import searchers
+from service.searcher.breaker import CircuitBreaker
+
+
+def fail(breaker: CircuitBreaker) -> None:
+    try:
+        with breaker.attempt():
+            raise RuntimeError("search failed")
+    except RuntimeError:
+        pass
+
+
+def succeed(breaker: CircuitBreaker) -> None:
+    with breaker.attempt():
+        pass
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """测试站点连续失败后的熔断与恢复"""
+
+    def run_with_context(self, test):
+        async def run():
+            with tempfile.TemporaryDirectory() as data_dir:
+                async with Context(AppConfig(data_dir=data_dir)):
+                    Context.config.search.breaker_threshold = 3
+                    test()
+
+        asyncio.run(run())
+
+    def test_opens_after_threshold(self):
+        """连续失败达到阈值后熔断，成功会清零计数"""
+
+        def test():
+            breaker = CircuitBreaker()
+            fail(breaker)
+            fail(breaker)
+            succeed(breaker)
+            fail(breaker)
+            fail(breaker)
+            self.assertTrue(breaker.allow())
+            fail(breaker)
+            self.assertFalse(breaker.allow())
+            self.assertGreater(breaker.open_until, datetime.now())
+
+        self.run_with_context(test)
+
+    def test_single_trial_after_cooldown(self):
+        """冷却后只放行一次试探，成功则关闭，失败则重新熔断"""
+
+        def test():
+            breaker = CircuitBreaker()
+            for _ in range(3):
+                fail(breaker)
+            breaker.open_until = datetime.now() - timedelta(seconds=1)
+            self.assertTrue(breaker.allow())
+            self.assertFalse(breaker.allow())
+            fail(breaker)
+            self.assertFalse(breaker.allow())
+
+            breaker.open_until = datetime.now() - timedelta(seconds=1)
+            self.assertTrue(breaker.allow())
+            succeed(breaker)
+            self.assertIsNone(breaker.open_until)
+            self.assertEqual(breaker.failures, 0)
+            self.assertTrue(breaker.allow())
+
+        self.run_with_context(test)
+
+    def test_cancel_is_not_counted(self):
+        """被取消的请求不计入失败，但结束试探"""
+
+        def test():
+            breaker = CircuitBreaker()
+            for _ in range(3):
+                fail(breaker)
+            breaker.open_until = datetime.now() - timedelta(seconds=1)
+            self.assertTrue(breaker.allow())
+            with self.assertRaises(asyncio.CancelledError):
+                with breaker.attempt():
+                    raise asyncio.CancelledError()
+            self.assertEqual(breaker.failures, 3)
+            self.assertTrue(breaker.allow())
+
+        self.run_with_context(test)
+
+    def test_record_failure(self):
+        """超时取消的站点通过 record_failure 计入失败"""
+
+        def test():
+            breaker = CircuitBreaker()
+            for _ in range(3):
+                breaker.record_failure()
+            self.assertFalse(breaker.allow())
+            breaker.record_success()
+            self.assertTrue(breaker.allow())
+
+        self.run_with_context(test)
+
+    def test_deadline_counts_as_failure(self):
+        """搜索超过截止时间的站点在普通搜索和流式搜索中都计入失败"""
+
+        async def slow(keyword):
+            await asyncio.sleep(10)
+            return [], []
+
+        async def slow_stream(keyword):
+            await asyncio.sleep(10)
+            yield [], []
+
+        async def run():
+            with tempfile.TemporaryDirectory() as data_dir:
+                async with Context(AppConfig(data_dir=data_dir)):
+                    Context.config.search.breaker_threshold = 3
+                    Context.config.search.deadline = timedelta(seconds=0.05)
+                    searcher = SimpleNamespace(
+                        key="a",
+                        name="a",
+                        breaker=CircuitBreaker(),
+                        search=slow,
+                        search_subjects=slow,
+                        search_stream=slow_stream,
+                    )
+                    with mock.patch.object(
+                        searchers, "searcher_list", return_value=[searcher]
+                    ):
+                        instance = searchers.Searchers()
+                    _, errors = await instance.search("x")
+                    self.assertEqual(len(errors), 1)
+                    self.assertEqual(searcher.breaker.failures, 1)
+                    await instance.search_subjects("x")
+                    self.assertEqual(searcher.breaker.failures, 2)
+                    async for _ in instance.search_stream("y"):
+                        pass
+                    self.assertEqual(searcher.breaker.failures, 3)
+                    self.assertFalse(searcher.breaker.allow())
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
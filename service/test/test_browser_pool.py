@@ -0,0 +1,127 @@
+import asyncio
+import unittest
+import sys
+from pathlib import Path
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.lib.browser_pool import BrowserPool
+from service.schema.config import Config
+
+
+class FakePage:
+    def __init__(self) -> None:
+        self.crashed = False
+
+    async def unroute(self, url: str) -> None:
+        pass
+
+    async def goto(self, url: str) -> None:
+        if self.crashed:
+            raise RuntimeError("Target crashed")
+
+
+class FakeContext:
+    def __init__(self, browser: "FakeBrowser") -> None:
+        self.browser = browser
+
+    async def new_page(self) -> FakePage:
+        return FakePage()
+
+    async def close(self) -> None:
+        self.browser.open -= 1
+
+
+class FakeBrowser:
+    def __init__(self) -> None:
+        self.open = 0
+        self.max_open = 0
+
+    async def new_context(self) -> FakeContext:
+        self.open += 1
+        self.max_open = max(self.max_open, self.open)
+        return FakeContext(self)
+
+    async def close(self) -> None:
+        pass
+
+
+class TestBrowserPool(unittest.TestCase):
+    """测试浏览器页面池的并发上限与崩溃页面的替换"""
+
+    def make_pool(self, size: int) -> tuple[BrowserPool, FakeBrowser]:
+        config = Config()
+        config.browser.pool_size = size
+        pool = BrowserPool(config)
+        browser = FakeBrowser()
+        pool.browser = browser  # type: ignore
+        return pool, browser
+
+    def test_crashed_pages_wake_waiters(self):
+        """N 个页面全部崩溃时，N+1 个等待者都能拿到新页面"""
+
+        async def run_test():
+            size = 2
+            pool, browser = self.make_pool(size)
+            finished = []
+
+            async def use(i: int):
+                async with pool.page() as page:
+                    await asyncio.sleep(0.01)
+                    page.crashed = True
+                finished.append(i)
+
+            await asyncio.wait_for(
+                asyncio.gather(*[use(i) for i in range(size + 1)]), 1
+            )
+            self.assertEqual(sorted(finished), list(range(size + 1)))
+            self.assertLessEqual(browser.max_open, size)
+            self.assertEqual(pool.in_use, 0)
+            self.assertEqual(pool.created, 0)
+
+        asyncio.run(run_test())
+
+    def test_pages_are_reused(self):
+        """正常归还的页面被复用，并发数不超过 pool_size"""
+
+        async def run_test():
+            pool, browser = self.make_pool(2)
+            pages = []
+
+            async def use():
+                async with pool.page() as page:
+                    pages.append(page)
+                    await asyncio.sleep(0.01)
+
+            await asyncio.gather(*[use() for _ in range(6)])
+            self.assertEqual(len(set(map(id, pages))), 2)
+            self.assertEqual(browser.max_open, 2)
+            self.assertEqual(pool.get_state().idle, 2)
+
+        asyncio.run(run_test())
+
+    def test_failed_create_frees_slot(self):
+        """创建页面失败时释放名额"""
+
+        async def run_test():
+            pool, browser = self.make_pool(1)
+
+            async def broken():
+                raise RuntimeError("new_context failed")
+
+            browser.new_context = broken  # type: ignore
+            with self.assertRaises(RuntimeError):
+                async with pool.page():
+                    pass
+            self.assertEqual(pool.in_use, 0)
+            self.assertEqual(pool.created, 0)
+
+        asyncio.run(run_test())
+
+
+if __name__ == "__main__":
+    unittest.main()
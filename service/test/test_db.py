@@ -0,0 +1,208 @@
+import asyncio
+import copy
+import os
+import tempfile
+import threading
+import unittest
+import sys
+from pathlib import Path
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.lib.context import Context
+from service.schema.app_config import AppConfig
+from service.schema.dtype import BaseModel
+from service.tracker.db import DBUnit, apply, diff
+
+
+class Item(BaseModel):
+    name: str
+    values: list[int] = []
+
+
+class Store(BaseModel):
+    items: dict[int, Item] = {}
+    order: list[str] = []
+    count: int = 0
+
+
+def dump(unit: DBUnit) -> dict:
+    return unit.data.model_dump(mode="json")
+
+
+def edit(store: Store, step: int) -> None:
+    """One of a sequence of edits that appends, truncates, sets and deletes."""
+    if step % 4 == 0:
+        store.items[step] = Item(name=f"item {step}", values=[step])
+        store.commit("items", step)
+    elif step % 4 == 1:
+        item = store.items[step - 1]
+        item.values = item.values + [step, step + 1]
+        store.commit("items", step - 1)
+    elif step % 4 == 2:
+        store.items[step - 2].values = store.items[step - 2].values[:1]
+        store.order.append(str(step))
+        store.commit("items", step - 2)
+        store.commit("order")
+    else:
+        if step >= 7:
+            del store.items[step - 7]
+            store.commit("items", step - 7)
+        store.count = step
+        store.commit()
+
+
+class TestDB(unittest.TestCase):
+    """测试 json 快照加日志的存储"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.filename = os.path.join(self.dir.name, "store.json")
+
+    def reopen(self, unit: DBUnit) -> DBUnit:
+        if unit.journal is not None:
+            unit.journal.close()
+        return DBUnit(self.filename, Store)
+
+    def test_diff_apply_round_trip(self):
+        """diff 生成的操作应用到旧值上得到新值"""
+        cases = [
+            ({"a": 1, "b": [1, 2, 3]}, {"a": 2, "b": [1, 5]}),
+            ({"a": {"x": 1}}, {"c": None}),
+            ({"l": [{"k": 1}, {"k": 2}]}, {"l": [{"k": 1}, {"k": 3}, {"k": 4}]}),
+            ({"l": []}, {"l": [1]}),
+            ({"l": [1]}, {"l": []}),
+            ([1, 2], {"a": 1}),
+        ]
+        for old, new in cases:
+            with self.subTest(old=old, new=new):
+                ops: list[dict] = []
+                diff(old, new, [], ops)
+                result = copy.deepcopy(old)
+                for op in ops:
+                    result = apply(result, op)
+                self.assertEqual(result, new)
+                # 重复应用结果不变
+                for op in ops:
+                    result = apply(result, op)
+                self.assertEqual(result, new)
+
+    def test_journal_round_trip(self):
+        """保存写入日志，重新打开时回放得到相同数据并合并进快照"""
+        unit = DBUnit(self.filename, Store)
+        for step in range(12):
+            edit(unit.data, step)
+            unit.save()
+        self.assertGreater(unit.journal_size(), 0)
+        expected = dump(unit)
+        unit = self.reopen(unit)
+        self.assertEqual(dump(unit), expected)
+        self.assertFalse(os.path.exists(unit.journal_filename))
+
+    def test_torn_last_line(self):
+        """最后一行写入不完整时回放到上一次完整的保存"""
+        unit = DBUnit(self.filename, Store)
+        for step in range(6):
+            edit(unit.data, step)
+            unit.save()
+        expected = dump(unit)
+        edit(unit.data, 6)
+        unit.save()
+        unit.journal.close()
+        with open(unit.journal_filename, "rb+") as f:
+            f.truncate(os.path.getsize(unit.journal_filename) - 5)
+        unit = DBUnit(self.filename, Store)
+        self.assertEqual(dump(unit), expected)
+
+        # 截断的记录被丢弃后，新的保存可以正常追加
+        edit(unit.data, 6)
+        unit.save()
+        expected = dump(unit)
+        self.assertEqual(dump(self.reopen(unit)), expected)
+
+    def test_crash_between_snapshot_and_truncate(self):
+        """快照写完但日志未截断时，日志在快照上重放结果不变"""
+        unit = DBUnit(self.filename, Store)
+        for step in range(12):
+            edit(unit.data, step)
+            unit.save()
+        expected = dump(unit)
+        unit.write_snapshot(unit.saved)
+        unit = self.reopen(unit)
+        self.assertEqual(dump(unit), expected)
+
+    def test_compact_keeps_appends_during_snapshot(self):
+        """写快照期间追加的记录保留在日志中"""
+
+        async def run_test():
+            unit = DBUnit(self.filename, Store)
+            for step in range(4):
+                edit(unit.data, step)
+                unit.save()
+            writing = threading.Event()
+            release = threading.Event()
+            write_snapshot = unit.write_snapshot
+
+            def slow_write_snapshot(saved):
+                writing.set()
+                release.wait(5)
+                write_snapshot(saved)
+
+            unit.write_snapshot = slow_write_snapshot  # type: ignore
+            compact = asyncio.create_task(unit.compact())
+            await asyncio.to_thread(writing.wait, 5)
+            before = unit.journal_size()
+            for step in range(4, 12):
+                edit(unit.data, step)
+                unit.save()
+            appended = unit.journal_size() - before
+            release.set()
+            await compact
+            self.assertEqual(unit.journal_size(), appended)
+            self.assertEqual(os.path.getsize(unit.journal_filename), appended)
+
+            # 追加的记录写入重新打开的日志之后
+            edit(unit.data, 12)
+            unit.save()
+            expected = dump(unit)
+            unit = self.reopen(unit)
+            self.assertEqual(dump(unit), expected)
+
+        async def run():
+            async with Context(AppConfig(data_dir=self.dir.name)):
+                await run_test()
+
+        asyncio.run(run())
+
+    def test_need_compact(self):
+        """日志超过快照和 journal_compact_size 后需要压缩"""
+
+        async def run_test():
+            Context.config.db.journal_compact_size = 0
+            unit = DBUnit(self.filename, Store)
+            self.assertFalse(unit.need_compact())
+            step = 0
+            while not unit.need_compact():
+                edit(unit.data, step)
+                unit.save()
+                step += 1
+            await unit.compact()
+            self.assertFalse(unit.need_compact())
+            self.assertFalse(os.path.exists(unit.journal_filename))
+            expected = dump(unit)
+            self.assertEqual(dump(self.reopen(unit)), expected)
+
+        async def run():
+            async with Context(AppConfig(data_dir=self.dir.name)):
+                await run_test()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
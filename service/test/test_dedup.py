@@ -0,0 +1,102 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.lib.context import Context
+from service.schema.app_config import AppConfig
+from service.schema.tvdb import (
+    TV,
+    TVDB,
+    DownloadStatus,
+    Source,
+    SourceUrl,
+    Storage,
+    TrackStatus,
+)
+from service.tracker.dedup import EpisodeIndex
+from service.tracker.path import get_episode_path, get_tv_path
+
+
+def make_tv(tv_id: int, status: DownloadStatus, content_hash: str) -> TV:
+    source = SourceUrl(
+        source_key="a", source_name="a", channel_name="c", url="https://a/1"
+    )
+    return TV(
+        id=tv_id,
+        name=f"tv {tv_id}",
+        source=Source(
+            source=source,
+            name=f"tv {tv_id}",
+            cover_url="",
+            episodes=[Source.Episode(source=source, name="1")],
+        ),
+        storage=Storage(
+            directory=f"tv{tv_id}",
+            episodes=[
+                Storage.Episode(
+                    name="1",
+                    filename="1.mp4",
+                    status=status,
+                    content_hash=content_hash,
+                )
+            ],
+            cover="",
+        ),
+        track=TrackStatus(tracking=False, last_update=datetime.now()),
+        series=[],
+    )
+
+
+class TestEpisodeIndex(unittest.TestCase):
+    """测试按来源地址和内容哈希复用已下载的剧集"""
+
+    def test_reuse_trusts_recorded_hash(self):
+        """复用时使用登记的哈希，不重新读取文件"""
+
+        async def run_test():
+            tvdb = TVDB()
+            tvdb.tvs[1] = make_tv(1, DownloadStatus.SUCCESS, "h1")
+            tvdb.tvs[2] = make_tv(2, DownloadStatus.RUNNING, "")
+            for tv in tvdb.tvs.values():
+                os.makedirs(get_tv_path(tv))
+            with open(get_episode_path(tvdb.tvs[1], 0), "wb") as f:
+                f.write(b"video")
+            index = EpisodeIndex(tvdb)
+            self.assertEqual(index.index, {("a", "https://a/1"): {"h1": {(1, 0)}}})
+
+            # 文件内容与登记的哈希不符，重新计算哈希就无法复用
+            self.assertEqual(await index.reuse(2, 0), "h1")
+            with open(get_episode_path(tvdb.tvs[2], 0), "rb") as f:
+                self.assertEqual(f.read(), b"video")
+
+        async def run():
+            with tempfile.TemporaryDirectory() as data_dir:
+                async with Context(AppConfig(data_dir=data_dir)):
+                    await run_test()
+
+        asyncio.run(run())
+
+    def test_stale_entry_ignored(self):
+        """剧集重新下载后内容哈希变化，旧的索引项不再使用"""
+        tvdb = TVDB()
+        tvdb.tvs[1] = make_tv(1, DownloadStatus.SUCCESS, "h1")
+        tvdb.tvs[2] = make_tv(2, DownloadStatus.RUNNING, "")
+        index = EpisodeIndex(tvdb)
+        tvdb.tvs[1].storage.episodes[0].content_hash = "h2"
+        self.assertIsNone(index.find(2, 0))
+        index.add(1, 0)
+        self.assertEqual(index.find(2, 0), (1, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,14 +10,14 @@ from datetime import timedelta
 url = "https://love.girigirilove.net/zijian/anime/2024/12/1224/OoyasanwaShishunki/01/playlist.m3u8"
 
 
-async def download_task_v1():
+async def download_task_v1(error=None):
     return url
 
 
 c = 0
 
 
-async def download_task_v2():
+async def download_task_v2(error=None):
     global c
     c += 1
     if c == 1:
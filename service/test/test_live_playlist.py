@@ -0,0 +1,130 @@
+import asyncio
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from service.lib.context import Context
+from service.server.live import live_routes
+from service.schema.app_config import AppConfig
+from service.downloader.m3u8 import M3U8Downloader
+from service.downloader.m3u8_adblocker import TSFingerPrint
+
+_MAIN = TSFingerPrint(md5="main", time_base=90000, duration=3600, width=1920)
+_AD = TSFingerPrint(md5="ad", time_base=90000, duration=3000, width=1280)
+
+
+def fragments(playlist: str) -> list[str]:
+    return [line for line in playlist.splitlines() if not line.startswith("#")]
+
+
+class TestLivePlaylist(unittest.TestCase):
+    """测试边下边播列表只追加、不回退"""
+
+    def run_with_context(self, test):
+        async def run():
+            with tempfile.TemporaryDirectory() as data_dir:
+                async with Context(AppConfig(data_dir=data_dir)):
+                    test()
+
+        asyncio.run(run())
+
+    def make_downloader(self, count: int) -> M3U8Downloader:
+        downloader = M3U8Downloader("src", "dst.mp4")
+        downloader.tmp = "tmp"
+        downloader.fragments = [f"tmp/fragment_{i}.ts" for i in range(count)]
+        downloader.durations = [4.0] * count
+        downloader.finger_prints = [None] * count
+        return downloader
+
+    def test_pre_roll_ad_is_not_served_as_main(self):
+        """片头广告先下载完时不应被当作正片写入列表"""
+
+        def test():
+            downloader = self.make_downloader(12)
+            order = [_AD, _AD, _AD] + [_MAIN] * 9
+            served = []
+            for i, fp in enumerate(order):
+                downloader.finger_prints[i] = fp
+                current = fragments(downloader.live_playlist())
+                # 已写入的分片不会消失
+                self.assertEqual(current[: len(served)], served)
+                served = current
+            self.assertNotIn("fragment_0.ts", served)
+            self.assertEqual(served, [f"fragment_{i}.ts" for i in range(3, 12)])
+
+        self.run_with_context(test)
+
+    def test_entries_wait_for_stable_main(self):
+        """主指纹稳定前不输出分片"""
+
+        def test():
+            downloader = self.make_downloader(10)
+            for i in range(4):
+                downloader.finger_prints[i] = _MAIN
+            self.assertEqual(fragments(downloader.live_playlist()), [])
+            downloader.finger_prints[4] = _MAIN
+            self.assertEqual(len(fragments(downloader.live_playlist())), 5)
+
+        self.run_with_context(test)
+
+    def test_finished_decides_remaining(self):
+        """下载完成后剩余分片按最终主指纹判定并结束列表"""
+
+        def test():
+            downloader = self.make_downloader(3)
+            downloader.finger_prints = [_MAIN, _AD, _MAIN]
+            downloader.fragments_finished = True
+            playlist = downloader.live_playlist()
+            self.assertEqual(fragments(playlist), ["fragment_0.ts", "fragment_2.ts"])
+            self.assertIn("#EXT-X-DISCONTINUITY", playlist)
+            self.assertTrue(playlist.rstrip().endswith("#EXT-X-ENDLIST"))
+
+        self.run_with_context(test)
+
+
+class TestLiveHandler(unittest.TestCase):
+    """测试下载完成后边下边播地址的切换"""
+
+    def request(self, source, path: str):
+        async def run():
+            app = web.Application()
+            app.add_routes(live_routes("/live", lambda t, e: source, lambda t: True))
+            async with TestClient(TestServer(app)) as client:
+                response = await client.get(path, allow_redirects=False)
+                return response.status, response.headers, await response.text()
+
+        return asyncio.run(run())
+
+    def test_finished_episode(self):
+        """完成后只有顶层地址跳转到最终文件，列表结束，分片 404"""
+        final = "/resource/tv/1.mp4"
+        status, headers, _ = self.request(final, "/live/1/0/")
+        self.assertEqual(status, 302)
+        self.assertEqual(headers["Location"], final)
+        status, _, text = self.request(final, "/live/1/0/index.m3u8")
+        self.assertEqual(status, 200)
+        self.assertTrue(text.rstrip().endswith("#EXT-X-ENDLIST"))
+        status, _, _ = self.request(final, "/live/1/0/fragment_3.ts")
+        self.assertEqual(status, 404)
+
+    def test_running_episode(self):
+        """下载中顶层地址跳转到列表"""
+        downloader = M3U8Downloader("src", "dst.mp4")
+        status, headers, _ = self.request(downloader, "/live/1/0/")
+        self.assertEqual(status, 302)
+        self.assertEqual(headers["Location"], "index.m3u8")
+        status, _, _ = self.request(downloader, "/live/1/0/fragment_0.ts")
+        self.assertEqual(status, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import sys
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.lib.context import Context
+from service.schema.app_config import AppConfig
+from service.schema.tvdb import (
+    TV,
+    TVDB,
+    DownloadStatus,
+    SetupStatus,
+    Source,
+    SourceUrl,
+    Storage,
+    TrackStatus,
+)
+from service.tracker.db import DBUnit
+from service.tracker.local_manager import LocalManager, TVDownloadManager
+
+
+def make_source(url: str, episodes: int) -> Source:
+    source = SourceUrl(source_key="a", source_name="a", channel_name="c", url=url)
+    return Source(
+        source=source,
+        name="tv",
+        cover_url="",
+        episodes=[
+            Source.Episode(
+                source=source.model_copy(update={"url": f"{url}/{i}"}), name=str(i)
+            )
+            for i in range(episodes)
+        ],
+    )
+
+
+def pending_tv(tv_id: int) -> TV:
+    return TV(
+        id=tv_id,
+        name=f"tv {tv_id}",
+        source=make_source("https://a/1", 2),
+        storage=Storage(
+            directory=f"tv{tv_id}", episodes=[], cover="", setup=SetupStatus.PENDING
+        ),
+        track=TrackStatus(tracking=False, last_update=datetime.now()),
+        series=[],
+    )
+
+
+def make_manager(tvdb: TVDB) -> LocalManager:
+    manager = LocalManager()
+    manager.tvdb = tvdb
+    manager.download_manager = TVDownloadManager(tvdb)
+    manager.download_manager.task_manager = mock.Mock()
+    manager.download_manager.task_manager.remove_filtered_task = mock.AsyncMock()
+    manager.setup_tasks = {}
+    return manager
+
+
+class TestLocalManager(unittest.TestCase):
+    """测试剧集的分配与下载提交"""
+
+    def run_with_context(self, test):
+        async def run():
+            with tempfile.TemporaryDirectory() as data_dir:
+                async with Context(AppConfig(data_dir=data_dir)):
+                    await test()
+
+        asyncio.run(run())
+
+    def test_resume_pending_setup(self):
+        """启动时未完成分配的剧集交给后台任务，不直接提交下载"""
+
+        async def test():
+            tvdb = TVDB(tvs={1: pending_tv(1)})
+            manager = make_manager(tvdb)
+            await manager.resume_download_on_start()
+            await asyncio.gather(*manager.setup_tasks.values())
+            tv = tvdb.tvs[1]
+            self.assertEqual(len(tv.storage.episodes), 2)
+            self.assertEqual(tv.storage.setup, SetupStatus.DONE)
+            task_manager = manager.download_manager.task_manager
+            self.assertEqual(task_manager.add_task.call_count, 2)
+
+        self.run_with_context(test)
+
+    def test_allocation_failure_marks_failed(self):
+        """分配剧集失败时标记为失败，更换来源后重新分配"""
+
+        async def test():
+            tvdb = TVDB(tvs={1: pending_tv(1)})
+            manager = make_manager(tvdb)
+            task_manager = manager.download_manager.task_manager
+            task_manager.add_task.side_effect = OSError("disk full")
+            manager.start_setup(1)
+            await asyncio.gather(*manager.setup_tasks.values())
+            self.assertEqual(tvdb.tvs[1].storage.setup, SetupStatus.FAILED)
+
+            # 部分分配的剧集在重启后只提交已分配的部分
+            tvdb.tvs[1].storage.episodes.pop()
+            task_manager.add_task.reset_mock(side_effect=True)
+            await manager.resume_download_on_start()
+            self.assertEqual(task_manager.add_task.call_count, 1)
+
+            await manager.update_tv_source(1, make_source("https://a/2", 3))
+            self.assertEqual(len(tvdb.tvs[1].storage.episodes), 3)
+            self.assertEqual(tvdb.tvs[1].storage.setup, SetupStatus.COVER_FAILED)
+
+        self.run_with_context(test)
+
+    def test_update_source_saved(self):
+        """更换来源后保存，重新打开得到新的来源"""
+
+        async def test():
+            filename = os.path.join(Context.app_config.data_dir, "tvdb.json")
+            unit = DBUnit(filename, TVDB)
+            tvdb = unit.data
+            manager = make_manager(tvdb)
+            tvdb.tvs[5] = pending_tv(5)
+            tvdb.commit("tvs", 5)
+            manager.start_setup(5)
+            await asyncio.gather(*manager.setup_tasks.values())
+            for episode in tvdb.tvs[5].storage.episodes:
+                episode.status = DownloadStatus.SUCCESS
+            tvdb.commit("tvs", 5)
+            unit.save()
+
+            await manager.update_tv_source(5, make_source("https://a/2", 3))
+            unit.save()
+            unit.journal.close()
+            expected = tvdb.model_dump()
+            self.assertEqual(DBUnit(filename, TVDB).data.model_dump(), expected)
+
+        self.run_with_context(test)
+
+
+if __name__ == "__main__":
+    unittest.main()
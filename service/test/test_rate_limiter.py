@@ -0,0 +1,170 @@
+import asyncio
+import tempfile
+import time
+import unittest
+import sys
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+import aiohttp
+from aiohttp import web
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.lib.context import Context
+from service.lib.rate_limiter import DomainLimiter, RateLimiter, parse_retry_after
+from service.lib.request import request_text
+from service.schema.app_config import AppConfig
+from service.schema.config import Config
+
+
+def response(status: int, retry_after=None):
+    headers = {} if retry_after is None else {"Retry-After": retry_after}
+    return SimpleNamespace(status=status, headers=headers)
+
+
+class TestRateLimiter(unittest.TestCase):
+    """测试按域名限速"""
+
+    def test_parse_retry_after(self):
+        """Retry-After 支持秒数和 HTTP 日期"""
+        self.assertEqual(parse_retry_after("5"), 5.0)
+        self.assertEqual(parse_retry_after("-3"), 0.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        later = datetime.now(timezone.utc) + timedelta(seconds=30)
+        self.assertAlmostEqual(
+            parse_retry_after(format_datetime(later, usegmt=True)), 30, delta=2
+        )
+
+    def test_burst_then_rate(self):
+        """令牌用完后按速率放行"""
+
+        async def run_test():
+            limiter = DomainLimiter("a", rate=20, burst=2)
+            start = time.monotonic()
+            for _ in range(4):
+                await limiter.acquire()
+            # 2 个令牌立即可用，其余 2 个每个约 50ms
+            self.assertGreaterEqual(time.monotonic() - start, 0.09)
+            self.assertEqual(limiter.requests, 4)
+
+        asyncio.run(run_test())
+
+    def test_rate_limited_backs_off_and_recovers(self):
+        """429 时降速并等待 Retry-After，成功后逐步恢复"""
+        limiter = DomainLimiter("a", rate=10, burst=1)
+        limiter.on_rate_limited(2.0, backoff=30)
+        self.assertEqual(limiter.rate, 5)
+        self.assertEqual(limiter.tokens, 0)
+        self.assertAlmostEqual(limiter.get_state().blocked_sec, 2.0, delta=0.1)
+        for _ in range(100):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 10)
+
+    def test_blocked_acquire_waits(self):
+        """封禁期间 acquire 等待"""
+
+        async def run_test():
+            limiter = DomainLimiter("a", rate=100, burst=5)
+            limiter.on_rate_limited(0.1, backoff=30)
+            start = time.monotonic()
+            await limiter.acquire()
+            self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+        asyncio.run(run_test())
+
+    def test_feedback_per_domain(self):
+        """不同域名互不影响，没有 Retry-After 时使用 backoff"""
+        limiter = RateLimiter(Config())
+        self.assertTrue(limiter.feedback("https://a.com/x", response(429)))
+        self.assertFalse(limiter.feedback("https://b.com/x", response(200)))
+        a = limiter.get("https://a.com/y")
+        b = limiter.get("https://b.com/y")
+        self.assertEqual(a.rate_limited, 1)
+        self.assertEqual(b.rate_limited, 0)
+        self.assertAlmostEqual(
+            a.get_state().blocked_sec,
+            Config().rate_limit.backoff.total_seconds(),
+            delta=0.1,
+        )
+        self.assertEqual(
+            {state.domain for state in limiter.get_state()}, {"a.com", "b.com"}
+        )
+
+    def test_download_bucket(self):
+        """视频下载使用单独的令牌桶，不影响同域名的页面请求"""
+        config = Config()
+        limiter = RateLimiter(config)
+        download = limiter.get("https://a.com/1.ts", download=True)
+        page = limiter.get("https://a.com/x")
+        self.assertIsNot(download, page)
+        self.assertEqual(download.max_rate, config.rate_limit.download_rate)
+        self.assertEqual(download.burst, config.rate_limit.download_burst)
+        limiter.feedback("https://a.com/1.ts", response(429), download=True)
+        self.assertEqual(page.get_state().blocked_sec, 0)
+        self.assertEqual(
+            [state.download for state in limiter.get_state()], [True, False]
+        )
+
+    def test_retry_releases_connection(self):
+        """429 后先释放连接再重试，连接池只有一个连接时也不会卡住"""
+        calls = []
+        retried = asyncio.Event()
+
+        async def handler(request):
+            calls.append(1)
+            if len(calls) > 1:
+                retried.set()
+                return web.Response(text="ok")
+            # 响应体在重试之前不会结束，连接只有被主动释放才能复用
+            response = web.StreamResponse(
+                status=429, headers={"Retry-After": "0", "Content-Length": "8"}
+            )
+            await response.prepare(request)
+            await response.write(b"slow")
+            try:
+                await asyncio.wait_for(retried.wait(), 3)
+                await response.write(b"down")
+            except (asyncio.TimeoutError, ConnectionError):
+                pass
+            return response
+
+        async def run():
+            app = web.Application()
+            app.router.add_get("/page", handler)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]  # type: ignore
+            try:
+                with tempfile.TemporaryDirectory() as data_dir:
+                    async with Context(AppConfig(data_dir=data_dir)):
+                        async with aiohttp.ClientSession(
+                            connector=aiohttp.TCPConnector(limit=1)
+                        ) as client:
+                            shared = Context.current.client
+                            Context.current.client = client
+                            try:
+                                text = await asyncio.wait_for(
+                                    request_text(f"http://127.0.0.1:{port}/page"), 2
+                                )
+                            finally:
+                                Context.current.client = shared
+                self.assertEqual(text, "ok")
+                self.assertEqual(len(calls), 2)
+            finally:
+                await runner.cleanup()
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
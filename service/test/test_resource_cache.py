@@ -0,0 +1,168 @@
+import asyncio
+import tempfile
+import time
+import unittest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.lib.context import Context
+from service.schema.app_config import AppConfig
+from service.schema.tvdb import SourceUrl
+from service.searcher.resource_cache import ResourceCache, signed_url_expiry
+
+
+def source(url: str, key: str = "a") -> SourceUrl:
+    return SourceUrl(source_key=key, source_name=key, channel_name="c", url=url)
+
+
+def age(cache: ResourceCache, src: SourceUrl, delta: timedelta) -> None:
+    """Pretend the entry of src was resolved delta ago."""
+    key = (src.source_key, src.url)
+    created, expires, url = cache.entries[key]
+    cache.entries[key] = (created - delta, expires, url)
+
+
+class TestResourceCache(unittest.TestCase):
+    """测试视频地址缓存的有效期"""
+
+    def run_with_context(self, test):
+        async def run():
+            with tempfile.TemporaryDirectory() as data_dir:
+                async with Context(AppConfig(data_dir=data_dir)):
+                    Context.config.search.resource_ttl = timedelta(minutes=30)
+                    await test()
+
+        asyncio.run(run())
+
+    def test_signed_url_expiry(self):
+        """从签名地址中读取过期时间，无法解析的值忽略"""
+        now = int(time.time())
+        self.assertEqual(
+            signed_url_expiry(f"https://a/x.m3u8?expires={now}"),
+            datetime.fromtimestamp(now),
+        )
+        self.assertEqual(
+            signed_url_expiry(f"https://a/x.m3u8?t=1&Expires={now * 1000}"),
+            datetime.fromtimestamp(now),
+        )
+        self.assertEqual(
+            signed_url_expiry(f"https://a/x.m3u8?auth_key={now}-0-0-abc"),
+            datetime.fromtimestamp(now),
+        )
+        self.assertIsNotNone(
+            signed_url_expiry(
+                "https://a/x.m3u8?X-Amz-Date=20240101T000000Z&X-Amz-Expires=600"
+            )
+        )
+        for value in ("1e20", "-1e20", "nan", "inf", "abc", "12"):
+            self.assertIsNone(signed_url_expiry(f"https://a/x.m3u8?e={value}"))
+        self.assertIsNone(signed_url_expiry("https://a/x.m3u8"))
+
+    def test_signed_url_cached_until_expiry(self):
+        """签名地址缓存到过期前，已过期的地址不缓存"""
+
+        async def test():
+            cache = ResourceCache()
+            soon = int(time.time()) + 30
+            cache.put(source("1"), f"https://a/x.m3u8?expires={soon}")
+            self.assertIsNone(cache.lookup(source("1")))
+            later = int(time.time()) + 600
+            cache.put(source("2"), f"https://a/y.m3u8?expires={later}")
+            self.assertEqual(
+                cache.lookup(source("2")), f"https://a/y.m3u8?expires={later}"
+            )
+
+        self.run_with_context(test)
+
+    def test_only_expiry_failures_shorten_ttl(self):
+        """只有地址过期的失败才缩短有效期"""
+
+        async def test():
+            cache = ResourceCache()
+            src = source("1")
+            cache.put(src, "https://a/x.m3u8")
+            age(cache, src, timedelta(minutes=5))
+            cache.invalidate(src, expired=False)
+            self.assertIsNone(cache.lookup(src))
+            self.assertEqual(cache.ttl("a"), timedelta(minutes=30))
+
+            cache.put(src, "https://a/x.m3u8")
+            age(cache, src, timedelta(minutes=5))
+            cache.invalidate(src, expired=True)
+            self.assertAlmostEqual(cache.ttl("a").total_seconds(), 300, delta=1)
+            self.assertEqual(cache.ttl("b"), timedelta(minutes=30))
+
+        self.run_with_context(test)
+
+    def test_learned_ttl_recovers(self):
+        """学到的有效期随时间翻倍恢复"""
+
+        async def test():
+            cache = ResourceCache()
+            since = datetime.now()
+            cache.learned_ttl["a"] = (
+                timedelta(minutes=5),
+                since - timedelta(minutes=30),
+            )
+            self.assertAlmostEqual(cache.ttl("a").total_seconds(), 600, delta=1)
+            cache.learned_ttl["a"] = (timedelta(minutes=5), since - timedelta(hours=2))
+            self.assertEqual(cache.ttl("a"), timedelta(minutes=30))
+            self.assertNotIn("a", cache.learned_ttl)
+            cache.learned_ttl["a"] = (timedelta(minutes=5), datetime(2000, 1, 1))
+            self.assertEqual(cache.ttl("a"), timedelta(minutes=30))
+
+        self.run_with_context(test)
+
+    def test_size_limit(self):
+        """超过容量时丢弃最久未使用的地址"""
+
+        async def test():
+            Context.config.search.resource_cache_size = 2
+            cache = ResourceCache()
+            for name in ("1", "2"):
+                cache.put(source(name), f"https://a/{name}.m3u8")
+            cache.lookup(source("1"))
+            cache.put(source("3"), "https://a/3.m3u8")
+            self.assertIsNotNone(cache.lookup(source("1")))
+            self.assertIsNone(cache.lookup(source("2")))
+
+        self.run_with_context(test)
+
+    def test_get_shares_resolve(self):
+        """并发解析同一集只请求一次，失败不缓存"""
+
+        async def test():
+            cache = ResourceCache()
+            calls = []
+
+            async def resolve():
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                return "https://a/x.m3u8"
+
+            results = await asyncio.gather(
+                *[cache.get(source("1"), resolve) for _ in range(3)]
+            )
+            self.assertEqual(results, ["https://a/x.m3u8"] * 3)
+            self.assertEqual(await cache.get(source("1"), resolve), "https://a/x.m3u8")
+            self.assertEqual(len(calls), 1)
+
+            async def broken():
+                raise RuntimeError("resolve failed")
+
+            with self.assertRaises(RuntimeError):
+                await cache.get(source("2"), broken)
+            self.assertIsNone(cache.lookup(source("2")))
+
+        self.run_with_context(test)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+import asyncio
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.lib.context import Context
+from service.schema.app_config import AppConfig
+from service.searcher.cache import SearchCache
+
+
+class TestSearchCache(unittest.TestCase):
+    """测试搜索缓存的合并请求与取消"""
+
+    def run_with_context(self, test):
+        async def run():
+            with tempfile.TemporaryDirectory() as data_dir:
+                async with Context(AppConfig(data_dir=data_dir)):
+                    await test()
+
+        asyncio.run(run())
+
+    def test_concurrent_get_shares_request(self):
+        """并发的相同请求只发起一次"""
+
+        async def test():
+            cache: SearchCache[int] = SearchCache()
+            calls = []
+
+            async def factory():
+                calls.append(1)
+                await asyncio.sleep(0.01)
+                return 42
+
+            results = await asyncio.gather(
+                *[cache.get("k", factory) for _ in range(5)]
+            )
+            self.assertEqual(results, [42] * 5)
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(await cache.get("k", factory), 42)
+            self.assertEqual(len(calls), 1)
+
+        self.run_with_context(test)
+
+    def test_cancelled_waiter_keeps_request(self):
+        """取消其中一个等待者不影响其他等待者"""
+
+        async def test():
+            cache: SearchCache[int] = SearchCache()
+
+            async def factory():
+                await asyncio.sleep(0.02)
+                return 1
+
+            first = asyncio.create_task(cache.get("k", factory))
+            second = asyncio.create_task(cache.get("k", factory))
+            await asyncio.sleep(0)
+            first.cancel()
+            self.assertEqual(await second, 1)
+            self.assertTrue(first.cancelled())
+
+        self.run_with_context(test)
+
+    def test_get_joins_begun_request(self):
+        """get 等待 begin 登记的请求结果"""
+
+        async def test():
+            cache: SearchCache[int] = SearchCache()
+            future = cache.begin("k")
+            self.assertIsNotNone(future)
+            self.assertIsNone(cache.begin("k"))
+
+            async def factory():
+                raise AssertionError("should join the begun request")
+
+            waiter = asyncio.create_task(cache.get("k", factory))
+            await asyncio.sleep(0)
+            future.set_result(7)
+            self.assertEqual(await waiter, 7)
+            self.assertEqual(await cache.pending("k"), 7)
+
+        self.run_with_context(test)
+
+    def test_cancelled_begin_restarts(self):
+        """登记的请求被放弃时，等待者重新发起请求"""
+
+        async def test():
+            cache: SearchCache[int] = SearchCache()
+            future = cache.begin("k")
+
+            async def factory():
+                return 3
+
+            waiter = asyncio.create_task(cache.get("k", factory))
+            await asyncio.sleep(0)
+            future.cancel()
+            self.assertEqual(await waiter, 3)
+
+        self.run_with_context(test)
+
+    def test_uncacheable_result_not_stored(self):
+        """不可缓存的结果不保留"""
+
+        async def test():
+            cache: SearchCache[int] = SearchCache(lambda value: value > 0)
+            calls = []
+
+            async def factory():
+                calls.append(1)
+                return 0
+
+            await cache.get("k", factory)
+            await cache.get("k", factory)
+            self.assertEqual(len(calls), 2)
+
+        self.run_with_context(test)
+
+
+if __name__ == "__main__":
+    unittest.main()
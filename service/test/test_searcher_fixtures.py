@@ -0,0 +1,107 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.lib.path import searcher_config_path
+from service.searcher.searcher import Searcher
+from service.searcher.selftest.fixture import FixtureContext, FixtureStore
+from service.searcher.selftest.runner import expected_path, fixture_root, replay
+
+# 手写的站点页面，不依赖网络即可回放
+_SYNTHETIC = os.path.join(fixture_root(), "synthetic")
+
+
+def synthetic_config() -> dict:
+    with open(os.path.join(_SYNTHETIC, "searcher.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class CountingStore(FixtureStore):
+    def __init__(self, dir: str) -> None:
+        super().__init__(dir)
+        self.loads: dict[str, int] = {}
+
+    def load(self, url: str):
+        self.loads[url] = self.loads.get(url, 0) + 1
+        return super().load(url)
+
+
+class TestSearcherFixtures(unittest.TestCase):
+    """用录制的页面离线回放各站点的搜索、更新和解析
+
+    录制: python -m service.searcher.selftest record [key ...]
+    """
+
+    def test_replay(self):
+        with open(searcher_config_path(), "r", encoding="utf-8") as f:
+            configs = json.load(f)["searchers"]
+        recorded = [
+            c
+            for c in configs
+            if os.path.exists(expected_path(os.path.join(fixture_root(), c["key"])))
+        ]
+        if not recorded:
+            self.skipTest("no searcher fixtures recorded")
+        for config in recorded:
+            with self.subTest(searcher=config["key"]):
+                _, problems = asyncio.run(
+                    replay(
+                        config,
+                        os.path.join(fixture_root(), config["key"]),
+                        repeat=3,
+                        tolerance=2.0,
+                    )
+                )
+                self.assertEqual(problems, [])
+
+    def test_synthetic_search(self):
+        """回放手写页面，检查解析出的剧集，且每次都经过 StandIn 而不是页面缓存"""
+
+        async def run():
+            store = CountingStore(_SYNTHETIC)
+            with tempfile.TemporaryDirectory() as data_dir:
+                async with FixtureContext(data_dir, store, False):
+                    config = synthetic_config()
+                    results = [
+                        await Searcher(config).search(config["self_test"]["keyword"])
+                        for _ in range(2)
+                    ]
+            return store, results
+
+        store, results = asyncio.run(run())
+        self.assertEqual(store.missing, [])
+        for sources, errors in results:
+            self.assertEqual(errors, [])
+            self.assertEqual(
+                [(s.name, s.source.channel_name) for s in sources],
+                [("三月的狮子", "线路一"), ("三月的狮子", "线路二")],
+            )
+            self.assertEqual(sources[0].cover_url, "https://tv.example/cover/1.jpg")
+            self.assertEqual(
+                [e.source.url for e in sources[0].episodes],
+                [f"https://tv.example/play/1-{i}.m3u8" for i in (1, 2, 3)],
+            )
+            # javascript: 链接被跳过
+            self.assertEqual([e.name for e in sources[1].episodes], ["第01集"])
+        self.assertEqual(set(store.loads.values()), {2})
+
+    def test_synthetic_replay(self):
+        """手写页面的回放结果与基准一致"""
+        _, problems = asyncio.run(
+            replay(synthetic_config(), _SYNTHETIC, repeat=3, tolerance=2.0)
+        )
+        self.assertEqual(problems, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
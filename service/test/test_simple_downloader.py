@@ -0,0 +1,102 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+from aiohttp import web
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.downloader.download_tracker import DownloadTracker
+from service.downloader.simple import SimpleDownloader
+from service.lib.context import Context
+from service.schema.app_config import AppConfig
+
+_BODY = b"x" * 1000
+
+
+class TestSimpleDownloader(unittest.TestCase):
+    """测试分片下载的进度统计"""
+
+    def run_with_server(self, handler, test):
+        async def run():
+            app = web.Application()
+            app.router.add_get("/fragment.ts", handler)
+            runner = web.AppRunner(app, access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, "127.0.0.1", 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]  # type: ignore
+            try:
+                with tempfile.TemporaryDirectory() as data_dir:
+                    async with Context(AppConfig(data_dir=data_dir)):
+                        await test(f"http://127.0.0.1:{port}/fragment.ts", data_dir)
+            finally:
+                await runner.cleanup()
+
+        asyncio.run(run())
+
+    def test_failed_attempt_rolled_back(self):
+        """中途断开的尝试不计入总大小和已下载大小，重试后只计一次"""
+        calls = []
+
+        async def handler(request):
+            calls.append(1)
+            response = web.StreamResponse(headers={"Content-Length": str(len(_BODY))})
+            await response.prepare(request)
+            if len(calls) == 1:
+                await response.write(_BODY[:400])
+                request.transport.close()
+                return response
+            await response.write(_BODY)
+            return response
+
+        async def test(url, data_dir):
+            tracker = DownloadTracker()
+            tracker.set_fragment_count(1)
+            dst = os.path.join(data_dir, "fragment.ts")
+            with self.assertRaises(Exception):
+                await SimpleDownloader(url, dst, tracker).run()
+            self.assertEqual(tracker.downloaded_size, 0)
+            self.assertEqual(tracker.get_progress().total_size, 0)
+            self.assertEqual(tracker.transfers, 0)
+
+            await SimpleDownloader(url, dst, tracker).run()
+            self.assertEqual(tracker.downloaded_size, len(_BODY))
+            self.assertEqual(tracker.get_progress().total_size, len(_BODY))
+
+        self.run_with_server(handler, test)
+
+    def test_rate_limit_wait_is_not_transfer_time(self):
+        """429 后等待限速器的时间不计入传输时间"""
+        calls = []
+
+        async def handler(request):
+            calls.append(1)
+            if len(calls) == 1:
+                return web.Response(status=429, headers={"Retry-After": "0.3"})
+            return web.Response(body=_BODY)
+
+        async def test(url, data_dir):
+            Context.config.rate_limit.backoff = timedelta(seconds=0.3)
+            tracker = DownloadTracker()
+            tracker.set_fragment_count(1)
+            await SimpleDownloader(
+                url, os.path.join(data_dir, "fragment.ts"), tracker
+            ).run()
+            self.assertEqual(len(calls), 2)
+            self.assertEqual(tracker.downloaded_size, len(_BODY))
+            self.assertLess(tracker.get_transfer_time(), 0.25)
+
+        self.run_with_server(handler, test)
+
+
+if __name__ == "__main__":
+    unittest.main()
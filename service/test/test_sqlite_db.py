@@ -0,0 +1,177 @@
+import os
+import tempfile
+import unittest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.schema import error
+from service.schema.dtype import BaseModel
+from service.schema.tvdb import (
+    TV,
+    TVDB,
+    Series,
+    Source,
+    SourceUrl,
+    Storage,
+    TrackStatus,
+)
+from service.schema.user_db import User, UserDB
+from service.tracker.db import DBUnit
+from service.tracker.sqlite_db import SqliteStore, SqliteUnit
+
+
+class Error(BaseModel):
+    id: int
+    message: str
+
+
+class ErrorDB(BaseModel):
+    errors: list[Error] = []
+    next_id: int = 0
+
+
+class TestSqliteDB(unittest.TestCase):
+    """测试 SQLite 存储及从 json 存储的迁移"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.json_filename = os.path.join(self.dir.name, "error_db.json")
+        self.store = SqliteStore(os.path.join(self.dir.name, "db.sqlite3"))
+        self.addCleanup(self.store.close)
+
+    def write_json(self) -> None:
+        unit = DBUnit(self.json_filename, ErrorDB)
+        unit.data.errors = [Error(id=i, message=f"error {i}") for i in range(3)]
+        unit.data.next_id = 3
+        unit.data.commit()
+        unit.save()
+        unit.journal.close()
+
+    def test_round_trip(self):
+        """按行保存，重新打开得到相同数据"""
+        unit = SqliteUnit(self.store, "error_db", ErrorDB, self.json_filename)
+        unit.data.errors.append(Error(id=0, message="a"))
+        unit.data.errors.append(Error(id=1, message="b"))
+        unit.data.next_id = 2
+        unit.data.commit()
+        unit.save()
+        unit.data.errors.pop(0)
+        unit.data.commit("errors")
+        unit.save()
+        expected = unit.data.model_dump()
+        unit = SqliteUnit(self.store, "error_db", ErrorDB, self.json_filename)
+        self.assertEqual(unit.data.model_dump(), expected)
+
+    def test_migrate(self):
+        """导入 json 存储后改名，之后不再导入"""
+        self.write_json()
+        unit = SqliteUnit(self.store, "error_db", ErrorDB, self.json_filename)
+        self.assertEqual(len(unit.data.errors), 3)
+        self.assertFalse(os.path.exists(self.json_filename))
+        self.assertTrue(os.path.exists(self.json_filename + ".migrated"))
+
+    def test_migrate_interrupted(self):
+        """写入 SQLite 失败时保留 json 文件，下次启动重新导入"""
+        self.write_json()
+        with mock.patch.object(SqliteUnit, "save", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                SqliteUnit(self.store, "error_db", ErrorDB, self.json_filename)
+        self.assertTrue(os.path.exists(self.json_filename))
+        unit = SqliteUnit(self.store, "error_db", ErrorDB, self.json_filename)
+        self.assertEqual(unit.data.next_id, 3)
+        self.assertEqual([e.id for e in unit.data.errors], [0, 1, 2])
+
+    def query_plan(self, sql: str, *args) -> str:
+        plan = self.store.conn.execute("EXPLAIN QUERY PLAN " + sql, args).fetchall()
+        return " ".join(row[-1] for row in plan)
+
+    def test_find_by_index(self):
+        """按索引查找时先保存未写入的修改，并使用索引"""
+        unit = SqliteUnit(self.store, "user_db", UserDB, self.json_filename)
+        for name in ("a", "b"):
+            unit.data.users[name] = User(
+                username=name, password_hash="", token=f"token-{name}", group=[]
+            )
+        unit.data.commit("users", "a")
+        unit.data.commit("users", "b")
+        self.assertEqual(unit.find("users", "token", "token-b"), ["b"])
+        self.assertEqual(unit.find("users", "token", "token-c"), [])
+        self.assertIn(
+            "USING INDEX user_db_users_token",
+            self.query_plan(
+                "SELECT key FROM rows WHERE unit = 'user_db' AND field = 'users' "
+                "AND json_extract(value, '$.token') = ?",
+                "token-b",
+            ),
+        )
+        del unit.data.users["b"]
+        unit.data.commit("users", "b")
+        self.assertEqual(unit.find("users", "token", "token-b"), [])
+
+    def test_children(self):
+        """剧集状态和播放列表归属写入 children 表，旧数据库启动时补齐"""
+        unit = SqliteUnit(self.store, "tvdb", TVDB, self.json_filename)
+        source = SourceUrl(source_key="a", source_name="a", channel_name="c", url="u")
+        unit.data.series[1] = Series(
+            id=1, name="s", tvs=[3], last_update=datetime.now()
+        )
+        unit.data.tvs[3] = TV(
+            id=3,
+            name="tv",
+            source=Source(source=source, name="tv", cover_url="", episodes=[]),
+            storage=Storage(
+                directory="tv",
+                episodes=[
+                    Storage.Episode(name="1", filename="1.mp4", status="success"),
+                    Storage.Episode(name="2", filename="2.mp4", status="failed"),
+                ],
+                cover="",
+            ),
+            track=TrackStatus(tracking=False, last_update=datetime.now()),
+            series=[1],
+        )
+        unit.data.commit()
+        self.assertEqual(unit.find("series", "name", "s"), ["1"])
+        self.assertEqual(unit.find("tvs", "name", "tv"), ["3"])
+        self.assertEqual(unit.find_children("tvs", "series", 1), ["3"])
+        self.assertEqual(unit.find_children("tvs", "episode_status", "failed"), ["3"])
+
+        with self.store.conn:
+            self.store.conn.execute("DELETE FROM children")
+        unit = SqliteUnit(self.store, "tvdb", TVDB, self.json_filename)
+        self.assertEqual(unit.find_children("tvs", "series", 1), ["3"])
+        unit.data.tvs[3].series = []
+        unit.data.commit("tvs", 3)
+        self.assertEqual(unit.find_children("tvs", "series", 1), [])
+
+    def test_ordered(self):
+        """按时间顺序列出错误，包括尚未保存的"""
+        unit = SqliteUnit(self.store, "error_db", error.ErrorDB, self.json_filename)
+        now = datetime.now()
+        for id, minutes in ((1, 5), (2, 1), (3, 3)):
+            unit.data.errors.append(
+                error.Error(
+                    id=id,
+                    timestamp=now + timedelta(minutes=minutes),
+                    title="",
+                    description="",
+                    type=error.ErrorType.ERROR,
+                )
+            )
+        unit.data.commit("errors")
+        self.assertEqual(
+            [e["id"] for e in unit.ordered("errors", "timestamp")], [2, 3, 1]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import unittest
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+# 添加service目录的父目录到路径，以便可以导入service模块
+service_dir = Path(__file__).parent.parent
+project_root = service_dir.parent
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from service.schema.config import UpdaterConfig
+from service.schema.tvdb import TrackStatus
+from service.tracker import update_schedule
+from service.tracker.update_schedule import (
+    RELEASE_HISTORY_SIZE,
+    initial_update,
+    next_update_interval,
+    record_check,
+    release_cadence,
+)
+
+_START = datetime(2024, 1, 1, 20)
+_WEEK = timedelta(days=7)
+
+
+def weekly_track(releases: int, backoff: int = 0) -> TrackStatus:
+    return TrackStatus(
+        tracking=True,
+        last_update=_START,
+        backoff=backoff,
+        release_history=[_START + _WEEK * i for i in range(releases)],
+    )
+
+
+class TestUpdateSchedule(unittest.TestCase):
+    """测试按更新周期调度检查时间"""
+
+    def setUp(self):
+        # 去掉随机抖动，便于断言具体时间
+        patcher = mock.patch.object(update_schedule, "_JITTER", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.config = UpdaterConfig()
+
+    def test_release_cadence(self):
+        """更新周期取最近更新间隔的中位数"""
+        self.assertIsNone(release_cadence([]))
+        self.assertIsNone(release_cadence([_START]))
+        self.assertIsNone(release_cadence([_START, _START]))
+        history = [_START, _START + _WEEK, _START + _WEEK * 2 + timedelta(hours=1)]
+        self.assertEqual(release_cadence(history), _WEEK + timedelta(minutes=30))
+
+    def test_after_release_waits_for_cadence(self):
+        """刚更新后等到下一次预计更新时间再检查"""
+        track = weekly_track(4)
+        now = track.release_history[-1]
+        self.assertEqual(next_update_interval(track, now, self.config), _WEEK)
+
+    def test_before_expected_release(self):
+        """预计更新前没有更新时等到预计时间"""
+        track = weekly_track(4, backoff=1)
+        now = track.release_history[-1] + timedelta(days=3)
+        self.assertEqual(
+            next_update_interval(track, now, self.config), timedelta(days=4)
+        )
+
+    def test_due_checks_frequently_then_backs_off(self):
+        """到期后按 min_update_interval 检查并逐次加倍，不超过 update_interval"""
+        now = _START + _WEEK * 4 + timedelta(hours=2)
+        intervals = [
+            next_update_interval(weekly_track(4, backoff), now, self.config)
+            for backoff in (1, 2, 3, 10)
+        ]
+        self.assertEqual(
+            intervals,
+            [
+                timedelta(hours=1),
+                timedelta(hours=2),
+                timedelta(hours=4),
+                timedelta(days=1),
+            ],
+        )
+
+    def test_no_cadence_backs_off_to_max(self):
+        """没有更新周期时从 update_interval 指数退避到 max_update_interval"""
+        intervals = [
+            next_update_interval(weekly_track(1, backoff), _START, self.config)
+            for backoff in (0, 1, 2, 5)
+        ]
+        self.assertEqual(
+            intervals,
+            [
+                timedelta(days=1),
+                timedelta(days=1),
+                timedelta(days=2),
+                timedelta(days=7),
+            ],
+        )
+
+    def test_huge_backoff(self):
+        """连续很多次没有更新时不会溢出"""
+        track = weekly_track(1, backoff=10**6)
+        self.assertEqual(
+            next_update_interval(track, _START, self.config), timedelta(days=7)
+        )
+        now = _START + _WEEK * 4 + timedelta(hours=2)
+        track = weekly_track(4, backoff=10**6)
+        self.assertEqual(
+            next_update_interval(track, now, self.config), timedelta(days=1)
+        )
+        record_check(track, now, False, self.config)
+        self.assertEqual(track.next_update, now + timedelta(days=1))
+
+    def test_record_check(self):
+        """有更新时重置退避并记录更新时间，历史长度有上限"""
+        track = weekly_track(RELEASE_HISTORY_SIZE, backoff=3)
+        now = track.release_history[-1] + _WEEK
+        record_check(track, now, True, self.config)
+        self.assertEqual(track.backoff, 0)
+        self.assertEqual(len(track.release_history), RELEASE_HISTORY_SIZE)
+        self.assertEqual(track.release_history[-1], now)
+        self.assertEqual(track.next_update, now + _WEEK)
+
+        record_check(track, now, False, self.config)
+        self.assertEqual(track.backoff, 1)
+        self.assertEqual(track.next_update, now + _WEEK)
+
+    def test_initial_update_spread(self):
+        """首次调度分散在一个 update_interval 内"""
+        for _ in range(20):
+            first = initial_update(_START, self.config)
+            self.assertGreaterEqual(first, _START)
+            self.assertLessEqual(first, _START + self.config.update_interval)
+
+
+if __name__ == "__main__":
+    unittest.main()
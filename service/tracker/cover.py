@@ -0,0 +1,92 @@
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from service.lib.context import Context
+import asyncio
+import av
+import hashlib
+import os
+
+# 列表视图使用的封面宽度，按 srcset 由浏览器选择
+COVER_WIDTHS = (160, 320, 640)
+# 扩展名 -> (编码器, 像素格式, 编码参数)
+_FORMATS = {
+    "webp": ("libwebp", "yuv420p", {"quality": "80"}),
+    "jpg": ("mjpeg", "yuvj420p", {}),
+}
+_JPEG_QSCALE = 4
+# 封面编码占用 CPU，单独的线程池避免占满默认线程池
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cover")
+
+
+def cover_cache_path() -> str:
+    return os.path.join(Context.app_config.data_dir, "cover_cache")
+
+
+def variant_filename(cover_hash: str, width: int, ext: str) -> str:
+    return f"{cover_hash}-{width}.{ext}"
+
+
+def cover_srcset(cover_hash: str, widths: list[int], ext: str) -> str:
+    if not cover_hash:
+        return ""
+    return ", ".join(
+        f"/cover/{variant_filename(cover_hash, w, ext)} {w}w" for w in widths
+    )
+
+
+def encode_variant(frame: av.VideoFrame, ext: str, width: int) -> bytes:
+    codec, pix_fmt, options = _FORMATS[ext]
+    height = max(1, round(frame.height * width / frame.width))
+    context = av.CodecContext.create(codec, "w")
+    context.width = width
+    context.height = height
+    context.pix_fmt = pix_fmt
+    context.time_base = Fraction(1, 1)
+    context.options = options
+    if ext == "jpg":
+        context.qmin = context.qmax = _JPEG_QSCALE
+    scaled = frame.reformat(
+        width=width, height=height, format=pix_fmt, interpolation="AREA"
+    )
+    packets = context.encode(scaled) + context.encode(None)
+    return b"".join(bytes(p) for p in packets)
+
+
+def build_variants(src: str, dst: str) -> tuple[str, list[int]]:
+    """Resized variants of a cover, named by the hash of its content.
+
+    Widths larger than the cover are skipped, a cover narrower than every
+    width gets a single variant at its own width.
+    """
+    with open(src, "rb") as f:
+        cover_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    with av.open(src) as container:
+        frame = next(container.decode(video=0))
+    widths = [w for w in COVER_WIDTHS if w <= frame.width] or [frame.width]
+    os.makedirs(dst, exist_ok=True)
+    for width in widths:
+        for ext in _FORMATS:
+            path = os.path.join(dst, variant_filename(cover_hash, width, ext))
+            if os.path.exists(path):
+                continue
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(encode_variant(frame, ext, width))
+            os.replace(tmp, path)
+    return cover_hash, widths
+
+
+async def create_cover_variants(src: str) -> tuple[str, list[int]]:
+    return await asyncio.get_running_loop().run_in_executor(
+        _executor, build_variants, src, cover_cache_path()
+    )
+
+
+def prune_cover_cache(cover_hashes: set[str]) -> None:
+    """Remove variants of covers that no show uses any more."""
+    path = cover_cache_path()
+    if not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        if name.split("-", 1)[0] not in cover_hashes:
+            os.remove(os.path.join(path, name))
@@ -1,64 +1,347 @@
-from typing import Callable, Type
+from typing import Any, Callable, Optional, Type
+from service.schema.app_config import DBBackend
 from service.schema.dtype import BaseModel
+from service.schema.monitor import DBSaveStats
+from .sqlite_db import SqliteStore, SqliteUnit
+from datetime import datetime
+import json
+import pydantic_core
 import os
+import time
 from service.lib.context import Context
 import asyncio
 
 
+def diff(old: Any, new: Any, path: list, ops: list[dict]) -> None:
+    """Append ops turning old into new, both in model_dump(mode="json") form.
+
+    An op sets ("v"), deletes ("d") or truncates a list ("n") at a path of
+    dict keys (str) and list indexes (int). Setting index len(list) appends.
+    """
+    if type(old) is dict and type(new) is dict:
+        for key in old.keys() - new.keys():
+            ops.append({"p": path + [str(key)], "d": 1})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"p": path + [str(key)], "v": value})
+            elif old[key] != value:
+                diff(old[key], value, path + [str(key)], ops)
+    elif type(old) is list and type(new) is list and old and new:
+        if len(new) < len(old):
+            ops.append({"p": path, "n": len(new)})
+        for i in range(min(len(old), len(new))):
+            if old[i] != new[i]:
+                diff(old[i], new[i], path + [i], ops)
+        for i in range(len(old), len(new)):
+            ops.append({"p": path + [i], "v": new[i]})
+    else:
+        ops.append({"p": path, "v": new})
+
+
+def _resolve(root: Any, path: list) -> Optional[Any]:
+    for key in path:
+        if type(root) is dict and key in root:
+            root = root[key]
+        elif type(root) is list and type(key) is int and key < len(root):
+            root = root[key]
+        else:
+            return None
+    return root
+
+
+def apply(root: Any, op: dict) -> Any:
+    """Apply one op, skipping it if its path no longer exists.
+
+    Ops only write absolute values, so replaying a journal over a snapshot
+    that already contains part of it still ends in the same state.
+    """
+    path = op["p"]
+    if "n" in op:
+        target = _resolve(root, path)
+        if type(target) is list:
+            del target[op["n"] :]
+        return root
+    if not path:
+        return root if "d" in op else op["v"]
+    parent = _resolve(root, path[:-1])
+    key = path[-1]
+    if type(parent) is dict:
+        if "d" in op:
+            parent.pop(key, None)
+        else:
+            parent[key] = op["v"]
+    elif type(parent) is list and type(key) is int:
+        if key < len(parent):
+            parent[key] = op["v"]
+        elif key == len(parent):
+            parent.append(op["v"])
+    return root
+
+
+_MISSING = object()
+
+
+def _child(parent: Any, key: Any) -> Any:
+    if isinstance(parent, BaseModel):
+        return getattr(parent, key, _MISSING)
+    if type(parent) is dict:
+        return parent.get(key, _MISSING)
+    if type(parent) is list and type(key) is int and key < len(parent):
+        return parent[key]
+    return _MISSING
+
+
+def _json_key(parent: Any, key: Any) -> Any:
+    return key if type(parent) is list else str(key)
+
+
+def _replace(root: Any, path: list, value: Any) -> Any:
+    """Copy of root with value at path, copying only the containers on path.
+
+    Snapshots handed to the writer thread share everything else and are
+    never modified.
+    """
+    root = root.copy()
+    key = path[0]
+    if len(path) > 1:
+        root[key] = _replace(root[key], path[1:], value)
+    elif value is _MISSING:
+        del root[key]
+    elif type(root) is list and key == len(root):
+        root.append(value)
+    else:
+        root[key] = value
+    return root
+
+
 class DBUnit:
+    """A model stored as a json snapshot plus a journal of changes.
+
+    Each save appends only the changed fields to the journal, which is
+    compacted into the snapshot once it grows larger than the snapshot.
+    Commits naming the path they changed are diffed alone, otherwise the
+    whole model is dumped and diffed. The saved state is copied on write,
+    so compaction serializes it in a worker thread.
+    """
+
     def __init__(self, filename: str, model: Type[BaseModel]) -> None:
         self.filename = filename
+        self.stats = DBSaveStats(name=os.path.splitext(os.path.basename(filename))[0])
+        self.compact_task: Optional[asyncio.Task] = None
+        self.journal_filename = os.path.splitext(filename)[0] + ".journal"
+        self.journal = None
         if os.path.exists(filename):
             with open(filename, "r", encoding="utf-8") as f:
-                self.data = model.model_validate_json(f.read())
+                data = json.load(f)
         elif os.path.exists(filename + ".tmp"):
             with open(filename + ".tmp", "r", encoding="utf-8") as f:
-                self.data = model.model_validate_json(f.read())
+                data = json.load(f)
             os.replace(filename + ".tmp", filename)
         else:
+            data = None
+        if data is None:
             self.data = model()
-            with open(filename, "w", encoding="utf-8") as f:
-                f.write(self.data.model_dump_json(indent=2))
+        else:
+            self.data = model.model_validate(self.replay(data))
+        self.saved = self.data.model_dump(mode="json")
+        self.stats.snapshot_size = os.path.getsize(filename) if data is not None else 0
+        # 启动时把日志合并进快照，截断的最后一行也随之丢弃
+        if data is None or os.path.exists(self.journal_filename):
+            self.write_snapshot(self.saved)
+            if os.path.exists(self.journal_filename):
+                os.remove(self.journal_filename)
         self.dirty = False
+        self.changed: Optional[set[tuple]] = set()
         self.data._commit = self.commit
 
-    def commit(self) -> None:
+    def replay(self, data: Any) -> Any:
+        if not os.path.exists(self.journal_filename):
+            return data
+        with open(self.journal_filename, "rb") as f:
+            for line in f:
+                try:
+                    ops = json.loads(line)
+                except ValueError:
+                    # 写入中途退出留下的不完整记录
+                    break
+                for op in ops:
+                    data = apply(data, op)
+        return data
+
+    def commit(self, *path: Any) -> None:
         self.dirty = True
+        if self.changed is not None:
+            if path:
+                self.changed.add(path)
+            else:
+                self.changed = None
 
-    def save(self) -> None:
-        if self.dirty:
-            with open(self.filename + ".tmp", "w", encoding="utf-8") as f:
-                f.write(self.data.model_dump_json(indent=2))
-            os.replace(self.filename + ".tmp", self.filename)
-            self.dirty = False
+    def diff_path(self, path: tuple, ops: list[dict]) -> bool:
+        """Diff the value at path against the saved one, False if not found."""
+        model, saved, json_path = self.data, self.saved, []
+        for key in path[:-1]:
+            model = _child(model, key)
+            saved_key = _json_key(saved, key)
+            saved = _child(saved, saved_key)
+            if model is _MISSING or saved is _MISSING:
+                return False
+            json_path.append(saved_key)
+        key = _json_key(saved, path[-1])
+        json_path.append(key)
+        old = _child(saved, key)
+        new = _child(model, path[-1])
+        if new is _MISSING:
+            if old is not _MISSING and type(saved) is dict:
+                ops.append({"p": json_path, "d": 1})
+                self.saved = _replace(self.saved, json_path, _MISSING)
+            return type(saved) is dict
+        new = pydantic_core.to_jsonable_python(new)
+        if old is _MISSING:
+            if type(saved) is list and key != len(saved):
+                return False
+            ops.append({"p": json_path, "v": new})
+            self.saved = _replace(self.saved, json_path, new)
+        elif old != new:
+            diff(old, new, json_path, ops)
+            self.saved = _replace(self.saved, json_path, new)
+        return True
+
+    def save(self, full: bool = False) -> None:
+        if not self.dirty:
+            return
+        start = time.perf_counter()
+        ops: list[dict] = []
+        if self.changed is not None and not full:
+            for path in self.changed:
+                if not self.diff_path(path, ops):
+                    full = True
+                    break
+        if self.changed is None or full:
+            current = self.data.model_dump(mode="json")
+            diff(self.saved, current, [], ops)
+            self.saved = current
+        if ops:
+            if self.journal is None:
+                self.journal = open(self.journal_filename, "ab")
+            line = json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+            self.journal.write(line.encode("utf-8") + b"\n")
+            self.journal.flush()
+        self.changed = set()
+        self.dirty = False
+        self.stats.last_save_time = datetime.now()
+        self.stats.save_duration_sec = time.perf_counter() - start
+        self.stats.save_bytes = self.journal_size() - self.stats.journal_size
+        self.stats.journal_size = self.journal_size()
+
+    def journal_size(self) -> int:
+        if self.journal is None:
+            return self.stats.journal_size
+        return self.journal.tell()
+
+    def write_snapshot(self, saved: Any) -> None:
+        text = json.dumps(saved, ensure_ascii=False, indent=2).encode("utf-8")
+        with open(self.filename + ".tmp", "wb") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.filename + ".tmp", self.filename)
+        self.stats.snapshot_size = len(text)
+
+    def truncate_journal(self, offset: int) -> None:
+        """Drop the first offset bytes of the journal, already in the snapshot."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if not os.path.exists(self.journal_filename):
+            return
+        with open(self.journal_filename, "rb") as f:
+            f.seek(offset)
+            tail = f.read()
+        self.stats.journal_size = len(tail)
+        if not tail:
+            os.remove(self.journal_filename)
+            return
+        with open(self.journal_filename + ".tmp", "wb") as f:
+            f.write(tail)
+        os.replace(self.journal_filename + ".tmp", self.journal_filename)
+
+    def need_compact(self) -> bool:
+        size = self.journal_size()
+        return size > 0 and size > max(
+            Context.config.db.journal_compact_size, self.stats.snapshot_size
+        )
+
+    def start_compact(self) -> None:
+        if self.compact_task is not None and not self.compact_task.done():
+            self.stats.skipped_snapshots += 1
+            return
+        self.compact_task = asyncio.create_task(self.compact())
+
+    async def compact(self) -> None:
+        with Context.handle_error(f"压缩数据库 {self.filename} 失败"):
+            self.save()
+            saved, offset = self.saved, self.journal_size()
+            start = time.perf_counter()
+            self.stats.snapshot_running = True
+            try:
+                await asyncio.to_thread(self.write_snapshot, saved)
+            finally:
+                self.stats.snapshot_running = False
+            self.stats.snapshot_time = datetime.now()
+            self.stats.snapshot_duration_sec = time.perf_counter() - start
+            # 写快照期间追加的记录保留在日志中
+            self.truncate_journal(offset)
 
 
 class DB:
     def __init__(self) -> None:
-        self.units: dict[str, DBUnit] = {}
+        self.units: dict[str, DBUnit | SqliteUnit] = {}
+        self.sqlite: Optional[SqliteStore] = None
 
     def start(self) -> None:
         self.dir = os.path.join(Context.app_config.data_dir, "db")
         os.makedirs(self.dir, exist_ok=True)
+        if Context.app_config.db_backend == DBBackend.SQLITE:
+            self.sqlite = SqliteStore(os.path.join(self.dir, "tvsurf.sqlite3"))
         self.save_task = asyncio.create_task(self._save_loop())
 
     def stop(self) -> None:
-        self.save()
+        # 退出时完整比较一次，保存未声明路径的修改
+        for unit in self.units.values():
+            unit.save(full=True)
         self.save_task.cancel()
+        for unit in self.units.values():
+            if isinstance(unit, DBUnit) and unit.compact_task is not None:
+                unit.compact_task.cancel()
+        if self.sqlite is not None:
+            self.sqlite.close()
 
     async def _save_loop(self) -> None:
         while True:
             await asyncio.sleep(Context.config.db.save_interval.total_seconds())
             self.save()
+            for unit in self.units.values():
+                if unit.need_compact():
+                    unit.start_compact()
 
     def manage(self, name: str, model: Type[BaseModel]) -> BaseModel:
         if name in self.units:
             return self.units[name].data
         filename = os.path.join(self.dir, name + ".json")
-        if filename not in self.units:
+        if self.sqlite is not None:
+            self.units[name] = SqliteUnit(self.sqlite, name, model, filename)
+        else:
             self.units[name] = DBUnit(filename, model)
         return self.units[name].data
 
+    def sqlite_unit(self, name: str) -> Optional[SqliteUnit]:
+        """The unit of name if it is stored in SQLite and can be queried."""
+        unit = self.units.get(name)
+        return unit if isinstance(unit, SqliteUnit) else None
+
     def save(self) -> None:
         for unit in self.units.values():
             unit.save()
+
+    def get_stats(self) -> list[DBSaveStats]:
+        return [unit.stats for unit in self.units.values()]
@@ -0,0 +1,74 @@
+from service.schema.tvdb import TVDB, SourceUrl, DownloadStatus
+from service.downloader.storage import link_episode_files
+from .path import get_episode_path
+from typing import Optional
+import asyncio
+import os
+
+
+class EpisodeIndex:
+    """来源地址 + 内容哈希 -> 已下载完成的剧集，用于在不同剧集之间复用同一份文件"""
+
+    def __init__(self, tvdb: TVDB) -> None:
+        self.tvdb = tvdb
+        # 来源地址 -> 内容哈希 -> 剧集
+        self.index: dict[tuple[str, str], dict[str, set[tuple[int, int]]]] = {}
+        for tv_id, tv in tvdb.tvs.items():
+            for episode_id in range(len(tv.storage.episodes)):
+                self.add(tv_id, episode_id)
+
+    @staticmethod
+    def key(source: SourceUrl) -> tuple[str, str]:
+        return (source.source_key, source.url)
+
+    def add(self, tv_id: int, episode_id: int) -> None:
+        tv = self.tvdb.tvs[tv_id]
+        if episode_id >= len(tv.source.episodes):
+            return
+        episode = tv.storage.episodes[episode_id]
+        if episode.status != DownloadStatus.SUCCESS or episode.content_hash == "":
+            return
+        key = self.key(tv.source.episodes[episode_id].source)
+        self.index.setdefault(key, {}).setdefault(episode.content_hash, set()).add(
+            (tv_id, episode_id)
+        )
+
+    def find(self, tv_id: int, episode_id: int) -> Optional[tuple[int, int]]:
+        tv = self.tvdb.tvs[tv_id]
+        source = tv.source.episodes[episode_id].source
+        ext = os.path.splitext(tv.storage.episodes[episode_id].filename)[1]
+        # 索引只增不减，使用前确认候选剧集仍是登记时的内容
+        for hash, episodes in self.index.get(self.key(source), {}).items():
+            for other_tv_id, other_episode_id in episodes:
+                if (other_tv_id, other_episode_id) == (tv_id, episode_id):
+                    continue
+                other = self.tvdb.tvs.get(other_tv_id)
+                if other is None or other_episode_id >= len(other.storage.episodes):
+                    continue
+                episode = other.storage.episodes[other_episode_id]
+                if (
+                    episode.status == DownloadStatus.SUCCESS
+                    and episode.content_hash == hash
+                    and os.path.splitext(episode.filename)[1] == ext
+                    and self.key(other.source.episodes[other_episode_id].source)
+                    == self.key(source)
+                ):
+                    return other_tv_id, other_episode_id
+        return None
+
+    async def reuse(self, tv_id: int, episode_id: int) -> Optional[str]:
+        """Link an identical finished episode in place, return its content hash.
+
+        The content hash recorded when the episode finished is trusted, the
+        file is not read again.
+        """
+        found = self.find(tv_id, episode_id)
+        if found is None:
+            return None
+        other = self.tvdb.tvs[found[0]]
+        await asyncio.to_thread(
+            link_episode_files,
+            get_episode_path(other, found[1]),
+            get_episode_path(self.tvdb.tvs[tv_id], episode_id),
+        )
+        return other.storage.episodes[found[1]].content_hash
@@ -2,11 +2,14 @@ from service.lib.context import Context
 from service.schema.error import ErrorDB as ErrorDBSchema
 from service.schema.error import Error, ErrorType
 from datetime import datetime, timezone
+from typing import Optional
+from .sqlite_db import SqliteUnit
 
 
 class ErrorDB:
     async def start(self) -> None:
         self.error_db = Context.data("db").manage("error_db", ErrorDBSchema)
+        self.sqlite: Optional[SqliteUnit] = Context.data("db").sqlite_unit("error_db")
         Context.error_handler.add_handler("error", self.handle_error)
         Context.error_handler.add_handler("critical", self.handle_critical_error)
         Context.error_handler.set_ignore_error_handler(
@@ -40,6 +43,11 @@ class ErrorDB:
         self.error_db.commit()
 
     def get_errors(self) -> list[Error]:
+        if self.sqlite is not None:
+            return [
+                Error.model_validate(error)
+                for error in self.sqlite.ordered("errors", "timestamp")
+            ]
         return self.error_db.errors
 
     def remove_errors(self, ids: list[int]) -> None:
@@ -7,35 +7,96 @@ from service.schema.tvdb import (
     TrackStatus,
     DownloadStatus,
     SourceUrl,
+    StorageMode,
+    SetupStatus,
 )
 from datetime import datetime
 from service.schema.downloader import DownloadProgressWithName
-from service.downloader.task import TaskDownloadManager
-from typing import Callable, Awaitable
-from .path import create_tv_path, remove_tv_path, get_tv_path, get_episode_path
+from service.downloader.task import TaskDownloadManager, UrlResolver
+from service.downloader.m3u8 import M3U8Downloader
+from service.downloader.simple import UrlExpiredError
+from typing import Callable, Awaitable, Optional
+from .path import (
+    create_tv_path,
+    remove_tv_path,
+    get_tv_path,
+    get_episode_path,
+    remove_episode_files,
+)
+from .remuxer import LibraryRemuxer
+from .dedup import EpisodeIndex
+from .sqlite_db import SqliteUnit
+from .cover import create_cover_variants, prune_cover_cache
+from .update_schedule import record_check, initial_update
+from service.schema.monitor import RemuxProgress, UpdateRunStats
 from service.searcher.searchers import Searchers
 from service.lib.parallel_holder import ParallelHolder
 import asyncio
 import os
+import time
 import uuid
 import aiofiles
 import shutil
 
 _HAS_AD_SHORT_EPISODE_NO_WARN_SEC = 600.0
+# 添加剧集后获取封面的重试次数及间隔
+_SETUP_RETRIES = 3
+_SETUP_RETRY_INTERVAL_SEC = 10.0
+# 调度器最长的休眠时间，以便及时发现新添加或重新追踪的剧集
+_UPDATE_POLL_SEC = 300.0
 
 
 class TVDownloadManager:
     def __init__(self, tvdb: TVDB) -> None:
         self.tvdb = tvdb
+        self.index = EpisodeIndex(tvdb)
 
     async def start(self) -> None:
         self.task_manager = TaskDownloadManager()
         await self.task_manager.start()
         self.searchers = Searchers()
+        self.prefetch_tasks: set[asyncio.Task] = set()
 
     async def stop(self) -> None:
+        for task in self.prefetch_tasks:
+            task.cancel()
+        await asyncio.gather(*self.prefetch_tasks, return_exceptions=True)
         await self.task_manager.stop()
 
+    def resource_resolver(
+        self, tv_id: int, episode_id: int, source: SourceUrl
+    ) -> UrlResolver:
+        calls = 0
+
+        async def resolve(error: Optional[Exception]) -> str:
+            nonlocal calls
+            calls += 1
+            # 同一任务再次解析地址时，说明上次的地址已经失效
+            url = await self.searchers.get_resource(
+                source,
+                refresh=calls > 1,
+                expired=isinstance(error, UrlExpiredError),
+            )
+            self.prefetch_next_resource(tv_id, episode_id + 1)
+            return url
+
+        return resolve
+
+    def prefetch_next_resource(self, tv_id: int, episode_id: int) -> None:
+        """Resolve the next queued episode while this one downloads."""
+        tv = self.tvdb.tvs.get(tv_id)
+        if (
+            tv is None
+            or episode_id >= len(tv.storage.episodes)
+            or tv.storage.episodes[episode_id].status != DownloadStatus.RUNNING
+        ):
+            return
+        task = asyncio.create_task(
+            self.searchers.prefetch_resource(tv.source.episodes[episode_id].source)
+        )
+        self.prefetch_tasks.add(task)
+        task.add_done_callback(self.prefetch_tasks.discard)
+
     def submit_episode(self, tv_id: int, episode_id: int) -> None:
         tv = self.tvdb.tvs[tv_id]
         if tv.storage.episodes[episode_id].status != DownloadStatus.RUNNING:
@@ -43,20 +104,26 @@ class TVDownloadManager:
         episode = tv.source.episodes[episode_id]
         filename = get_episode_path(tv, episode_id)
         self.task_manager.add_task(
-            lambda: self.searchers.get_resource(episode.source),
+            self.resource_resolver(tv_id, episode_id, episode.source),
             filename,
             f"{tv.name} - {episode.name}",
             {"tv_id": tv_id, "episode_id": episode_id},
-            lambda: self.on_download_finished(tv_id, episode_id),
+            lambda content_hash: self.on_download_finished(
+                tv_id, episode_id, content_hash
+            ),
             lambda error: self.on_download_error(tv_id, episode_id, error),
             lambda ad_detected, content_duration_sec=None: self.on_ad_detected(
                 tv_id, episode_id, ad_detected, content_duration_sec
             ),
+            lambda: self.index.reuse(tv_id, episode_id),
         )
 
     def submit_episodes(self, tv_id: int, ep_start: int) -> None:
         tv = self.tvdb.tvs[tv_id]
-        for i in range(ep_start, len(tv.source.episodes)):
+        # 分配中途失败时已分配的剧集可能少于来源
+        for i in range(
+            ep_start, min(len(tv.source.episodes), len(tv.storage.episodes))
+        ):
             self.submit_episode(tv_id, i)
 
     async def cancel_tv(self, tv_id: int) -> None:
@@ -73,16 +140,28 @@ class TVDownloadManager:
     def get_download_progress(self) -> list[DownloadProgressWithName]:
         return self.task_manager.get_progress()
 
-    def on_download_finished(self, tv_id: int, episode_id: int) -> None:
+    def get_live_downloaders(self, tv_id: int) -> dict[int, M3U8Downloader]:
+        return {
+            metadata["episode_id"]: downloader
+            for metadata, downloader in self.task_manager.get_downloaders(
+                lambda metadata: metadata["tv_id"] == tv_id
+            )
+        }
+
+    def on_download_finished(
+        self, tv_id: int, episode_id: int, content_hash: str
+    ) -> None:
         tv = self.tvdb.tvs[tv_id]
         tv.storage.episodes[episode_id].status = DownloadStatus.SUCCESS
         tv.storage.episodes[episode_id].content_uuid = str(uuid.uuid4())
-        self.tvdb.commit()
+        tv.storage.episodes[episode_id].content_hash = content_hash
+        self.tvdb.commit("tvs", tv_id)
+        self.index.add(tv_id, episode_id)
 
     def on_download_error(self, tv_id: int, episode_id: int, error: Exception) -> None:
         tv = self.tvdb.tvs[tv_id]
         tv.storage.episodes[episode_id].status = DownloadStatus.FAILED
-        self.tvdb.commit()
+        self.tvdb.commit("tvs", tv_id)
 
     def on_ad_detected(
         self,
@@ -124,6 +203,7 @@ class Updater:
         self.tvdb = tvdb
         self.on_update = on_update
         self.on_no_update = on_no_update
+        self.stats = UpdateRunStats()
 
     async def start(self) -> None:
         self.searchers = Searchers()
@@ -135,59 +215,133 @@ class Updater:
 
     async def update_tv(self, tv_id: int) -> None:
         tv = self.tvdb.tvs[tv_id]
-        new_source = await self.searchers.update_source(tv.source)
-        if new_source is not None:
-            await self.on_update(tv_id, new_source)
+        # 检查失败时也不会立刻被再次调度
+        tv.track.next_update = (
+            datetime.now() + Context.config.updater.min_update_interval
+        )
+        self.tvdb.commit("tvs", tv_id)
+        result = await self.searchers.update_source(
+            tv.source, tv.track.source_fingerprint
+        )
+        if tv_id not in self.tvdb.tvs:
+            return
+        updated = result is not None and result.source is not None
+        record_check(tv.track, datetime.now(), updated, Context.config.updater)
+        self.tvdb.commit("tvs", tv_id)
+        if result is None:
+            self.stats.failed += 1
+        elif result.unchanged:
+            self.stats.unchanged += 1
+        elif result.source is None:
+            self.stats.no_update += 1
+        else:
+            self.stats.updated += 1
+        if result is not None and result.source is not None:
+            await self.on_update(tv_id, result.source)
         else:
             await self.on_no_update(tv_id)
+        if result is not None:
+            # 更新写入成功后才记录指纹，否则下次检查时会被当作没有变化
+            tv.track.source_fingerprint = result.fingerprint
+            self.tvdb.commit("tvs", tv_id)
 
-    async def update_all(self) -> None:
-        with Context.handle_error(title="update_all", type="critical"):
-            async with ParallelHolder(Context.config.updater.update_parallel) as holder:
-                for i, tv in self.tvdb.tvs.items():
-                    if tv.track.tracking:
+    def due_tvs(self, now: datetime) -> list[int]:
+        due = []
+        for i, tv in self.tvdb.tvs.items():
+            if not tv.track.tracking:
+                continue
+            if tv.track.next_update == datetime.min:
+                tv.track.next_update = initial_update(now, Context.config.updater)
+                self.tvdb.commit("tvs", i)
+            if tv.track.next_update <= now:
+                due.append(i)
+        return due
+
+    def next_wakeup(self, now: datetime) -> float:
+        upcoming = [
+            tv.track.next_update for tv in self.tvdb.tvs.values() if tv.track.tracking
+        ]
+        if not upcoming:
+            return _UPDATE_POLL_SEC
+        seconds = (min(upcoming) - now).total_seconds()
+        return min(max(seconds, 1.0), _UPDATE_POLL_SEC)
+
+    async def update_due(self) -> None:
+        with Context.handle_error(title="update_due", type="critical"):
+            due = self.due_tvs(datetime.now())
+            if not due:
+                return
+            self.stats = UpdateRunStats(
+                running=True, start_time=datetime.now(), checked=len(due)
+            )
+            start = time.monotonic()
+            try:
+                await self.searchers.prefetch_sources(
+                    [self.tvdb.tvs[i].source for i in due]
+                )
+                async with ParallelHolder(
+                    Context.config.updater.update_parallel
+                ) as holder:
+                    for i in due:
                         holder.schedule(lambda tv_id=i: self.update_tv(tv_id))
-                await holder.wait_all()
+                    await holder.wait_all()
+            finally:
+                self.stats.running = False
+                self.stats.duration_sec = time.monotonic() - start
+            Context.info(
+                f"更新检查完成: {self.stats.checked} 部剧集, "
+                f"未变化 {self.stats.unchanged}, 无新剧集 {self.stats.no_update}, "
+                f"有更新 {self.stats.updated}, 失败 {self.stats.failed}, "
+                f"耗时 {self.stats.duration_sec:.1f} 秒"
+            )
         self.tvdb.last_update = datetime.now()
-        self.tvdb.commit()
-
-    def should_update(self) -> bool:
-        return (
-            datetime.now() - self.tvdb.last_update
-            > Context.config.updater.update_interval
-        )
+        self.tvdb.commit("last_update")
 
     async def update_loop(self) -> None:
         with Context.handle_error(title="update_loop", type="critical"):
             while True:
-                if self.should_update():
-                    await self.update_all()
-                await asyncio.sleep(3600)
+                await self.update_due()
+                await asyncio.sleep(self.next_wakeup(datetime.now()))
 
 
 class LocalManager:
     async def start(self) -> None:
         self.tvdb: TVDB = Context.data("db").manage("tvdb", TVDB)
+        self.sqlite: Optional[SqliteUnit] = Context.data("db").sqlite_unit("tvdb")
         self.download_manager = TVDownloadManager(self.tvdb)
         self.updater = Updater(self.tvdb, self.on_update, self.on_no_update)
+        self.remuxer = LibraryRemuxer(self.tvdb)
+        self.setup_tasks: dict[int, asyncio.Task] = {}
         await self.download_manager.start()
         await self.resume_download_on_start()
         await self.updater.start()
+        self.cover_task = asyncio.create_task(self.build_missing_covers())
 
     async def stop(self) -> None:
+        self.cover_task.cancel()
+        for task in self.setup_tasks.values():
+            task.cancel()
+        await asyncio.gather(
+            self.cover_task, *self.setup_tasks.values(), return_exceptions=True
+        )
+        await self.remuxer.stop()
         await self.updater.stop()
         await self.download_manager.stop()
 
     async def resume_download_on_start(self) -> None:
         for i, tv in self.tvdb.tvs.items():
-            self.download_manager.submit_episodes(i, 0)
+            # 未完成分配的剧集由后台任务分配后提交下载
+            if tv.storage.setup == SetupStatus.PENDING:
+                self.start_setup(i)
+            else:
+                self.download_manager.submit_episodes(i, 0)
 
     async def on_update(self, id: int, source: Source) -> None:
         tv = self.tvdb.tvs[id]
         tv.track.last_update = datetime.now()
         tv.source = source
         self.allocate_local(tv)
-        self.tvdb.commit()
+        self.tvdb.commit("tvs", id)
 
     async def on_no_update(self, id: int) -> None:
         tv = self.tvdb.tvs[id]
@@ -196,7 +350,7 @@ class LocalManager:
             < datetime.now() - Context.config.updater.tracking_timeout
         ):
             tv.track.tracking = False
-            self.tvdb.commit()
+            self.tvdb.commit("tvs", id)
 
     async def download_cover(self, tv: TV) -> None:
         async with Context.client.get(tv.source.cover_url) as resp:
@@ -206,34 +360,112 @@ class LocalManager:
             async with aiofiles.open(f"{get_tv_path(tv)}/{filename}", mode="wb") as f:
                 await f.write(cover)
             tv.storage.cover = filename
+        await self.update_cover_variants(tv)
 
-    async def add_tv(self, name: str, source: Source, tracking: bool) -> int:
-        for i in self.tvdb.tvs.values():
-            if i.name == name:
-                raise KeyError(f"TV {name} 已存在")
+    async def update_cover_variants(self, tv: TV) -> None:
+        if not tv.storage.cover:
+            return
+        with Context.handle_error(f"生成 {tv.name} 封面缩略图错误"):
+            cover_hash, widths = await create_cover_variants(
+                os.path.join(get_tv_path(tv), tv.storage.cover)
+            )
+            tv.storage.cover_hash = cover_hash
+            tv.storage.cover_widths = widths
+
+    async def build_missing_covers(self) -> None:
+        """Thumbnails for shows added before they existed, unused ones removed."""
+        with Context.handle_error("build_missing_covers"):
+            await asyncio.to_thread(
+                prune_cover_cache,
+                {tv.storage.cover_hash for tv in self.tvdb.tvs.values()},
+            )
+            for tv in list(self.tvdb.tvs.values()):
+                if not tv.storage.cover_hash and tv.id in self.tvdb.tvs:
+                    await self.update_cover_variants(tv)
+                    self.tvdb.commit("tvs", tv.id)
+
+    async def add_tv(
+        self,
+        name: str,
+        source: Source,
+        tracking: bool,
+        storage_mode: StorageMode = StorageMode.MP4,
+    ) -> int:
+        if self.sqlite is not None:
+            exists = bool(self.sqlite.find("tvs", "name", name))
+        else:
+            exists = any(tv.name == name for tv in self.tvdb.tvs.values())
+        if exists:
+            raise KeyError(f"TV {name} 已存在")
         id = self.tvdb.new_tv_id
         self.tvdb.new_tv_id += 1
         tv = TV(
             id=id,
             name=name,
             source=source,
-            storage=Storage(directory=name, episodes=[], cover=""),
+            storage=Storage(
+                directory=name,
+                episodes=[],
+                cover="",
+                mode=storage_mode,
+                setup=SetupStatus.PENDING,
+            ),
             track=TrackStatus(tracking=tracking, last_update=datetime.now()),
             series=[],
         )
         await create_tv_path(tv)
-        await self.download_cover(tv)
         self.tvdb.tvs[id] = tv
-        self.allocate_local(tv)
-        self.tvdb.commit()
+        self.tvdb.commit("new_tv_id")
+        self.tvdb.commit("tvs", id)
+        self.start_setup(id)
         return id
 
+    def start_setup(self, id: int) -> None:
+        task = asyncio.create_task(self.setup_tv(id))
+        self.setup_tasks[id] = task
+        task.add_done_callback(lambda _: self.setup_tasks.pop(id, None))
+
+    async def setup_tv(self, id: int) -> None:
+        """Allocate episodes and fetch the cover of a newly added show."""
+        tv = self.tvdb.tvs[id]
+        allocated = False
+        with Context.handle_error(f"分配 {tv.name} 剧集错误"):
+            self.allocate_local(tv)
+            allocated = True
+        if not allocated:
+            tv.storage.setup = SetupStatus.FAILED
+        self.tvdb.commit("tvs", id)
+        if not allocated:
+            return
+        setup = SetupStatus.COVER_FAILED
+        with Context.handle_error(f"获取 {tv.name} 封面错误"):
+            if tv.source.cover_url:
+                await self.download_cover_with_retry(tv)
+            setup = SetupStatus.DONE
+        tv.storage.setup = setup
+        self.tvdb.commit("tvs", id)
+
+    async def download_cover_with_retry(self, tv: TV) -> None:
+        for i in range(_SETUP_RETRIES, 0, -1):
+            try:
+                await self.download_cover(tv)
+                break
+            except Exception:
+                if i == 1:
+                    raise
+                await asyncio.sleep(_SETUP_RETRY_INTERVAL_SEC)
+
     async def remove_tv(self, id: int) -> None:
+        setup = self.setup_tasks.get(id)
+        if setup is not None:
+            setup.cancel()
+            await asyncio.gather(setup, return_exceptions=True)
         await self.download_manager.cancel_tv(id)
         tv = self.tvdb.tvs[id]
+        # 复用的剧集是硬链接，删除目录只会减少引用计数，其他剧集的文件不受影响
         shutil.rmtree(get_tv_path(tv))
         del self.tvdb.tvs[id]
-        self.tvdb.commit()
+        self.tvdb.commit("tvs", id)
 
     def get_tv(self, id: int) -> TV:
         return self.tvdb.tvs[id]
@@ -242,17 +474,19 @@ class LocalManager:
         return list(self.tvdb.tvs.values())
 
     def allocate_local(self, tv: TV) -> None:
-        ext = ".mp4"
+        ext = ".m3u8" if tv.storage.mode == StorageMode.HLS else ".mp4"
         start_index = len(tv.storage.episodes)
-        filenames = set(ep.filename for ep in tv.storage.episodes)
+        # HLS 剧集会转换为同名 MP4，按去掉扩展名后的文件名去重
+        stems = set(os.path.splitext(ep.filename)[0] for ep in tv.storage.episodes)
         for i in range(start_index, len(tv.source.episodes)):
             name = tv.source.episodes[i].name
-            filename = f"{name}{ext}"
+            stem = name
             idx = 0
-            while filename in filenames:
+            while stem in stems:
                 idx += 1
-                filename = f"{name}-{idx}{ext}"
-            filenames.add(filename)
+                stem = f"{name}-{idx}"
+            stems.add(stem)
+            filename = f"{stem}{ext}"
             tv.storage.episodes.append(
                 Storage.Episode(
                     name=name, filename=filename, status=DownloadStatus.RUNNING
@@ -266,17 +500,31 @@ class LocalManager:
     def get_download_count(self) -> int:
         return self.download_manager.get_download_count()
 
+    def get_live_downloaders(self, tv_id: int) -> dict[int, M3U8Downloader]:
+        return self.download_manager.get_live_downloaders(tv_id)
+
+    def start_remux(self) -> None:
+        self.remuxer.start_remux()
+
+    def get_remux_progress(self) -> RemuxProgress:
+        return self.remuxer.get_progress()
+
+    def get_update_stats(self) -> UpdateRunStats:
+        return self.updater.stats
+
     async def update_tv_source(self, id: int, source: Source) -> None:
         await self.download_manager.cancel_tv(id)
         tv = self.tvdb.tvs[id]
-        for id in range(len(tv.storage.episodes)):
-            if tv.storage.episodes[id].status == DownloadStatus.SUCCESS:
-                # do not use aiofiles to remove file, because it's in the transaction
-                os.remove(get_episode_path(tv, id))
+        for episode_id in range(len(tv.storage.episodes)):
+            if tv.storage.episodes[episode_id].status == DownloadStatus.SUCCESS:
+                remove_episode_files(tv, episode_id)
         tv.source = source
+        tv.track.source_fingerprint = ""
         tv.storage.episodes = []
         self.allocate_local(tv)
-        self.tvdb.commit()
+        if tv.storage.setup == SetupStatus.FAILED:
+            tv.storage.setup = SetupStatus.COVER_FAILED
+        self.tvdb.commit("tvs", id)
 
     async def update_episode_series(
         self, tv_id: int, episode_id: int, source: SourceUrl
@@ -285,27 +533,30 @@ class LocalManager:
         tv = self.tvdb.tvs[tv_id]
         tv.source.episodes[episode_id].source = source
         if tv.storage.episodes[episode_id].status == DownloadStatus.SUCCESS:
-            # do not use aiofiles to remove file, because it's in the transaction
-            if os.path.exists(get_episode_path(tv, episode_id)):
-                os.remove(get_episode_path(tv, episode_id))
+            remove_episode_files(tv, episode_id)
         tv.storage.episodes[episode_id].status = DownloadStatus.RUNNING
         self.download_manager.submit_episode(tv_id, episode_id)
-        self.tvdb.commit()
+        self.tvdb.commit("tvs", tv_id)
 
     async def set_tv_tracking(self, id: int, tracking: bool) -> None:
         tv = self.tvdb.tvs[id]
         tv.track.tracking = tracking
         tv.track.last_update = datetime.now()
-        self.tvdb.commit()
+        tv.track.backoff = 0
+        tv.track.next_update = datetime.min
+        self.tvdb.commit("tvs", id)
+
+    async def set_tv_storage_mode(self, id: int, mode: StorageMode) -> None:
+        tv = self.tvdb.tvs[id]
+        tv.storage.mode = mode
+        self.tvdb.commit("tvs", id)
 
     async def schedule_episode_download(self, id: int, episode_ids: list[int]) -> None:
         tv = self.tvdb.tvs[id]
         for episode_id in episode_ids:
             await self.download_manager.cancel_episode(id, episode_id)
             if tv.storage.episodes[episode_id].status == DownloadStatus.SUCCESS:
-                # do not use aiofiles to remove file, because it's in the transaction
-                if os.path.exists(get_episode_path(tv, episode_id)):
-                    os.remove(get_episode_path(tv, episode_id))
+                remove_episode_files(tv, episode_id)
             tv.storage.episodes[episode_id].status = DownloadStatus.RUNNING
             self.download_manager.submit_episode(id, episode_id)
-            self.tvdb.commit()
+            self.tvdb.commit("tvs", id)
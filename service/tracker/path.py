@@ -1,4 +1,5 @@
 from service.schema.tvdb import TV
+from service.downloader.storage import episode_files
 import aiofiles.os
 from service.lib.context import Context
 import os
@@ -18,3 +19,10 @@ def get_tv_path(tv: TV) -> str:
 
 def get_episode_path(tv: TV, episode: int) -> str:
     return os.path.join(get_tv_path(tv), tv.storage.episodes[episode].filename)
+
+
+def remove_episode_files(tv: TV, episode: int) -> None:
+    # do not use aiofiles to remove file, because it's in the transaction
+    for p in episode_files(get_episode_path(tv, episode)):
+        if os.path.exists(p):
+            os.remove(p)
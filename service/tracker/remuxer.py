@@ -0,0 +1,137 @@
+from service.lib.context import Context
+from service.schema.tvdb import TVDB, DownloadStatus
+from service.schema.monitor import RemuxProgress
+from service.downloader.mp4 import read_mp4_layout, remux_mp4
+from service.downloader.storage import content_hash
+from .path import get_episode_path, remove_episode_files
+from typing import Optional
+import asyncio
+import os
+import uuid
+
+
+class LibraryRemuxer:
+    def __init__(self, tvdb: TVDB) -> None:
+        self.tvdb = tvdb
+        self.progress = RemuxProgress()
+        self.task: Optional[asyncio.Task] = None
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+
+    def start_remux(self) -> None:
+        if self.task is not None and not self.task.done():
+            raise Exception("媒体库转换正在进行中")
+        self.task = asyncio.create_task(self.run())
+
+    def get_progress(self) -> RemuxProgress:
+        return self.progress
+
+    def collect_episodes(self) -> list[tuple[int, int]]:
+        return [
+            (tv_id, episode_id)
+            for tv_id, tv in self.tvdb.tvs.items()
+            for episode_id, episode in enumerate(tv.storage.episodes)
+            if episode.status == DownloadStatus.SUCCESS
+            and (
+                episode.filename.endswith(".mp4")
+                or (
+                    Context.config.download.remux_hls
+                    and episode.filename.endswith(".m3u8")
+                )
+            )
+        ]
+
+    def episode_changed(self, tv_id, tv, episode_id, episode) -> bool:
+        return (
+            self.tvdb.tvs.get(tv_id) is not tv
+            or episode_id >= len(tv.storage.episodes)
+            or tv.storage.episodes[episode_id] is not episode
+            or episode.status != DownloadStatus.SUCCESS
+        )
+
+    async def remux_hls_episode(self, tv_id: int, episode_id: int) -> bool:
+        layout = Context.config.download.mp4_layout
+        tv = self.tvdb.tvs[tv_id]
+        episode = tv.storage.episodes[episode_id]
+        path = get_episode_path(tv, episode_id)
+        filename = os.path.splitext(episode.filename)[0] + ".mp4"
+        tmpname = os.path.splitext(path)[0] + ".remux.mp4"
+        try:
+            await remux_mp4(path, tmpname, layout)
+            new_hash = await asyncio.to_thread(content_hash, tmpname)
+            if self.episode_changed(tv_id, tv, episode_id, episode):
+                return True
+            mp4_path = os.path.splitext(path)[0] + ".mp4"
+            os.replace(tmpname, mp4_path)
+            remove_episode_files(tv, episode_id)
+            episode.filename = filename
+            episode.content_uuid = str(uuid.uuid4())
+            episode.content_hash = new_hash
+            self.tvdb.commit("tvs", tv_id)
+            self.progress.remuxed += 1
+            return True
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    async def remux_episode(self, tv_id: int, episode_id: int) -> bool:
+        layout = Context.config.download.mp4_layout
+        tv = self.tvdb.tvs[tv_id]
+        episode = tv.storage.episodes[episode_id]
+        path = get_episode_path(tv, episode_id)
+        if await asyncio.to_thread(read_mp4_layout, path) == layout:
+            return False
+        tmpname = os.path.splitext(path)[0] + ".remux.mp4"
+        try:
+            await remux_mp4(path, tmpname, layout)
+            new_hash = await asyncio.to_thread(content_hash, tmpname)
+            # 转换期间剧集可能被删除或重新下载
+            if self.episode_changed(tv_id, tv, episode_id, episode):
+                return True
+            os.replace(tmpname, path)
+            episode.content_uuid = str(uuid.uuid4())
+            episode.content_hash = new_hash
+            self.tvdb.commit("tvs", tv_id)
+            self.progress.remuxed += 1
+            return True
+        finally:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+
+    async def run(self) -> None:
+        episodes = self.collect_episodes()
+        self.progress = RemuxProgress(running=True, total=len(episodes))
+        try:
+            for tv_id, episode_id in episodes:
+                tv = self.tvdb.tvs.get(tv_id)
+                if tv is None or episode_id >= len(tv.storage.episodes):
+                    self.progress.finished += 1
+                    continue
+                episode = tv.storage.episodes[episode_id]
+                self.progress.current = f"{tv.name} - {episode.name}"
+                remuxed = False
+                if episode.status == DownloadStatus.SUCCESS:
+                    try:
+                        with Context.handle_error(
+                            f"转换 {tv.name} - {episode.name} 失败", rethrow=True
+                        ):
+                            if episode.filename.endswith(".m3u8"):
+                                remuxed = await self.remux_hls_episode(
+                                    tv_id, episode_id
+                                )
+                            else:
+                                remuxed = await self.remux_episode(tv_id, episode_id)
+                    except Exception:
+                        self.progress.failed += 1
+                        remuxed = True
+                self.progress.finished += 1
+                if remuxed:
+                    await asyncio.sleep(
+                        Context.config.download.remux_interval.total_seconds()
+                    )
+        finally:
+            self.progress.running = False
+            self.progress.current = ""
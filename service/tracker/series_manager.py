@@ -1,11 +1,14 @@
 from service.lib.context import Context
 from service.schema.tvdb import Series, TVDB
 from datetime import datetime
+from typing import Optional
+from .sqlite_db import SqliteUnit
 
 
 class SeriesManager:
     async def start(self) -> None:
         self.tvdb: TVDB = Context.data("db").manage("tvdb", TVDB)
+        self.sqlite: Optional[SqliteUnit] = Context.data("db").sqlite_unit("tvdb")
 
     def update_series_tvs(self, id: int, tvs: list[int]) -> None:
         original_tvs = list(self.tvdb.series[id].tvs)
@@ -20,9 +23,12 @@ class SeriesManager:
         self.tvdb.commit()
 
     def add_series(self, name: str) -> int:
-        for existing_series in self.tvdb.series.values():
-            if existing_series.name == name:
-                raise ValueError(f"播放列表名称 '{name}' 已存在")
+        if self.sqlite is not None:
+            exists = bool(self.sqlite.find("series", "name", name))
+        else:
+            exists = any(s.name == name for s in self.tvdb.series.values())
+        if exists:
+            raise ValueError(f"播放列表名称 '{name}' 已存在")
 
         id = self.tvdb.new_series_id
         self.tvdb.new_series_id += 1
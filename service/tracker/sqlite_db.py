@@ -0,0 +1,320 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from service.schema.dtype import BaseModel
+from service.schema.monitor import DBSaveStats
+from typing import Any, Optional, Type
+import json
+import os
+import pydantic_core
+import sqlite3
+import time
+
+
+@dataclass
+class Collection:
+    """A field of a model stored one row per entry.
+
+    indexes maps an index name to the json path it covers, children maps a
+    name to (array path, value path) copied into the children table, so that
+    nested arrays such as episode status can be indexed too.
+    """
+
+    name: str
+    indexes: dict[str, str] = field(default_factory=dict)
+    children: dict[str, tuple[str, str]] = field(default_factory=dict)
+    # list 字段中作为行主键的元素字段，dict 字段使用字典键
+    key: str = ""
+
+
+_COLLECTIONS: dict[str, list[Collection]] = {
+    "tvdb": [
+        Collection(
+            "tvs",
+            indexes={"name": "$.name"},
+            children={
+                "series": ("$.series", "$"),
+                "episode_status": ("$.storage.episodes", "$.status"),
+            },
+        ),
+        Collection("series", indexes={"name": "$.name"}),
+    ],
+    "user_db": [Collection("users", indexes={"token": "$.token"})],
+    "error_db": [Collection("errors", indexes={"timestamp": "$.timestamp"}, key="id")],
+}
+
+
+def collections(name: str) -> list[Collection]:
+    if name.startswith("user_data_db_"):
+        return [Collection("tvs")]
+    return _COLLECTIONS.get(name, [])
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rows (
+    unit TEXT NOT NULL,
+    field TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (unit, field, key)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS children (
+    unit TEXT NOT NULL,
+    field TEXT NOT NULL,
+    key TEXT NOT NULL,
+    child TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    value,
+    PRIMARY KEY (unit, field, key, child, idx)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS children_value ON children (unit, field, child, value);
+"""
+
+
+def _literal(value: str) -> str:
+    # 部分索引只对写成常量的条件生效，不能使用参数
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _indexed_rows(unit: str, name: str, path: str) -> tuple[str, str]:
+    """Expression and condition matching the partial index of path."""
+    return (
+        f"json_extract(value, {_literal(path)})",
+        f"unit = {_literal(unit)} AND field = {_literal(name)}",
+    )
+
+
+class SqliteStore:
+    def __init__(self, filename: str) -> None:
+        self.conn = sqlite3.connect(filename)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+
+    def create_indexes(self, unit: str) -> None:
+        with self.conn:
+            for c in collections(unit):
+                for index, path in c.indexes.items():
+                    expr, where = _indexed_rows(unit, c.name, path)
+                    name = f"{unit}_{c.name}_{index}".replace('"', '""')
+                    self.conn.execute(
+                        f'CREATE INDEX IF NOT EXISTS "{name}" '
+                        f"ON rows ({expr}) WHERE {where}"
+                    )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(
+        pydantic_core.to_jsonable_python(value),
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+class SqliteUnit:
+    """A model stored as rows of a SQLite database.
+
+    Collection entries are one row each, the remaining fields share one
+    row. A save writes the rows that changed in one transaction, commits
+    naming their path only compare the rows under it. Queries save pending
+    changes first, so they see everything committed to the model.
+    """
+
+    def __init__(
+        self, store: SqliteStore, name: str, model: Type[BaseModel], json_filename: str
+    ) -> None:
+        self.store = store
+        self.name = name
+        self.stats = DBSaveStats(name=name)
+        self.collections = {c.name: c for c in collections(name)}
+        store.create_indexes(name)
+        self.saved: dict[tuple[str, str], str] = {}
+        self.changed: Optional[set[tuple]] = set()
+        data = self.load()
+        if data is None:
+            self.data = self.migrate(model, json_filename)
+            self.dirty = True
+            self.save(full=True)
+            # 提交之后才改名，中途退出时下次启动会重新导入
+            if os.path.exists(json_filename):
+                os.replace(json_filename, json_filename + ".migrated")
+        else:
+            self.data = model.model_validate(data)
+            self.fill_children()
+        self.dirty = False
+        self.data._commit = self.commit
+
+    def load(self) -> Optional[dict]:
+        rows = self.store.conn.execute(
+            "SELECT field, key, value FROM rows WHERE unit = ?", (self.name,)
+        ).fetchall()
+        if not rows:
+            return None
+        data: dict = {}
+        entries: dict[str, list[tuple[str, Any]]] = {c: [] for c in self.collections}
+        for field_name, key, value in rows:
+            self.saved[(field_name, key)] = value
+            if field_name == "":
+                data.update(json.loads(value))
+            else:
+                entries[field_name].append((key, json.loads(value)))
+        for name, items in entries.items():
+            if self.collections[name].key:
+                items.sort(key=lambda item: int(item[0]))
+                data[name] = [value for _, value in items]
+            else:
+                data[name] = dict(items)
+        return data
+
+    def migrate(self, model: Type[BaseModel], json_filename: str) -> BaseModel:
+        """Data of the JSON backend, empty if there is none."""
+        from .db import DBUnit
+
+        if not os.path.exists(json_filename) and not os.path.exists(
+            json_filename + ".tmp"
+        ):
+            return model()
+        return DBUnit(json_filename, model).data
+
+    def commit(self, *path: Any) -> None:
+        self.dirty = True
+        if self.changed is not None:
+            if path:
+                self.changed.add(path)
+            else:
+                self.changed = None
+
+    def entries(self, name: str) -> dict[str, Any]:
+        value = getattr(self.data, name)
+        key = self.collections[name].key
+        if key:
+            return {str(getattr(item, key)): item for item in value}
+        return {str(k): v for k, v in value.items()}
+
+    def entry(self, name: str, key: Any) -> Any:
+        if self.collections[name].key:
+            return self.entries(name).get(str(key))
+        return getattr(self.data, name).get(key)
+
+    def rows(self, paths: Optional[set[tuple]]) -> dict[tuple[str, str], Any]:
+        """Current value of the rows under paths, None for a removed row."""
+        rows: dict[tuple[str, str], Any] = {}
+        names = set(self.collections)
+        if paths is not None:
+            names = set()
+            for path in paths:
+                if path[0] not in self.collections:
+                    rows[("", "")] = None
+                elif len(path) == 1:
+                    names.add(path[0])
+                else:
+                    rows[(path[0], str(path[1]))] = self.entry(path[0], path[1])
+        else:
+            rows[("", "")] = None
+        for name in names:
+            for key in [k for f, k in self.saved if f == name]:
+                rows[(name, key)] = None
+            for key, entry in self.entries(name).items():
+                rows[(name, key)] = entry
+        if ("", "") in rows:
+            rows[("", "")] = self.data.model_dump(
+                mode="json", exclude=set(self.collections)
+            )
+        return rows
+
+    def save(self, full: bool = False) -> None:
+        if not self.dirty:
+            return
+        start = time.perf_counter()
+        written = 0
+        conn = self.store.conn
+        with conn:
+            for (name, key), value in self.rows(None if full else self.changed).items():
+                text = None if value is None else _dumps(value)
+                if text == self.saved.get((name, key)):
+                    continue
+                if text is None:
+                    conn.execute(
+                        "DELETE FROM rows WHERE unit = ? AND field = ? AND key = ?",
+                        (self.name, name, key),
+                    )
+                    del self.saved[(name, key)]
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO rows VALUES (?, ?, ?, ?)",
+                        (self.name, name, key, text),
+                    )
+                    self.saved[(name, key)] = text
+                    written += len(text)
+                if name:
+                    self.update_children(name, key, text)
+        self.changed = set()
+        self.dirty = False
+        self.stats.last_save_time = datetime.now()
+        self.stats.save_duration_sec = time.perf_counter() - start
+        self.stats.save_bytes = written
+
+    def update_children(self, name: str, key: str, text: Optional[str]) -> None:
+        conn = self.store.conn
+        conn.execute(
+            "DELETE FROM children WHERE unit = ? AND field = ? AND key = ?",
+            (self.name, name, key),
+        )
+        if text is None:
+            return
+        for child, (array, value) in self.collections[name].children.items():
+            conn.execute(
+                "INSERT INTO children SELECT ?, ?, ?, ?, key, json_extract(value, ?) "
+                "FROM json_each(?, ?)",
+                (self.name, name, key, child, value, text, array),
+            )
+
+    def fill_children(self) -> None:
+        """Fill the children table of rows saved before it existed."""
+        conn = self.store.conn
+        if conn.execute(
+            "SELECT 1 FROM children WHERE unit = ? LIMIT 1", (self.name,)
+        ).fetchone():
+            return
+        with conn:
+            for (name, key), text in self.saved.items():
+                if name and self.collections[name].children:
+                    self.update_children(name, key, text)
+
+    def find(self, name: str, index: str, value: Any) -> list[str]:
+        """Keys of the entries of collection name whose index equals value."""
+        self.save()
+        expr, where = _indexed_rows(
+            self.name, name, self.collections[name].indexes[index]
+        )
+        rows = self.store.conn.execute(
+            f"SELECT key FROM rows WHERE {where} AND {expr} = ?", (value,)
+        ).fetchall()
+        return [key for (key,) in rows]
+
+    def find_children(self, name: str, child: str, value: Any) -> list[str]:
+        """Keys of the entries of collection name with value in child."""
+        self.save()
+        rows = self.store.conn.execute(
+            "SELECT DISTINCT key FROM children "
+            "WHERE unit = ? AND field = ? AND child = ? AND value = ?",
+            (self.name, name, child, value),
+        ).fetchall()
+        return [key for (key,) in rows]
+
+    def ordered(self, name: str, index: str) -> list[Any]:
+        """Entries of collection name as json, ordered by index."""
+        self.save()
+        expr, where = _indexed_rows(
+            self.name, name, self.collections[name].indexes[index]
+        )
+        rows = self.store.conn.execute(
+            f"SELECT value FROM rows WHERE {where} ORDER BY {expr}"
+        ).fetchall()
+        return [json.loads(value) for (value,) in rows]
+
+    def need_compact(self) -> bool:
+        return False
@@ -1,14 +1,15 @@
-from service.server.api import api, login, get_user
+from service.server.api import api, stream_api, login, get_user
 from service.schema.api import *
 from service.lib.context import Context
 from service.searcher.searchers import Searchers
 import os
 from .db import DB
 from .local_manager import LocalManager
+from .cover import cover_srcset
 from .error_db import ErrorDB
 from .user_manager import UserManager
 from service.schema.user_db import User
-from typing import Optional
+from typing import AsyncIterator, Optional, Union
 import threading
 from service.schema.app_config import AppConfig
 from service.schema.config import Config
@@ -17,6 +18,7 @@ from service.schema.tvdb import TV
 from service.schema.user_data import UserData
 from .user_data_manager import UserDataManager
 from service.schema.tvdb import DownloadStatus
+from service.downloader.m3u8 import M3U8Downloader
 
 
 class Tracker:
@@ -82,11 +84,32 @@ class Tracker:
             return f"{path}?v={cache_bust}"
         return path
 
+    def live_url(self, tv: TV, episode_id: int) -> str:
+        return f"/live/{tv.id}/{episode_id}/index.m3u8"
+
+    def get_live_source(
+        self, tv_id: int, episode_id: int
+    ) -> Union[str, M3U8Downloader, None]:
+        tv = self.local_manager.get_tv(tv_id)
+        episode = tv.storage.episodes[episode_id]
+        if episode.status == DownloadStatus.SUCCESS:
+            return self.resource_url(tv, episode.filename, episode.content_uuid)
+        if episode.status == DownloadStatus.RUNNING:
+            return self.local_manager.get_live_downloaders(tv_id).get(episode_id)
+        return None
+
     def build_tv_info(self, user_data: UserData, tv: TV) -> TVInfo:
         return TVInfo(
             id=tv.id,
             name=tv.name,
             cover_url=self.resource_url(tv, tv.storage.cover),
+            cover_srcset=cover_srcset(
+                tv.storage.cover_hash, tv.storage.cover_widths, "webp"
+            ),
+            cover_srcset_jpeg=cover_srcset(
+                tv.storage.cover_hash, tv.storage.cover_widths, "jpg"
+            ),
+            setup=tv.storage.setup,
             series=tv.series,
             last_update=tv.track.last_update,
             total_episodes=len(tv.storage.episodes),
@@ -137,6 +160,37 @@ class Tracker:
         source, search_error = await self.searchers.search(keyword)
         return SearchTV.Response(source=source, search_error=search_error)
 
+    @api("user")
+    async def search_subjects(
+        self, user: User, request: SearchSubjects.Request
+    ) -> SearchSubjects.Response:
+        subjects, search_error = await self.searchers.search_subjects(request.keyword)
+        return SearchSubjects.Response(subjects=subjects, search_error=search_error)
+
+    @api("user")
+    async def get_subject_channels(
+        self, user: User, request: GetSubjectChannels.Request
+    ) -> GetSubjectChannels.Response:
+        source = await self.searchers.get_subject_channels(request.subject)
+        return GetSubjectChannels.Response(source=source)
+
+    @stream_api("user")
+    async def search_tv_stream(
+        self, user: User, request: SearchTVStream.Request
+    ) -> AsyncIterator[SearchTVStream.Event]:
+        async for (
+            source_key,
+            source,
+            search_error,
+            finished,
+        ) in self.searchers.search_stream(request.keyword):
+            yield SearchTVStream.Event(
+                source_key=source_key,
+                source=source,
+                search_error=search_error,
+                finished=finished,
+            )
+
     @api("user")
     async def add_tv(self, user: User, request: AddTV.Request) -> AddTV.Response:
         name = request.name
@@ -150,7 +204,9 @@ class Tracker:
                     'TV 名称包含路径非法字符（Windows/Linux）：<>:"/\\|?* 或控制字符'
                 )
         source = request.source
-        tv_id = await self.local_manager.add_tv(name, source, request.tracking)
+        tv_id = await self.local_manager.add_tv(
+            name, source, request.tracking, request.storage_mode
+        )
         self.series_manager.add_tv_to_series(tv_id, request.series)
         return AddTV.Response(id=tv_id)
 
@@ -200,6 +256,7 @@ class Tracker:
             )
 
     def build_tv_details(self, user_data: UserData, tv: TV) -> TVDetails:
+        live_downloaders = self.local_manager.get_live_downloaders(tv.id)
         return TVDetails(
             id=tv.id,
             tv=tv,
@@ -212,6 +269,15 @@ class Tracker:
                 )
                 for episode in tv.storage.episodes
             ],
+            live_episodes=[
+                (
+                    self.live_url(tv, episode_id)
+                    if episode.status == DownloadStatus.RUNNING
+                    and episode_id in live_downloaders
+                    else None
+                )
+                for episode_id, episode in enumerate(tv.storage.episodes)
+            ],
         )
 
     @api("user")
@@ -222,7 +288,10 @@ class Tracker:
         tv = self.local_manager.get_tv(request.id)
         tv_details = self.build_tv_details(user_data, tv)
         return GetTVDetails.Response(
-            tv=tv_details.tv, info=tv_details.info, episodes=tv_details.episodes
+            tv=tv_details.tv,
+            info=tv_details.info,
+            episodes=tv_details.episodes,
+            live_episodes=tv_details.live_episodes,
         )
 
     @api("user")
@@ -320,6 +389,13 @@ class Tracker:
         await self.local_manager.set_tv_tracking(request.tv_id, request.tracking)
         return SetTVTracking.Response()
 
+    @api("user")
+    async def set_tv_storage_mode(
+        self, user: User, request: SetTVStorageMode.Request
+    ) -> SetTVStorageMode.Response:
+        await self.local_manager.set_tv_storage_mode(request.tv_id, request.mode)
+        return SetTVStorageMode.Response()
+
     @api("user")
     async def schedule_episode_download(
         self, user: User, request: ScheduleEpisodeDownload.Request
@@ -336,8 +412,20 @@ class Tracker:
         return GetMonitor.Response(
             download_count=self.local_manager.get_download_count(),
             error_count=self.error_db.get_error_count(),
+            remux=self.local_manager.get_remux_progress(),
+            rate_limit=Context.rate_limiter.get_state(),
+            browser_pool=Context.browser_pool.get_state(),
+            updater=self.local_manager.get_update_stats(),
+            db=self.db.get_stats(),
         )
 
+    @api("admin")
+    async def remux_library(
+        self, user: User, request: RemuxLibrary.Request
+    ) -> RemuxLibrary.Response:
+        self.local_manager.start_remux()
+        return RemuxLibrary.Response()
+
     @api("admin")
     async def get_config(
         self, user: User, request: GetConfig.Request
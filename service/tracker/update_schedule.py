@@ -0,0 +1,81 @@
+from service.schema.tvdb import TrackStatus
+from service.schema.config import UpdaterConfig
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Optional
+import random
+
+# 用于估计更新周期的最近更新次数
+RELEASE_HISTORY_SIZE = 8
+# 每次调度时间的随机抖动比例，避免各剧集重新同步到同一时刻
+_JITTER = 0.1
+
+
+def release_cadence(history: list[datetime]) -> Optional[timedelta]:
+    """Median gap between recent releases, None without enough history."""
+    if len(history) < 2:
+        return None
+    gaps = [b - a for a, b in zip(history, history[1:]) if b > a]
+    if not gaps:
+        return None
+    return median(gaps)
+
+
+def doubled(interval: timedelta, times: int, cap: timedelta) -> timedelta:
+    """interval doubled times times, at most cap.
+
+    Stops doubling once cap is reached, so a large backoff cannot overflow
+    timedelta.
+    """
+    if interval <= timedelta(0):
+        return interval
+    for _ in range(times):
+        if interval >= cap:
+            break
+        interval *= 2
+    return min(interval, cap)
+
+
+def next_update_interval(
+    track: TrackStatus, now: datetime, config: UpdaterConfig
+) -> timedelta:
+    """Time until the next check of a show.
+
+    Right after a release the show is checked again when the next release
+    is expected. Once it is due it is checked every min_update_interval,
+    doubling after each check without an update, and shows without a
+    known cadence back off exponentially from update_interval.
+    """
+    cadence = release_cadence(track.release_history)
+    if track.backoff == 0:
+        interval = cadence or config.update_interval
+    elif cadence is not None and now < track.release_history[-1] + cadence:
+        interval = track.release_history[-1] + cadence - now
+    elif cadence is not None and now < track.release_history[-1] + cadence * 1.5:
+        interval = doubled(
+            config.min_update_interval, track.backoff - 1, config.update_interval
+        )
+    else:
+        interval = doubled(
+            config.update_interval, track.backoff - 1, config.max_update_interval
+        )
+    interval = max(
+        config.min_update_interval, min(interval, config.max_update_interval)
+    )
+    return interval * random.uniform(1 - _JITTER, 1 + _JITTER)
+
+
+def record_check(
+    track: TrackStatus, now: datetime, updated: bool, config: UpdaterConfig
+) -> None:
+    if updated:
+        track.backoff = 0
+        track.release_history = (track.release_history + [now])[-RELEASE_HISTORY_SIZE:]
+    else:
+        track.backoff += 1
+    track.next_update = now + next_update_interval(track, now, config)
+
+
+def initial_update(now: datetime, config: UpdaterConfig) -> datetime:
+    """Spread shows without a schedule across one update interval."""
+    return now + config.update_interval * random.random()
@@ -2,6 +2,7 @@ from service.lib.context import Context
 from service.schema.user_db import UserDB, User
 from uuid import uuid4
 from typing import Optional
+from .sqlite_db import SqliteUnit
 import re
 
 
@@ -11,6 +12,7 @@ _SINGLE_USER_NAME = "user"
 class UserManager:
     async def start(self) -> None:
         self.db = Context.data("db").manage("user_db", UserDB)
+        self.sqlite: Optional[SqliteUnit] = Context.data("db").sqlite_unit("user_db")
 
     def has_user(self) -> bool:
         return len(self.db.users) > 0
@@ -54,6 +56,9 @@ class UserManager:
     def get_user(self, token: Optional[str]) -> Optional[User]:
         if self.db.single_user_mode:
             return self.db.users[_SINGLE_USER_NAME]
+        if self.sqlite is not None:
+            usernames = self.sqlite.find("users", "token", token)
+            return self.db.users.get(usernames[0]) if usernames else None
         return next(
             (user for user in self.db.users.values() if user.token == token), None
         )